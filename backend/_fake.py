@@ -1,7 +1,7 @@
 import asyncio
 import uuid
 from datetime import datetime, timezone
-from db.tasks_ops import Task, TaskStatus, create_task_from_anli_result
+from db.tasks_ops import Task, TaskStatus, create_tasks_from_anli_json
 from db.db import engine, Base
 from sqlalchemy import create_engine as sync_create_engine, text
 from sqlalchemy.orm import Session
@@ -45,17 +45,12 @@ async def populate_tasks_from_anli_json():
     
     print(f"Found {len(anli_data)} ANLI results to process")
     
-    # Create tasks using the async function
-    task_ids = []
-    for i, anli_result in enumerate(anli_data):
-        try:
-            task_id = await create_task_from_anli_result(anli_result)
-            task_ids.append(task_id)
-            if (i + 1) % 10 == 0:
-                print(f"Processed {i + 1}/{len(anli_data)} tasks")
-        except Exception as e:
-            print(f"Error creating task {i + 1}: {e}")
-            continue
+    # Create tasks in batched transactions
+    try:
+        task_ids = await create_tasks_from_anli_json(anli_data)
+    except Exception as e:
+        print(f"Error creating tasks: {e}")
+        return
     
     print(f"Successfully created {len(task_ids)} tasks")
     return task_ids
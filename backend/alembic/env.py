@@ -11,6 +11,7 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from db.db import Base
 from db.user_ops import User
+from db.pages_ops import Page
 from db.tasks_ops import Task
 
 # this is the Alembic Config object, which provides
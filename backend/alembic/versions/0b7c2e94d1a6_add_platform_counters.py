@@ -0,0 +1,38 @@
+"""add platform counters
+
+Revision ID: 0b7c2e94d1a6
+Revises: f3d71a08b5e4
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b7c2e94d1a6'
+down_revision: Union[str, None] = 'f3d71a08b5e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'platform_counters',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('total_users', sa.Integer(), nullable=False),
+        sa.Column('total_completed_tasks', sa.Integer(), nullable=False),
+        sa.Column('total_points_awarded', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # Seed from the current users; kept up to date by the app from here on
+    op.execute(
+        "INSERT INTO platform_counters (id, total_users, total_completed_tasks, total_points_awarded) "
+        "SELECT 1, count(id), coalesce(sum(completed_tasks), 0), coalesce(sum(points), 0) FROM users"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('platform_counters')
@@ -0,0 +1,27 @@
+"""add users points index
+
+Revision ID: 7e4a91c3b2d5
+Revises: 0b7c2e94d1a6
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e4a91c3b2d5'
+down_revision: Union[str, None] = '0b7c2e94d1a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Leaderboard order (points, id descending) and its keyset pagination
+    op.create_index('ix_users_points_id', 'users', ['points', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_points_id', table_name='users')
@@ -0,0 +1,53 @@
+"""add pages table and task highlight ranges
+
+Revision ID: c41d7e92f0a3
+Revises: b209a991f11f
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41d7e92f0a3'
+down_revision: Union[str, None] = 'b209a991f11f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Base pages shared by tasks, keyed by the SHA-256 of their HTML
+    op.create_table(
+        'pages',
+        sa.Column('id', sa.String(64), primary_key=True),
+        sa.Column('page_name', sa.String(), nullable=False),
+        sa.Column('revision', sa.Integer(), nullable=True),
+        sa.Column('html', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_pages_page_name', 'pages', ['page_name'])
+
+    # Tasks point at a page and store only the ranges to highlight in it
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.add_column(sa.Column('claim_page_id', sa.String(64), nullable=True))
+        batch_op.add_column(sa.Column('claim_highlight_ranges', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('evidence_page_id', sa.String(64), nullable=True))
+        batch_op.add_column(sa.Column('evidence_highlight_ranges', sa.Text(), nullable=True))
+        batch_op.create_foreign_key('fk_tasks_claim_page_id', 'pages', ['claim_page_id'], ['id'])
+        batch_op.create_foreign_key('fk_tasks_evidence_page_id', 'pages', ['evidence_page_id'], ['id'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.drop_constraint('fk_tasks_evidence_page_id', type_='foreignkey')
+        batch_op.drop_constraint('fk_tasks_claim_page_id', type_='foreignkey')
+        batch_op.drop_column('evidence_highlight_ranges')
+        batch_op.drop_column('evidence_page_id')
+        batch_op.drop_column('claim_highlight_ranges')
+        batch_op.drop_column('claim_page_id')
+
+    op.drop_index('ix_pages_page_name', table_name='pages')
+    op.drop_table('pages')
@@ -0,0 +1,29 @@
+"""store page html as compressed blobs
+
+Revision ID: d8a5f3b61c27
+Revises: c41d7e92f0a3
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8a5f3b61c27'
+down_revision: Union[str, None] = 'c41d7e92f0a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing plain-text rows stay readable; preprocessing/migrate_highlights.py compresses them
+    with op.batch_alter_table('pages') as batch_op:
+        batch_op.alter_column('html', existing_type=sa.Text(), type_=sa.LargeBinary(), existing_nullable=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('pages') as batch_op:
+        batch_op.alter_column('html', existing_type=sa.LargeBinary(), type_=sa.Text(), existing_nullable=False)
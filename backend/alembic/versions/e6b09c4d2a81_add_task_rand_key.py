@@ -0,0 +1,33 @@
+"""add rand_key to tasks for random sampling
+
+Revision ID: e6b09c4d2a81
+Revises: d8a5f3b61c27
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b09c4d2a81'
+down_revision: Union[str, None] = 'd8a5f3b61c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.add_column(sa.Column('rand_key', sa.Float(), nullable=False, server_default='0'))
+
+    # Give existing tasks uniform keys in [0, 1)
+    op.execute("UPDATE tasks SET rand_key = (random() / 18446744073709551616.0) + 0.5")
+    op.create_index('ix_tasks_status_rand_key', 'tasks', ['status', 'rand_key'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_status_rand_key', table_name='tasks')
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.drop_column('rand_key')
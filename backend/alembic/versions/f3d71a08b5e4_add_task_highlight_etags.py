@@ -0,0 +1,31 @@
+"""add highlight etags to tasks
+
+Revision ID: f3d71a08b5e4
+Revises: e6b09c4d2a81
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3d71a08b5e4'
+down_revision: Union[str, None] = 'e6b09c4d2a81'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Filled in for existing tasks by preprocessing/migrate_highlights.py
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.add_column(sa.Column('claim_etag', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('evidence_etag', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.drop_column('evidence_etag')
+        batch_op.drop_column('claim_etag')
@@ -0,0 +1,57 @@
+"""
+HTTP conditional caching helpers for the content endpoints.
+ETags are computed ahead of time (stored with tasks, or derived from file
+metadata or content hashes) so a revalidation can be answered with 304 before any content
+is loaded.
+"""
+
+import re
+from typing import Optional, Tuple
+
+from fastapi.responses import Response
+
+# Revalidate on every use; cheap because of the 304 path
+CACHE_REVALIDATE = "no-cache"
+# Content whose URL changes whenever the content does
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+# Static files that may change in place
+CACHE_STATIC = "public, max-age=3600"
+
+# A hex run of 8+ characters in a file name (e.g. ``app.3f2a9c1d.css``) or a
+# ``version=`` query marks a fingerprinted asset
+FINGERPRINT_PATTERN = re.compile(r'(?:[.\-_][0-9a-f]{8,}\.[A-Za-z0-9]+$)|(?:[?&]version=)', re.IGNORECASE)
+
+
+def quote_etag(tag: str, encoding: Optional[str] = None) -> str:
+    """Strong ETag header value; each content encoding gets its own tag."""
+    return f'"{tag}-{encoding}"' if encoding else f'"{tag}"'
+
+
+def etag_matches(if_none_match: Optional[str], tag: str) -> bool:
+    """True if an If-None-Match header matches ``tag`` in any encoding (weak comparison)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"') in (tag, f"{tag}-gzip"):
+            return True
+    return False
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    """An empty 304 carrying the validators the full response would have had."""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def version_etag(version: Tuple[int, ...]) -> str:
+    """Tag from a source's version (e.g. file mtime and size), so it never has to be read or hashed."""
+    return "-".join(f"{part:x}" for part in version)
+
+
+def is_fingerprinted(path: str) -> bool:
+    """True if ``path`` names a fingerprinted asset that can be cached forever."""
+    return bool(FINGERPRINT_PATTERN.search(path))
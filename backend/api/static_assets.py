@@ -0,0 +1,137 @@
+"""
+Manifest of the static assets (CSS, JS, images) of the mirrored pages.
+Built once at startup so /api/wiki-static requests are answered from memory:
+no existence checks, stats or MIME guessing per request, and a strong ETag
+from each file's content hash. Assets resolve through the content-addressed
+store first, then fall back to files saved in the mirror itself.
+"""
+
+import hashlib
+import mimetypes
+import os
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from preprocessing.asset_store import NON_REQUISITES, AssetStore
+from preprocessing.downloader import REQUISITE_EXTENSIONS, requisite_file_name
+
+
+@dataclass(frozen=True)
+class StaticAsset:
+    """A static file ready to send: where it is, what it is and its validators."""
+    path: Path
+    media_type: str
+    size: int
+    etag: str  # SHA-256 of the content, truncated
+    stat_result: os.stat_result
+
+
+class StaticManifest:
+    """Map of asset names (as saved, query string included) to ``StaticAsset``s.
+
+    Files added after startup are picked up on first request.
+    """
+
+    def __init__(self, site_dir: Path, store: Optional[AssetStore] = None):
+        self.site_dir = Path(site_dir)
+        self.store = store
+        self._assets: Dict[str, StaticAsset] = {}
+        self._lock = threading.Lock()
+
+    def build(self) -> None:
+        """Read the store index and scan the mirror for loose files; run once at startup."""
+        start = time.perf_counter()
+        assets: Dict[str, StaticAsset] = {}
+        if self.store:
+            self.store.load()
+            # Blobs are named by their hash, so nothing needs hashing; each is stat'ed once
+            blobs: Dict[str, os.stat_result] = {}
+            for name, digest in self.store.items():
+                self._add_blob(assets, blobs, name, digest)
+
+        for root, dirs, files in os.walk(self.site_dir):
+            top_level = Path(root) == self.site_dir
+            if top_level:
+                dirs[:] = [name for name in dirs if name not in NON_REQUISITES]
+            for file_name in files:
+                if file_name.startswith(".tmp-") or (top_level and file_name in NON_REQUISITES):
+                    continue
+                path = Path(root) / file_name
+                name = path.relative_to(self.site_dir).as_posix()
+                if name not in assets:
+                    self._add(assets, name, path)
+
+        with self._lock:
+            self._assets = assets
+        total = sum(asset.size for asset in set(assets.values()))
+        print(f"📦 Static manifest: {len(set(assets.values()))} assets, {total / 1e6:.1f} MB in {time.perf_counter() - start:.1f}s")
+
+    def lookup(self, file_path: str, query: str = "") -> Optional[StaticAsset]:
+        """Asset for a request path and raw query string, or None if it isn't in the manifest."""
+        name = self.asset_name(file_path, query)
+        with self._lock:
+            return self._assets.get(name)
+
+    def load(self, file_path: str, query: str = "") -> Optional[StaticAsset]:
+        """Add an asset saved since startup, if it exists (blocking)."""
+        name = self.asset_name(file_path, query)
+        candidates = [name] + [name + extension for extension in set(REQUISITE_EXTENSIONS.values())]
+        if self.store:
+            self.store.load()
+            for candidate in candidates:
+                resolved = self.store.resolve(candidate)
+                if resolved:
+                    with self._lock:
+                        self._add_blob(self._assets, {}, candidate, resolved[0])
+                        self._assets.setdefault(name, self._assets[candidate])
+                        return self._assets[name]
+        for candidate in candidates:
+            path = self.site_dir / candidate
+            if path.is_file() and candidate.split("/", 1)[0] not in NON_REQUISITES:
+                with self._lock:
+                    self._add(self._assets, candidate, path)
+                    self._assets.setdefault(name, self._assets[candidate])
+                    return self._assets[name]
+        return None
+
+    @staticmethod
+    def asset_name(file_path: str, query: str = "") -> str:
+        """Saved name of an asset, in the downloader's (wget-compatible) layout."""
+        path = "/" + urllib.parse.quote(file_path.lstrip("/"))
+        return requisite_file_name(f"{path}?{query}" if query else path)
+
+    def _add_blob(self, assets: Dict[str, StaticAsset], blobs: Dict[str, os.stat_result], name: str, digest: str) -> None:
+        path = self.store.blob_path(digest)
+        if digest not in blobs:
+            try:
+                blobs[digest] = path.stat()
+            except OSError:
+                return
+        self._register(assets, name, path, digest, blobs[digest])
+
+    @classmethod
+    def _add(cls, assets: Dict[str, StaticAsset], name: str, path: Path) -> None:
+        stat_result = path.stat()
+        with open(path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        cls._register(assets, name, path, digest, stat_result)
+
+    @staticmethod
+    def _register(assets: Dict[str, StaticAsset], name: str, path: Path, digest: str, stat_result: os.stat_result) -> None:
+        media_type, _ = mimetypes.guess_type(name)
+        asset = StaticAsset(
+            path=path,
+            media_type=media_type or "application/octet-stream",
+            size=stat_result.st_size,
+            etag=digest[:32],
+            stat_result=stat_result,
+        )
+        assets[name] = asset
+        # Styles and scripts got an extension appended after download; requests use the URL without it
+        for extension in set(REQUISITE_EXTENSIONS.values()):
+            if "?" in name and name.endswith(extension):
+                assets.setdefault(name[:-len(extension)], asset)
@@ -3,69 +3,163 @@ Ultra-simple FastAPI router for serving Wikipedia content.
 Uses the consolidated wikipedia_processor.
 """
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse, HTMLResponse
-import mimetypes
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, HTMLResponse, Response
+import asyncio
+import gzip
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
+from typing import Optional
 
-from db.tasks_ops import Task, AsyncSessionLocal
-from preprocessing.wikipedia_processor import get_local_html_content
+from api.http_cache import (
+    CACHE_IMMUTABLE, CACHE_REVALIDATE, CACHE_STATIC,
+    etag_matches, is_fingerprinted, not_modified, quote_etag, version_etag,
+)
+from api.static_assets import StaticManifest
+from preprocessing.asset_store import AssetStore
+from db.tasks_ops import (
+    Task, AsyncSessionLocal, get_highlight_etag, get_highlighted_gzip, get_highlighted_html, get_highlighted_section,
+)
+from preprocessing.wikipedia_processor import get_local_html_version, page_render_executor, render_cache, render_local_page
 
 router = APIRouter()
 
 # Base directory for saved Wikipedia files  
 SAVED_SITE_DIR = Path("saved_site")
 
+# Static assets under the mirror, indexed at startup
+static_manifest = StaticManifest(SAVED_SITE_DIR / "en.wikipedia.org", AssetStore.for_saved_dir(SAVED_SITE_DIR))
+
+# Local pages are read and rewritten in worker processes: the rewrite is
+# regex work that holds the GIL, so on a thread it would still stall the
+# event loop. Created on the first render cache miss, sized to the CPU count.
+_page_render_executor: Optional[ProcessPoolExecutor] = None
+
+def get_page_render_executor() -> ProcessPoolExecutor:
+    global _page_render_executor
+    if _page_render_executor is None:
+        _page_render_executor = page_render_executor()
+    return _page_render_executor
+
+def shutdown_page_render_executor() -> None:
+    """Stop the render workers; call on app shutdown, as they would outlive a signalled server."""
+    global _page_render_executor
+    if _page_render_executor is not None:
+        _page_render_executor.shutdown(cancel_futures=True)
+        _page_render_executor = None
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """True if an Accept-Encoding header allows gzip (explicitly or via ``*``)."""
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            quality = params.strip().lower()
+            if not quality.startswith("q="):
+                return True
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+    return False
+
+# Delivery modes for highlighted pages: the whole page, or the highlighted section first
+DELIVERY_MODES = ("full", "section")
+
+async def highlighted_response(task_id: str, role: str, request: Request, delivery: str = "full") -> Response:
+    """Send a task's highlighted page, pre-compressed if the client accepts gzip.
+    
+    A revalidation whose ETag still matches is answered with 304 from the
+    stored tag alone, before the task or its page is loaded. With
+    ``delivery="section"`` only the section holding the highlight is sent,
+    as a small page that then fetches the full one in the background.
+    """
+    gzip_ok = accepts_gzip(request.headers.get("accept-encoding", ""))
+    etag = await get_highlight_etag(task_id, role)
+    if etag and delivery == "section":
+        # A different representation of the same highlight
+        etag = f"{etag}.section"
+    headers = {"Vary": "Accept-Encoding"}
+    if etag:
+        headers.update({"ETag": quote_etag(etag, "gzip" if gzip_ok else None), "Cache-Control": CACHE_REVALIDATE})
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+    
+    # Get task from database
+    async with AsyncSessionLocal() as session:
+        task = await session.get(Task, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+    
+    if delivery == "section":
+        section_html = await get_highlighted_section(task, role)
+        if section_html is not None:
+            if gzip_ok:
+                compressed = await asyncio.to_thread(gzip.compress, section_html.encode("utf-8"), 6, mtime=0)
+                return Response(content=compressed, media_type="text/html", headers={**headers, "Content-Encoding": "gzip"})
+            return HTMLResponse(content=section_html, headers=headers)
+        # No section to send first (legacy row, or a highlight outside the article): send the whole page
+        if etag:
+            etag = etag[:-len(".section")]
+            headers["ETag"] = quote_etag(etag, "gzip" if gzip_ok else None)
+    
+    if gzip_ok:
+        compressed = await get_highlighted_gzip(task, role)
+        if compressed is not None:
+            return Response(
+                content=compressed,
+                media_type="text/html",
+                headers={**headers, "Content-Encoding": "gzip"},
+            )
+    
+    # Decompressed only for clients that can't take gzip (and legacy rows)
+    highlighted_html = await get_highlighted_html(task, role)
+    if not highlighted_html:
+        raise HTTPException(
+            status_code=404, 
+            detail=f"No highlighted content available for {role} in task {task.id}"
+        )
+    if headers.get("ETag", "").endswith('-gzip"'):
+        # Legacy row served uncompressed to a gzip client
+        headers["ETag"] = quote_etag(etag)
+    return HTMLResponse(content=highlighted_html, headers=headers)
+
 @router.get("/wiki-highlighted/claim/{task_id}")
-async def serve_claim_highlighted_content(task_id: str):
+async def serve_claim_highlighted_content(
+    task_id: str,
+    request: Request,
+    delivery: str = Query("full", pattern=f"^({'|'.join(DELIVERY_MODES)})$"),
+):
     """
     Serve pre-processed highlighted HTML content for a task's claim.
+    ``?delivery=section`` sends the highlighted section first.
     """
     try:
-        # Get task from database
-        async with AsyncSessionLocal() as session:
-            task = await session.get(Task, task_id)
-            
-        if not task:
-            raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
-        
-        if not task.claim_highlighted_html:
-            raise HTTPException(
-                status_code=404, 
-                detail=f"No highlighted content available for claim in task {task_id}"
-            )
-        
-        return HTMLResponse(content=task.claim_highlighted_html)
+        # Rendered from the shared base page and the task's highlight ranges
+        return await highlighted_response(task_id, "claim", request, delivery)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error serving claim content: {str(e)}")
 
 @router.get("/wiki-highlighted/evidence/{task_id}")
-async def serve_evidence_highlighted_content(task_id: str):
+async def serve_evidence_highlighted_content(
+    task_id: str,
+    request: Request,
+    delivery: str = Query("full", pattern=f"^({'|'.join(DELIVERY_MODES)})$"),
+):
     """
     Serve pre-processed highlighted HTML content for a task's evidence.
+    ``?delivery=section`` sends the highlighted section first.
     """
     try:
-        # Get task from database
-        async with AsyncSessionLocal() as session:
-            task = await session.get(Task, task_id)
-            
-        if not task:
-            raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
-        
-        if not task.evidence_highlighted_html:
-            raise HTTPException(
-                status_code=404, 
-                detail=f"No highlighted content available for evidence in task {task_id}"
-            )
-        
-        return HTMLResponse(content=task.evidence_highlighted_html)
+        # Rendered from the shared base page and the task's highlight ranges
+        return await highlighted_response(task_id, "evidence", request, delivery)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error serving evidence content: {str(e)}")
 
 @router.get("/wiki/{page_name:path}")
-async def serve_wikipedia_page(page_name: str):
+async def serve_wikipedia_page(page_name: str, request: Request):
     """
     Serve a local Wikipedia page WITHOUT highlighting (for general browsing).
     """
@@ -74,21 +168,39 @@ async def serve_wikipedia_page(page_name: str):
         if ".." in page_name or page_name.startswith("/"):
             raise HTTPException(status_code=400, detail="Invalid page name")
         
-        # Get content using consolidated processor
-        content = get_local_html_content(page_name)
+        # Revalidate from the page's version before reading and rewriting it
+        headers = {}
+        version = await asyncio.to_thread(get_local_html_version, page_name)
+        etag = version_etag(version) if version else None
+        if etag:
+            headers = {"ETag": quote_etag(etag), "Cache-Control": CACHE_REVALIDATE}
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                return not_modified(headers["ETag"], CACHE_REVALIDATE)
+        
+        # Rewritten pages are kept encoded until the page changes; misses render in a worker process
+        content = render_cache.get(page_name, version) if version else None
+        if content is None and version:
+            try:
+                content = await asyncio.get_running_loop().run_in_executor(get_page_render_executor(), render_local_page, page_name)
+            except BrokenProcessPool:
+                # A worker died; the next request starts a fresh pool
+                shutdown_page_render_executor()
+                raise
+            if content is not None:
+                render_cache.put(page_name, version, content)
         if not content:
             raise HTTPException(
                 status_code=404, 
                 detail=f"Wikipedia page '{page_name}' not found locally."
             )
         
-        return HTMLResponse(content=content)
+        return HTMLResponse(content=content, headers=headers)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error serving page: {str(e)}")
 
 @router.get("/wiki-static/{file_path:path}")
-async def serve_static_file(file_path: str):
+async def serve_static_file(file_path: str, request: Request):
     """
     Serve static files (CSS, JS, images) for Wikipedia pages.
     """
@@ -97,20 +209,24 @@ async def serve_static_file(file_path: str):
         if ".." in file_path:
             raise HTTPException(status_code=400, detail="Invalid file path")
         
-        # Construct full file path
-        full_path = SAVED_SITE_DIR / "en.wikipedia.org" / file_path.lstrip("/")
-        
-        if not full_path.exists():
+        # Answered from the startup manifest; only assets saved since then touch the disk
+        query = request.url.query
+        asset = static_manifest.lookup(file_path, query) or await asyncio.to_thread(static_manifest.load, file_path, query)
+        if not asset:
             raise HTTPException(status_code=404, detail="Static file not found")
         
-        # Determine MIME type
-        mime_type, _ = mimetypes.guess_type(str(full_path))
-        if mime_type is None:
-            mime_type = "application/octet-stream"
+        # Fingerprinted assets never change under the same URL
+        etag = quote_etag(asset.etag)
+        cache_control = CACHE_IMMUTABLE if is_fingerprinted(static_manifest.asset_name(file_path, query)) else CACHE_STATIC
+        if etag_matches(request.headers.get("if-none-match"), asset.etag):
+            return not_modified(etag, cache_control)
         
+        # FileResponse handles Range/If-Range; the known stat skips its own
         return FileResponse(
-            path=str(full_path),
-            media_type=mime_type
+            path=str(asset.path),
+            media_type=asset.media_type,
+            headers={"ETag": etag, "Cache-Control": cache_control},
+            stat_result=asset.stat_result
         )
         
     except Exception as e:
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark the async downloader against a local stand-in Wikipedia server.
+Usage: python benchmarks/download_throughput.py [--latency S] [--per-host N] [--compare-wget]
+
+Every page of the saved_site corpus, plus the raw live-Wikipedia fixture
+pages, is re-downloaded into a temporary directory, so the run is fully
+offline and repeatable. The downloaded pages' links are then checked
+against the static manifest they would be served with.
+"""
+
+import argparse
+import asyncio
+import html
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from typing import Tuple
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from api.static_assets import StaticManifest
+from benchmarks.local_wiki_server import FIXTURE_PAGES_DIR, LocalWikipediaServer
+from preprocessing.asset_store import AssetStore
+from preprocessing.downloader import STATIC_URL_PREFIX, URL_ATTRIBUTE_PATTERN, WikipediaDownloader
+from preprocessing.wikipedia_processor import WikipediaProcessor
+
+SAVED_SITE_DIR = backend_dir / "saved_site"
+
+
+async def download_all(base_url: str, out_dir: Path, page_names, per_host: int) -> int:
+    processor = WikipediaProcessor(out_dir)
+    async with WikipediaDownloader(processor, base_url=base_url, per_host_limit=per_host) as downloader:
+        results = await asyncio.gather(*(
+            downloader.download_page(f"https://en.wikipedia.org/wiki/{name}") for name in page_names
+        ))
+    return sum(results)
+
+
+def check_links(out_dir: Path) -> Tuple[int, int]:
+    """Count local requisite links in downloaded pages, and links that won't resolve when served.
+
+    Unresolved means root-relative (only valid on en.wikipedia.org) or
+    pointing at ``/api/wiki-static`` for something the mirror doesn't have.
+    """
+    manifest = StaticManifest(out_dir / "en.wikipedia.org", AssetStore.for_saved_dir(out_dir))
+    with redirect_stdout(StringIO()):
+        manifest.build()
+    local = unresolved = 0
+    for path in (out_dir / "en.wikipedia.org" / "wiki").glob("*.html"):
+        for match in URL_ATTRIBUTE_PATTERN.finditer(path.read_text(encoding="utf-8")):
+            for url in match.group(2).split(","):
+                url = html.unescape(url.strip().split(" ")[0])
+                if url.startswith(STATIC_URL_PREFIX + "/"):
+                    file_path, _, query = url[len(STATIC_URL_PREFIX) + 1:].partition("?")
+                    local += 1
+                    unresolved += manifest.lookup(file_path, query) is None
+                elif url.startswith("/") and not url.startswith("//"):
+                    unresolved += 1
+    return local, unresolved
+
+
+def wget_all(base_url: str, out_dir: Path, page_names) -> int:
+    ok = 0
+    for name in page_names:
+        cmd = [
+            'wget', '--mirror', '--convert-links', '--adjust-extension',
+            '--page-requisites', '--no-parent', '-q', '-P', str(out_dir), f"{base_url}/wiki/{name}"
+        ]
+        ok += subprocess.run(cmd, capture_output=True).returncode == 0
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the async Wikipedia downloader offline")
+    parser.add_argument("--latency", type=float, default=0.05, help="Per-request server latency in seconds")
+    parser.add_argument("--per-host", type=int, default=8, help="Per-host concurrency limit")
+    parser.add_argument("--fail-every", type=int, default=0, help="Return 503 for every Nth request")
+    parser.add_argument("--compare-wget", action="store_true", help="Also time one wget process per page")
+    args = parser.parse_args()
+
+    page_names = sorted(p.stem for p in (SAVED_SITE_DIR / "en.wikipedia.org" / "wiki").glob("*.html"))
+    page_names += sorted(p.stem for p in FIXTURE_PAGES_DIR.glob("*.html"))
+    server = LocalWikipediaServer(SAVED_SITE_DIR, latency=args.latency, fail_every=args.fail_every)
+
+    with server as base_url, tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        with redirect_stdout(StringIO()):
+            ok = asyncio.run(download_all(base_url, Path(tmp) / "async", page_names, args.per_host))
+        elapsed = time.perf_counter() - start
+        print(f"📥 async downloader: {ok}/{len(page_names)} pages in {elapsed:.2f}s "
+              f"({len(page_names) / elapsed:.1f} pages/s, {server.requests} requests)")
+        local, unresolved = check_links(Path(tmp) / "async")
+        print(f"🔗 links to saved requisites: {local}, unresolvable when served: {unresolved}")
+
+        if args.compare_wget:
+            server.requests = 0
+            start = time.perf_counter()
+            ok = wget_all(base_url, Path(tmp) / "wget", page_names)
+            elapsed = time.perf_counter() - start
+            print(f"📥 wget per page:    {ok}/{len(page_names)} pages in {elapsed:.2f}s "
+                  f"({len(page_names) / elapsed:.1f} pages/s, {server.requests} requests)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark highlight_many() scaling on the bundled saved_site corpus.
+Usage: python benchmarks/highlight_scaling.py [--items N] [--jobs 1 2 4 8]
+
+Builds synthetic ANLI items whose spans are real paragraph sentences from the
+saved pages, then times the highlighting step for each worker count.
+"""
+
+import argparse
+import html
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from preprocessing.wikipedia_processor import WikipediaProcessor
+
+SAVED_SITE_DIR = backend_dir / "saved_site"
+
+
+def paragraph_sentences(page_html: str) -> List[str]:
+    """Pull plain-text sentences out of the article paragraphs."""
+    sentences = []
+    for paragraph in re.findall(r'<p>(.*?)</p>', page_html, re.DOTALL):
+        paragraph = re.sub(r'<style[^>]*>.*?</style>', '', paragraph, flags=re.DOTALL)
+        text = html.unescape(re.sub(r'<[^>]+>', '', paragraph))
+        text = re.sub(r'\[\d+\]', '', text)
+        sentences.extend(s.strip() for s in re.findall(r'[^.!?]+[.!?]', text) if len(s.strip()) > 60)
+    return sentences
+
+
+def build_items(processor: WikipediaProcessor, count: int) -> List[Dict]:
+    """Build ``count`` ANLI-like items spread round-robin over the corpus."""
+    pages = []
+    for path in sorted((processor.saved_dir / "en.wikipedia.org" / "wiki").glob("*.html")):
+        sentences = paragraph_sentences(path.read_text(encoding="utf-8"))
+        if len(sentences) >= 2:
+            pages.append((path.stem, sentences))
+
+    items = []
+    for i in range(count):
+        claim_page, claim_sentences = pages[i % len(pages)]
+        evidence_page, evidence_sentences = pages[(i + 1) % len(pages)]
+        items.append({
+            "claim": claim_sentences[i % len(claim_sentences)],
+            "document_url": f"https://en.wikipedia.org/wiki/{claim_page}",
+            "claim_text_span": claim_sentences[i % len(claim_sentences)],
+            "evidence_url": f"https://en.wikipedia.org/wiki/{evidence_page}",
+            "evidence_sentence": evidence_sentences[(i * 7) % len(evidence_sentences)],
+        })
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark process-pool highlighting")
+    parser.add_argument("--items", type=int, default=64, help="Number of synthetic items (default: 64)")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8], help="Worker counts to time")
+    args = parser.parse_args()
+
+    processor = WikipediaProcessor(SAVED_SITE_DIR)
+    items = build_items(processor, args.items)
+
+    # The processor is chatty; keep its output (and the workers') off the report
+    report = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    sys.stdout.flush()
+    os.dup2(devnull, sys.stdout.fileno())
+
+    print(f"📊 {len(items)} items, {os.cpu_count()} CPUs", file=report)
+    baseline = None
+    reference = None
+    for jobs in args.jobs:
+        start = time.perf_counter()
+        results = processor.highlight_many(items, jobs)
+        elapsed = time.perf_counter() - start
+
+        # Every worker count must produce exactly the same ordered output
+        if reference is None:
+            reference = results
+        assert results == reference, f"results differ with {jobs} jobs"
+
+        baseline = baseline or elapsed
+        print(
+            f"jobs={jobs:<3} {elapsed:8.2f}s  {len(items) / elapsed:7.2f} items/s  "
+            f"speedup {baseline / elapsed:5.2f}x",
+            file=report,
+        )
+        report.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Local stand-in for en.wikipedia.org, serving the saved_site corpus over HTTP.
+Lets the downloader be exercised and benchmarked offline:
+
+    with LocalWikipediaServer(SAVED_SITE_DIR, latency=0.05) as base_url:
+        async with WikipediaDownloader(processor, base_url=base_url) as downloader:
+            await downloader.download_page(f"https://en.wikipedia.org/wiki/CRISPR")
+"""
+
+import mimetypes
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Pages saved from live Wikipedia without link conversion, served next to the corpus
+FIXTURE_PAGES_DIR = Path(__file__).parent / "fixtures" / "wiki"
+
+
+class LocalWikipediaServer:
+    """Threaded HTTP server serving ``saved_dir/en.wikipedia.org`` with optional latency.
+
+    ``/wiki/<page>`` maps to the saved ``<page>.html`` or a fixture page from
+    ``FIXTURE_PAGES_DIR``; ``/w/*`` and ``/static/*`` map to saved requisites
+    or, if missing, a small generated stand-in so requisite fetching is
+    exercised even on a pages-only corpus.
+    """
+
+    def __init__(self, saved_dir: Path, latency: float = 0.0, fail_every: int = 0):
+        self.site_dir = Path(saved_dir) / "en.wikipedia.org"
+        self.latency = latency
+        self.fail_every = fail_every
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> str:
+        self._thread.start()
+        return self.base_url
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    count = server.requests
+                if server.latency:
+                    time.sleep(server.latency)
+                # Inject transient failures so retries can be exercised
+                if server.fail_every and count % server.fail_every == 0:
+                    return self._send(503, b"try again", "text/plain")
+
+                parsed = urllib.parse.urlsplit(self.path)
+                path = urllib.parse.unquote(parsed.path)
+                if path.startswith("/wiki/"):
+                    file_name = f"{path[len('/wiki/'):]}.html"
+                    for file_path in (server.site_dir / "wiki" / file_name, FIXTURE_PAGES_DIR / file_name):
+                        if file_path.exists():
+                            return self._send(200, file_path.read_bytes(), "text/html; charset=UTF-8")
+                elif path.startswith(("/w/", "/static/")):
+                    name = path.lstrip("/") + (f"?{parsed.query}" if parsed.query else "")
+                    file_path = server.site_dir / name
+                    if file_path.exists():
+                        mime_type = mimetypes.guess_type(file_path.name)[0] or "application/octet-stream"
+                        return self._send(200, file_path.read_bytes(), mime_type)
+                    # Typed like the real thing, so the downloader names it the same way
+                    if path.endswith(".php"):
+                        mime_type = "text/javascript" if "only=scripts" in parsed.query else "text/css"
+                    else:
+                        mime_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                    return self._send(200, b"/* generated stand-in */\n", mime_type)
+                return self._send(404, b"not found", "text/plain")
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Benchmark /api/tasks/rand latency while /api/wiki/* is under load.
+Usage: python benchmarks/serving_latency.py [--items N] [--requests N] [--concurrency N] [--render-cache-mb MB] [--wiki-rate N]
+
+Starts the API with uvicorn (one worker) on a temporary database filled from
+the saved_site corpus, measures /api/tasks/rand on its own, then again while
+concurrent clients fetch random local pages. ``/`` is sampled alongside as a
+probe of event loop responsiveness: if page serving blocked the loop, its
+p99 would grow to the time it takes to read and rewrite a page.
+
+By default the page clients run flat out; on a machine with fewer cores
+than clients plus server, that saturates the CPU and every endpoint slows
+down with it. ``--wiki-rate`` holds them to a fixed number of pages per
+second instead.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+from pathlib import Path
+from typing import List
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+SAVED_SITE_DIR = backend_dir / "saved_site"
+
+
+def populate(items: int) -> None:
+    """Fill the database named by DATABASE_URL with tasks built from saved_site."""
+    from benchmarks.highlight_scaling import build_items
+    from db.db import drop_tasks_table, init_models
+    from preprocessing.wikipedia_processor import WikipediaProcessor
+
+    async def run():
+        await drop_tasks_table()
+        await init_models()
+        processor = WikipediaProcessor(SAVED_SITE_DIR)
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump(build_items(processor, items), f)
+        try:
+            await processor.process_anli_file(f.name)
+        finally:
+            os.unlink(f.name)
+            Path(f"{f.name}.checkpoint.jsonl").unlink(missing_ok=True)
+
+    asyncio.run(run())
+
+
+def serve(port: int) -> None:
+    """Run the API against saved_site in this process."""
+    import uvicorn
+
+    import preprocessing.wikipedia_processor as wikipedia_processor
+    wikipedia_processor.DEFAULT_SAVED_DIR = SAVED_SITE_DIR
+    from main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def measure(
+    base_url: str,
+    page_names: List[str],
+    requests: int,
+    concurrency: int,
+    warm: bool = False,
+    wiki_rate: float = 0,
+) -> None:
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=httpx.Limits(max_connections=concurrency + 4)) as client:
+        # Wait for the server to come up
+        for _ in range(200):
+            try:
+                if (await client.get("/api/tasks/rand")).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+        else:
+            raise RuntimeError("API did not start")
+
+        async def sample(path: str) -> List[float]:
+            latencies = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                response = await client.get(path)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            return latencies
+
+        def report(label: str, latencies: List[float]) -> None:
+            print(
+                f"{label:<24} p50={percentile(latencies, 50) * 1000:7.1f}ms "
+                f"p95={percentile(latencies, 95) * 1000:7.1f}ms p99={percentile(latencies, 99) * 1000:7.1f}ms"
+            )
+
+        report("/ idle", await sample("/"))
+        report("rand idle", await sample("/api/tasks/rand"))
+
+        if warm:
+            # Steady state for a render cache that holds the corpus: every page rendered once
+            for name in page_names:
+                (await client.get(f"/api/wiki/{name}")).raise_for_status()
+
+        pages_served = 0
+        stop = asyncio.Event()
+
+        host, port = urllib.parse.urlsplit(base_url).netloc.split(":")
+
+        async def hammer():
+            nonlocal pages_served
+            next_request = time.perf_counter() + random.random() * concurrency / wiki_rate if wiki_rate else 0
+            while not stop.is_set():
+                if wiki_rate:
+                    await asyncio.sleep(max(0.0, next_request - time.perf_counter()))
+                    next_request += concurrency / wiki_rate
+                # Plain sockets with bodies discarded unparsed: the client shares the
+                # machine with the server, so its own CPU use must stay small
+                reader, writer = await asyncio.open_connection(host, int(port))
+                path = urllib.parse.quote(f"/api/wiki/{random.choice(page_names)}")
+                writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+                status = await reader.readline()
+                if b" 200 " not in status:
+                    raise RuntimeError(f"{path}: {status.decode().strip()}")
+                while await reader.read(1 << 20):
+                    pass
+                writer.close()
+                pages_served += 1
+
+        hammers = [asyncio.create_task(hammer()) for _ in range(concurrency)]
+        start = time.perf_counter()
+        probe = await sample("/")
+        loaded = await sample("/api/tasks/rand")
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await asyncio.gather(*hammers)
+
+        load = f"{concurrency} wiki" + (f" @{wiki_rate:g}/s" if wiki_rate else "")
+        report(f"/ + {load}", probe)
+        report(f"rand + {load}", loaded)
+        print(f"wiki pages served meanwhile: {pages_served} ({pages_served / elapsed:.0f}/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure /api/tasks/rand latency under /api/wiki load")
+    parser.add_argument("--items", type=int, default=40, help="Tasks to create in the temporary database (default: 40)")
+    parser.add_argument("--requests", type=int, default=200, help="/api/tasks/rand requests per phase (default: 200)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent /api/wiki clients (default: 8)")
+    parser.add_argument(
+        "--render-cache-mb",
+        type=int,
+        default=0,
+        help="Server render cache size; 0 makes every page a miss (default: 0)"
+    )
+    parser.add_argument(
+        "--wiki-rate",
+        type=float,
+        default=0,
+        help="Total /api/wiki requests per second across clients; 0 runs them flat out (default: 0)"
+    )
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--populate", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.populate:
+        return populate(args.items)
+    if args.serve:
+        return serve(args.serve)
+
+    page_names = sorted(path.stem for path in (SAVED_SITE_DIR / "en.wikipedia.org" / "wiki").glob("*.html"))
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite+aiosqlite:///{tmp}/bench.db",
+            "SESSION_SECRET": os.environ.get("SESSION_SECRET", "benchmark"),
+            "WIKI_RENDER_CACHE_MB": str(args.render_cache_mb),
+        }
+        print(f"📝 Creating {args.items} tasks...")
+        subprocess.run(
+            [sys.executable, __file__, "--populate", "--items", str(args.items)],
+            env=env, check=True, stdout=subprocess.DEVNULL
+        )
+
+        print(f"🚀 Serving on port {port} ({len(page_names)} local pages, render cache {args.render_cache_mb} MB)")
+        server = subprocess.Popen(
+            [sys.executable, __file__, "--serve", str(port)],
+            env=env, cwd=backend_dir, stdout=subprocess.DEVNULL
+        )
+        try:
+            asyncio.run(measure(
+                f"http://127.0.0.1:{port}", page_names, args.requests, args.concurrency,
+                warm=args.render_cache_mb > 0, wiki_rate=args.wiki_rate,
+            ))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Compressed storage format for page HTML.
+A page is split into fixed-size character blocks, each compressed as its
+own raw deflate segment that ends on a sync flush (byte-aligned, never the
+final block). Segments concatenate into one valid deflate stream, so a
+highlighted page can be sent with ``Content-Encoding: gzip`` as a single
+gzip member: re-compress only the few blocks that receive highlight markup,
+copy every other block's bytes as stored, and finish with one trailer whose
+CRC is combined from the per-block CRCs.
+
+Blob layout: ``FORMAT_MARKER``, a little-endian header (block size in
+characters, text length in characters, ``<head>`` offset, block count),
+one ``(compressed length, CRC-32, byte length)`` entry per block, then the
+segments back to back. Values with ``LEGACY_FORMAT_MARKER`` hold one gzip
+member per block; values without a marker are plain, uncompressed HTML.
+"""
+
+import gzip
+import struct
+import zlib
+from typing import List, Tuple, Union
+
+from preprocessing.highlight_markup import highlight_insertions, render_highlights
+
+FORMAT_MARKER = b"WFGZ2\n"
+# Written before pages were single-stream; still read, and served by recompressing
+LEGACY_FORMAT_MARKER = b"WFGZ1\n"
+BLOCK_CHARS = 64 * 1024
+COMPRESS_LEVEL = 6
+
+HEADER = struct.Struct("<IIiI")
+BLOCK_ENTRY = struct.Struct("<III")
+# Fixed gzip header: deflate, no name, mtime 0, unknown OS
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+# An empty final deflate block, ending the stream the segments started
+DEFLATE_END = b"\x03\x00"
+
+
+def is_compressed(value: Union[str, bytes, None]) -> bool:
+    """True if a stored value uses a block-compressed format."""
+    return isinstance(value, bytes) and (value.startswith(FORMAT_MARKER) or value.startswith(LEGACY_FORMAT_MARKER))
+
+
+def compress_html(html_content: str, block_chars: int = BLOCK_CHARS) -> bytes:
+    """Encode HTML in the block-deflate format."""
+    blocks = [
+        html_content[start:start + block_chars].encode("utf-8")
+        for start in range(0, len(html_content), block_chars)
+    ]
+    segments = [_deflate_segment(data) for data in blocks]
+    header = HEADER.pack(block_chars, len(html_content), html_content.find("<head>"), len(segments))
+    entries = b"".join(
+        BLOCK_ENTRY.pack(len(segment), zlib.crc32(data), len(data)) for segment, data in zip(segments, blocks)
+    )
+    return b"".join([FORMAT_MARKER, header, entries, *segments])
+
+
+def decompress_html(value: Union[str, bytes]) -> str:
+    """Decode a stored value back to HTML, whichever format it is in."""
+    if not is_compressed(value):
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+    if value.startswith(LEGACY_FORMAT_MARKER):
+        _, members = _split_legacy(value)
+        return gzip.decompress(b"".join(members)).decode("utf-8")
+    _, blocks = _split(value)
+    return zlib.decompressobj(-zlib.MAX_WBITS).decompress(b"".join(segment for segment, _, _ in blocks)).decode("utf-8")
+
+
+def render_highlights_gzip(value: bytes, segments: List[Tuple[int, int]]) -> bytes:
+    """Highlighted page as a single-member gzip stream, built from a block-compressed blob.
+
+    Decompresses to exactly ``render_highlights(decompress_html(value), segments)``.
+    """
+    if value.startswith(LEGACY_FORMAT_MARKER):
+        return gzip.compress(render_highlights(decompress_html(value), segments).encode("utf-8"), COMPRESS_LEVEL, mtime=0)
+
+    (block_chars, length, head, _), blocks = _split(value)
+    insertions = highlight_insertions(head, segments)
+
+    if not blocks:
+        return gzip.compress("".join(markup for _, markup in insertions).encode("utf-8"), COMPRESS_LEVEL, mtime=0)
+
+    by_block: List[List[Tuple[int, str]]] = [[] for _ in blocks]
+    for offset, markup in insertions:
+        # Markup at the very end of the page goes at the end of the last block
+        block = min(offset // block_chars, len(blocks) - 1)
+        by_block[block].append((offset - block * block_chars, markup))
+
+    out = [GZIP_HEADER]
+    crc = 0
+    size = 0
+    for (segment, block_crc, block_size), block_insertions in zip(blocks, by_block):
+        if block_insertions:
+            text = zlib.decompressobj(-zlib.MAX_WBITS).decompress(segment).decode("utf-8")
+            pieces = []
+            position = 0
+            for offset, markup in block_insertions:
+                pieces.append(text[position:offset])
+                pieces.append(markup)
+                position = offset
+            pieces.append(text[position:])
+            data = "".join(pieces).encode("utf-8")
+            segment, block_crc, block_size = _deflate_segment(data), zlib.crc32(data), len(data)
+        out.append(segment)
+        crc = _crc32_combine(crc, block_crc, block_size)
+        size += block_size
+    out.append(DEFLATE_END)
+    out.append(struct.pack("<II", crc, size & 0xFFFFFFFF))
+    return b"".join(out)
+
+
+def _deflate_segment(data: bytes) -> bytes:
+    """Raw deflate for ``data`` ending on a sync flush, so segments can be concatenated."""
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def _crc32_combine(crc1: int, crc2: int, length2: int) -> int:
+    """CRC-32 of ``A + B`` from ``crc32(A)``, ``crc32(B)`` and ``len(B)``."""
+    # CRC-32 is affine, so shifting crc1 over len(B) zero bytes lines it up with crc2
+    zeros = bytes(length2)
+    return zlib.crc32(zeros, crc1) ^ zlib.crc32(zeros) ^ crc2
+
+
+def _split(value: bytes) -> Tuple[Tuple[int, int, int, int], List[Tuple[bytes, int, int]]]:
+    position = len(FORMAT_MARKER)
+    header = HEADER.unpack_from(value, position)
+    position += HEADER.size
+    entries = [BLOCK_ENTRY.unpack_from(value, position + i * BLOCK_ENTRY.size) for i in range(header[3])]
+    position += BLOCK_ENTRY.size * header[3]
+    blocks = []
+    for segment_length, block_crc, block_size in entries:
+        blocks.append((value[position:position + segment_length], block_crc, block_size))
+        position += segment_length
+    return header, blocks
+
+
+def _split_legacy(value: bytes) -> Tuple[Tuple[int, int, int, int], List[bytes]]:
+    position = len(LEGACY_FORMAT_MARKER)
+    header = HEADER.unpack_from(value, position)
+    position += HEADER.size
+    count = header[3]
+    lengths = struct.unpack_from(f"<{count}I", value, position)
+    position += 4 * count
+    members = []
+    for member_length in lengths:
+        members.append(value[position:position + member_length])
+        position += member_length
+    return header, members
@@ -37,9 +37,12 @@ async def drop_all_tables() -> None:
 
 
 async def drop_tasks_table() -> None:
-    """Drop and recreate only the tasks table."""
+    """Drop and recreate only the tasks table and the pages it highlights."""
+    from db.pages_ops import Page
     from db.tasks_ops import Task
     async with engine.begin() as conn:
         await conn.run_sync(Task.__table__.drop, checkfirst=True)
+        await conn.run_sync(Page.__table__.drop, checkfirst=True)
+        await conn.run_sync(Page.__table__.create, checkfirst=True)
         await conn.run_sync(Task.__table__.create, checkfirst=True)
 
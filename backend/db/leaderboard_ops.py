@@ -0,0 +1,219 @@
+import asyncio
+import base64
+import json
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import select, tuple_
+from .db import AsyncSessionLocal
+from .user_ops import User
+
+# How many of the top users are kept in memory
+LEADERBOARD_SNAPSHOT_SIZE = int(os.getenv("LEADERBOARD_SNAPSHOT_SIZE", "100"))
+# Re-read from the table after this long, to pick up points awarded by other workers
+LEADERBOARD_REFRESH_SECONDS = 30.0
+# Events a slow stream subscriber may fall behind before it is resynced with a full snapshot
+LEADERBOARD_QUEUE_SIZE = 32
+# Rows an offset page may skip past the end of the snapshot; deeper pages need a cursor
+LEADERBOARD_MAX_SKIP = 1000
+
+# Leaderboard rows never need the profile picture
+LEADERBOARD_COLUMNS = (User.id, User.name, User.email, User.points, User.completed_tasks)
+
+
+def leaderboard_entry(user) -> Dict:
+    """Public leaderboard fields of a user row (or a ``LEADERBOARD_COLUMNS`` row)."""
+    return {
+        "id": user.id,
+        "name": user.name or user.email,
+        "points": user.points,
+        "completed_tasks": user.completed_tasks,
+    }
+
+
+def leaderboard_key(entry: Dict) -> Tuple[int, str]:
+    """Sort key for leaderboard order: points, then ID, both descending."""
+    return entry["points"], entry["id"]
+
+
+def encode_leaderboard_cursor(entry: Dict, rank: int) -> str:
+    """Opaque cursor pointing just past a user in ``(points, id)`` order."""
+    raw = f"{entry['points']}|{entry['id']}|{rank}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_leaderboard_cursor(cursor: str) -> Tuple[int, str, int]:
+    """Parse a cursor from encode_leaderboard_cursor into ``(points, id, rank)``; raises ValueError if malformed."""
+    try:
+        points, user_id, rank = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 2)
+        return int(points), user_id, int(rank)
+    except (UnicodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class LeaderboardSnapshot:
+    """The top users by points, kept in memory and pushed to stream subscribers as it changes.
+
+    Points only ever grow, so a committed user row is enough to update the
+    snapshot exactly: the user either moves within it, enters it, or stays
+    out. A periodic refresh from the table covers changes made by other
+    processes.
+    """
+
+    def __init__(self, size: int = LEADERBOARD_SNAPSHOT_SIZE):
+        self.size = size
+        self.entries: List[Dict] = []
+        # True when the snapshot holds every user, so any page can be served from it
+        self.complete = False
+        self.version = 0
+        self.loaded_at = 0.0
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    def stale(self) -> bool:
+        return time.monotonic() - self.loaded_at >= LEADERBOARD_REFRESH_SECONDS
+
+    async def refresh(self) -> None:
+        """Reload the top users from the table (walks ``ix_users_points_id``)."""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(*LEADERBOARD_COLUMNS)
+                .order_by(User.points.desc(), User.id.desc())
+                .limit(self.size + 1)
+            )
+            entries = [leaderboard_entry(row) for row in result.all()]
+        self.loaded_at = time.monotonic()
+        self._update(entries[:self.size], len(entries) <= self.size)
+
+    def record(self, user: User) -> None:
+        """Apply a user's committed points."""
+        if not self.loaded_at:
+            # The first refresh reads it from the table
+            return
+        entry = leaderboard_entry(user)
+        entries = [current for current in self.entries if current["id"] != entry["id"]]
+        in_snapshot = len(entries) < len(self.entries)
+        if not (in_snapshot or self.complete or (entries and leaderboard_key(entry) > leaderboard_key(entries[-1]))):
+            return
+        entries.append(entry)
+        entries.sort(key=leaderboard_key, reverse=True)
+        complete = self.complete and len(entries) <= self.size
+        self._update(entries[:self.size], complete)
+
+    def page(self, offset: int, limit: int) -> Optional[List[Dict]]:
+        """Ranked entries ``offset`` to ``offset + limit`` (one extra if there are more), or None if not all held."""
+        end = offset + limit + 1
+        if end > len(self.entries) and not self.complete:
+            return None
+        return [{**entry, "rank": offset + i + 1} for i, entry in enumerate(self.entries[offset:end])]
+
+    def page_after(self, points: int, user_id: str, rank: int, limit: int) -> Optional[List[Dict]]:
+        """Ranked entries after a cursor position (one extra if there are more), or None if not all held."""
+        after = [entry for entry in self.entries if leaderboard_key(entry) < (points, user_id)]
+        if len(after) < limit + 1 and not self.complete:
+            return None
+        return [{**entry, "rank": rank + i + 1} for i, entry in enumerate(after[:limit + 1])]
+
+    def ranked(self) -> List[Dict]:
+        return [{**entry, "rank": i + 1} for i, entry in enumerate(self.entries)]
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=LEADERBOARD_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def _update(self, entries: List[Dict], complete: bool) -> None:
+        """Swap in new entries and push the rank changes to subscribers."""
+        old = {entry["id"]: {**entry, "rank": i + 1} for i, entry in enumerate(self.entries)}
+        self.entries = entries
+        self.complete = complete
+        changes = [entry for entry in self.ranked() if old.pop(entry["id"], None) != entry]
+        # Users pushed out of the snapshot
+        changes.extend({"id": user_id, "rank": None} for user_id in old)
+        if not changes:
+            return
+        self.version += 1
+        event = {"type": "rank_changes", "version": self.version, "changes": changes}
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Too far behind for deltas; it gets the whole snapshot instead
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "snapshot"})
+
+
+leaderboard = LeaderboardSnapshot()
+
+
+async def get_leaderboard_page(
+    limit: int,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict], Optional[str]]:
+    """One page of the leaderboard, best first, with each user's rank.
+
+    Pages within the snapshot come from memory. Deeper pages are read from
+    the table, keyset-paginated on ``(points, id)``: from the cursor of a
+    previous page, or else from the snapshot's last user, skipping at most
+    ``LEADERBOARD_MAX_SKIP`` rows to reach the offset.
+
+    Args:
+        limit: Maximum number of users to return
+        offset: Users to skip (ignored with a cursor)
+        cursor: Cursor returned with the previous page
+
+    Returns:
+        The ranked users and the cursor for the next page (None on the last page)
+    """
+    if leaderboard.stale():
+        await leaderboard.refresh()
+
+    if cursor:
+        points, user_id, rank = decode_leaderboard_cursor(cursor)
+        users = leaderboard.page_after(points, user_id, rank, limit)
+        if users is None:
+            stmt = (
+                select(*LEADERBOARD_COLUMNS)
+                .where(tuple_(User.points, User.id) < tuple_(points, user_id))
+                .order_by(User.points.desc(), User.id.desc())
+                .limit(limit + 1)
+            )
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(stmt)
+                users = [{**leaderboard_entry(row), "rank": rank + i + 1} for i, row in enumerate(result.all())]
+    else:
+        users = leaderboard.page(offset, limit)
+        if users is None:
+            # Whatever part of the page the snapshot holds, then the rest from the table after its last user
+            held = [{**entry, "rank": offset + i + 1} for i, entry in enumerate(leaderboard.entries[offset:offset + limit + 1])]
+            skip = max(0, offset - len(leaderboard.entries))
+            if skip > LEADERBOARD_MAX_SKIP:
+                raise ValueError(f"Offset {offset} is too deep; page with the X-Next-Cursor cursor instead")
+            stmt = (
+                select(*LEADERBOARD_COLUMNS)
+                .order_by(User.points.desc(), User.id.desc())
+                .offset(skip)
+                .limit(limit + 1 - len(held))
+            )
+            if leaderboard.entries:
+                last = leaderboard.entries[-1]
+                stmt = stmt.where(tuple_(User.points, User.id) < tuple_(last["points"], last["id"]))
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(stmt)
+                users = held + [
+                    {**leaderboard_entry(row), "rank": offset + len(held) + i + 1} for i, row in enumerate(result.all())
+                ]
+
+    if len(users) <= limit:
+        return users, None
+    users = users[:limit]
+    return users, encode_leaderboard_cursor(users[-1], users[-1]["rank"])
+
+
+def leaderboard_event(event: Dict) -> str:
+    """A leaderboard event as a server-sent event frame."""
+    return f"event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
@@ -0,0 +1,81 @@
+import asyncio
+import hashlib
+from datetime import datetime, UTC
+from typing import Dict, Iterable, List, Optional, Union
+
+from sqlalchemy import Column, String, Integer, DateTime, LargeBinary, Index, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .compressed_html import compress_html, decompress_html
+from .db import AsyncSessionLocal, Base
+
+
+class Page(Base):
+    """A rewritten Wikipedia page, stored once and shared by every task that cites it.
+
+    The ID is the SHA-256 of the HTML, so a new revision of a page gets a
+    new row while identical content is never stored twice.
+    """
+    __tablename__ = "pages"
+    __table_args__ = (
+        Index('ix_pages_page_name', 'page_name'),
+        {"extend_existing": True}
+    )
+
+    id = Column(String(64), primary_key=True)
+    page_name = Column(String, nullable=False)
+    revision = Column(Integer, nullable=True)  # Wikipedia revision ID, if the page carried one
+    # URLs rewritten, anchors stripped, no highlighting; block-gzip compressed (see compressed_html)
+    html = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(UTC))
+
+
+def page_id(html_content: str) -> str:
+    """Content address of a page's HTML."""
+    return hashlib.sha256(html_content.encode("utf-8")).hexdigest()
+
+
+def page_row(page_name: str, html_content: str, revision: Optional[int] = None, content_id: Optional[str] = None) -> dict:
+    """Map a rewritten page onto a row of the pages table (``content_id`` skips re-hashing)."""
+    return {
+        "id": content_id or page_id(html_content),
+        "page_name": page_name,
+        "revision": revision,
+        "html": html_content,
+    }
+
+
+async def insert_pages(session: AsyncSession, rows: Iterable[dict]) -> None:
+    """Insert page rows inside the caller's transaction, skipping pages already stored.
+    
+    Rows carry plain HTML; it is compressed here, so only pages that are
+    actually written pay for it.
+    """
+    rows = list(rows)
+    if rows:
+        rows = await asyncio.to_thread(lambda: [{**row, "html": compress_html(row["html"])} for row in rows])
+        await session.execute(sqlite_insert(Page).on_conflict_do_nothing(index_elements=["id"]), rows)
+
+
+async def get_page_html(page_id: str) -> Optional[str]:
+    """Get the base HTML of a single page by its ID."""
+    pages = await get_pages_html([page_id])
+    return pages.get(page_id)
+
+
+async def get_pages_html(page_ids: Iterable[str]) -> Dict[str, str]:
+    """Get the base HTML of several pages in one query, keyed by page ID."""
+    stored = await get_pages_stored(page_ids)
+    # Decompressing a large page takes milliseconds; keep it off the event loop
+    return await asyncio.to_thread(lambda: {page_id: decompress_html(value) for page_id, value in stored.items()})
+
+
+async def get_pages_stored(page_ids: Iterable[str]) -> Dict[str, Union[str, bytes]]:
+    """Get pages exactly as stored (compressed, or plain if written before compression), keyed by page ID."""
+    ids: List[str] = list({page_id for page_id in page_ids if page_id})
+    if not ids:
+        return {}
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(Page.id, Page.html).where(Page.id.in_(ids)))
+        return {row.id: row.html for row in result}
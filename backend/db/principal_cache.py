@@ -0,0 +1,81 @@
+"""
+In-memory cache for request authentication.
+Verified JWTs (token → user ID) and slim user principals (user ID →
+principal) are kept for a short TTL in size-bounded LRUs, so an
+authenticated request needs neither a signature check nor a DB round
+trip. Principals are dropped explicitly whenever the user row changes;
+the TTL bounds staleness from changes made by other processes.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+
+class PrincipalCache:
+    """Two TTL-bounded LRUs: verified tokens and user principals."""
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL, max_entries: int = AUTH_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._tokens: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._principals: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def token_subject(self, token: str) -> Optional[str]:
+        """User ID of a token verified within the TTL, or None."""
+        return self._get(self._tokens, token)
+
+    def remember_token(self, token: str, user_id: str, expires: Optional[float] = None) -> None:
+        """Cache a verified token, never past its own ``exp`` (a Unix timestamp)."""
+        lifetime = self.ttl if expires is None else min(self.ttl, expires - time.time())
+        if lifetime > 0:
+            self._put(self._tokens, token, user_id, lifetime)
+
+    def principal(self, user_id: str) -> Optional[Any]:
+        return self._get(self._principals, user_id)
+
+    def remember_principal(self, user_id: str, principal: Any) -> None:
+        self._put(self._principals, user_id, principal, self.ttl)
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop a user's principal; their tokens stay verified."""
+        with self._lock:
+            self._principals.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+            self._principals.clear()
+
+    def stats(self) -> str:
+        return f"tokens={len(self._tokens)} principals={len(self._principals)} hits={self.hits} misses={self.misses}"
+
+    def _get(self, entries: OrderedDict, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del entries[key]
+                self.misses += 1
+                return None
+            entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def _put(self, entries: OrderedDict, key: str, value: Any, lifetime: float) -> None:
+        with self._lock:
+            entries[key] = (time.monotonic() + lifetime, value)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+
+principal_cache = PrincipalCache()
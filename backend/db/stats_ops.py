@@ -0,0 +1,146 @@
+import time
+from typing import Dict, Optional
+from sqlalchemy import Column, Integer, func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from .db import AsyncSessionLocal, Base
+from .user_ops import User
+
+# Counters cached in memory are re-read from the table after this many seconds
+PLATFORM_STATS_TTL = 5.0
+
+PLATFORM_COUNTERS = ("total_users", "total_completed_tasks", "total_points_awarded")
+
+
+class PlatformCounters(Base):
+    """Running platform totals, one row, kept in step with the users table.
+
+    Updated in the same transaction as the user changes they count, so
+    ``/api/stats/platform`` never has to aggregate over users.
+    """
+    __tablename__ = "platform_counters"
+    __table_args__ = {"extend_existing": True}
+
+    id = Column(Integer, primary_key=True, default=1)
+    total_users = Column(Integer, nullable=False, default=0)
+    total_completed_tasks = Column(Integer, nullable=False, default=0)
+    total_points_awarded = Column(Integer, nullable=False, default=0)
+
+
+class PlatformStatsCache:
+    """Last read of the counters row, re-read once it is ``ttl`` seconds old."""
+
+    def __init__(self, ttl: float = PLATFORM_STATS_TTL):
+        self.ttl = ttl
+        self.counters: Optional[Dict[str, int]] = None
+        self.loaded_at = 0.0
+
+    def fresh(self) -> Optional[Dict[str, int]]:
+        if self.counters is not None and time.monotonic() - self.loaded_at < self.ttl:
+            return self.counters
+        return None
+
+    def store(self, counters: Dict[str, int]) -> None:
+        self.counters = counters
+        self.loaded_at = time.monotonic()
+
+    def apply(self, **deltas: int) -> None:
+        """Fold in this process's own committed changes without waiting for a re-read."""
+        if self.counters is not None:
+            self.counters = {name: value + deltas.get(name, 0) for name, value in self.counters.items()}
+
+
+platform_stats_cache = PlatformStatsCache()
+
+
+async def bump_platform_counters(session: AsyncSession, **deltas: int) -> None:
+    """Add to the counters as part of the caller's transaction.
+
+    If the row is missing (e.g. a database created by ``init_models`` before
+    ``ensure_platform_counters`` ran), it is created from the users table,
+    which already includes the caller's flushed changes.
+
+    Call ``platform_stats_cache.apply`` with the same deltas once it commits.
+    """
+    increments = {name: getattr(PlatformCounters, name) + delta for name, delta in deltas.items() if delta}
+    if not increments:
+        return
+    result = await session.execute(update(PlatformCounters).where(PlatformCounters.id == 1).values(increments))
+    if result.rowcount:
+        return
+    counters = await compute_platform_counters(session)
+    # Another process may create the row first; its totals can't include this uncommitted change
+    await session.execute(
+        sqlite_insert(PlatformCounters)
+        .values(id=1, **counters)
+        .on_conflict_do_update(index_elements=["id"], set_=increments)
+    )
+    print("📊 Platform counters row was missing; recreated from the users table")
+
+
+async def compute_platform_counters(session: AsyncSession) -> Dict[str, int]:
+    """The counters recomputed from the users table (one aggregate query)."""
+    result = await session.execute(
+        select(func.count(User.id), func.sum(User.completed_tasks), func.sum(User.points))
+    )
+    users, completed_tasks, points = result.one()
+    return {
+        "total_users": users,
+        "total_completed_tasks": completed_tasks or 0,
+        "total_points_awarded": points or 0,
+    }
+
+
+async def read_platform_counters(session: AsyncSession) -> Optional[Dict[str, int]]:
+    row = await session.get(PlatformCounters, 1, populate_existing=True)
+    return {name: getattr(row, name) for name in PLATFORM_COUNTERS} if row else None
+
+
+async def reconcile_platform_counters(fix: bool = True) -> Dict[str, Dict[str, int]]:
+    """Recompute the counters from scratch and compare with the stored ones.
+
+    Returns ``{counter: {"stored": ..., "actual": ...}}`` for every counter
+    that drifted (all of them if the row is missing). With ``fix`` the row
+    is rewritten with the recomputed values in the same transaction.
+    """
+    async with AsyncSessionLocal() as session:
+        actual = await compute_platform_counters(session)
+        stored = await read_platform_counters(session)
+        drift = {
+            name: {"stored": stored[name] if stored else None, "actual": actual[name]}
+            for name in PLATFORM_COUNTERS
+            if not stored or stored[name] != actual[name]
+        }
+        if fix and drift:
+            row = await session.get(PlatformCounters, 1)
+            if row is None:
+                session.add(PlatformCounters(id=1, **actual))
+            else:
+                for name, value in actual.items():
+                    setattr(row, name, value)
+            await session.commit()
+            platform_stats_cache.store(actual)
+    return drift
+
+
+async def ensure_platform_counters() -> None:
+    """Create the counters row from the users table if it doesn't exist yet."""
+    async with AsyncSessionLocal() as session:
+        if await session.get(PlatformCounters, 1) is not None:
+            return
+    await reconcile_platform_counters()
+    print("📊 Platform counters initialized from the users table")
+
+
+async def get_platform_counters() -> Dict[str, int]:
+    """Platform totals, from memory unless the cached copy is older than the TTL."""
+    counters = platform_stats_cache.fresh()
+    if counters is not None:
+        return counters
+    async with AsyncSessionLocal() as session:
+        counters = await read_platform_counters(session)
+    if counters is None:
+        await reconcile_platform_counters()
+        return platform_stats_cache.counters
+    platform_stats_cache.store(counters)
+    return counters
@@ -1,8 +1,19 @@
-from typing import List, Optional
-from sqlalchemy import select, ForeignKey, Column, String, DateTime, Boolean, Text, Index
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import insert, select, tuple_, ForeignKey, Column, String, DateTime, Boolean, Float, Text, Index
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from .db import AsyncSessionLocal, Base
-from db.user_ops import User
+from db.compressed_html import is_compressed, render_highlights_gzip
+from db.pages_ops import Page, get_pages_html, get_pages_stored, insert_pages
+from db.user_ops import User, record_user_points
+from db.stats_ops import bump_platform_counters, platform_stats_cache
+from preprocessing.highlight_markup import MARKUP_VERSION, render_highlight_section, render_highlights
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import random
 import uuid
 from datetime import datetime, UTC
 from enum import Enum as PyEnum
@@ -24,6 +35,9 @@ class Task(Base):
         # Composite index for open tasks ordered by date (most common query pattern)
         Index('ix_tasks_status_created_at', 'status', 'created_at'),
         
+        # Random sampling of open tasks: seek to a random point in rand_key order
+        Index('ix_tasks_status_rand_key', 'status', 'rand_key'),
+        
         {"extend_existing": True}
     )
 
@@ -43,7 +57,17 @@ class Task(Base):
     evidence_text_span = Column(Text, nullable=True)  # Specific span from evidence
     evidence_url = Column(String, nullable=True)
     
-    # Pre-processed highlighted HTML content
+    # Highlights: a shared base page plus JSON [[start, end], ...] HTML ranges into it
+    # (the first range carries the scroll anchor), rendered on serve
+    claim_page_id = Column(String(64), ForeignKey("pages.id"), nullable=True)
+    claim_highlight_ranges = Column(Text, nullable=True)
+    evidence_page_id = Column(String(64), ForeignKey("pages.id"), nullable=True)
+    evidence_highlight_ranges = Column(Text, nullable=True)
+    # Content hashes of the rendered highlights, computed at creation for HTTP ETags
+    claim_etag = Column(String(64), nullable=True)
+    evidence_etag = Column(String(64), nullable=True)
+    
+    # Legacy pre-rendered highlighted HTML, only set on tasks not yet migrated to ranges
     claim_highlighted_html = Column(Text, nullable=True)  # Full HTML with highlighting for claim
     evidence_highlighted_html = Column(Text, nullable=True)  # Full HTML with highlighting for evidence
     
@@ -61,6 +85,9 @@ class Task(Base):
     created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(UTC))
     updated_at = Column(DateTime, nullable=False, default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC))
     
+    # Uniform random sort key used by get_random_open_task
+    rand_key = Column(Float, nullable=False, default=random.random)
+    
 
 async def get_task(task_id: str) -> Optional[Task]:
     """Get a single task by its ID."""
@@ -83,19 +110,89 @@ async def get_open_tasks() -> List[Task]:
         result = await session.execute(stmt)
         return list(result.scalars().all())
 
-async def get_random_open_task() -> Optional[Task]:
-    """Get a random task that is in OPEN status."""
-    # First get all open tasks
-    open_tasks = await get_open_tasks()
-    if not open_tasks:
-        return None
+# Columns for task listings; the highlight columns are fetched per task only
+TASK_SUMMARY_COLUMNS = (
+    Task.id,
+    Task.claim_sentence,
+    Task.claim_context,
+    Task.claim_document_title,
+    Task.claim_text_span,
+    Task.evidence_sentence,
+    Task.evidence_context,
+    Task.evidence_document_title,
+    Task.evidence_text_span,
+    Task.llm_analysis,
+    Task.contradiction_type,
+    Task.status,
+    Task.created_at,
+)
+
+def encode_task_cursor(created_at: datetime, task_id: str) -> str:
+    """Opaque cursor pointing just past a task in ``(created_at, id)`` order."""
+    raw = f"{created_at.isoformat()}|{task_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_task_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Parse a cursor from encode_task_cursor; raises ValueError if it is malformed."""
+    try:
+        created_at, task_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(created_at), task_id
+    except (UnicodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+async def get_open_task_page(limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Row], Optional[str]]:
+    """Get one page of open tasks, oldest first, with summary columns only.
+    
+    Pages are keyset-paginated on ``(created_at, id)`` within OPEN status,
+    which walks ``ix_tasks_status_created_at`` instead of counting past an
+    offset, so every page costs the same however deep it is.
+    
+    Args:
+        limit: Maximum number of tasks to return
+        cursor: Cursor returned with the previous page, or None for the first page
+        
+    Returns:
+        The rows and the cursor for the next page (None on the last page)
+    """
+    stmt = (
+        select(*TASK_SUMMARY_COLUMNS)
+        .where(Task.status == TaskStatus.OPEN)
+        .order_by(Task.created_at, Task.id)
+        .limit(limit + 1)
+    )
+    if cursor:
+        created_at, task_id = decode_task_cursor(cursor)
+        stmt = stmt.where(tuple_(Task.created_at, Task.id) > tuple_(created_at, task_id))
+    
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(stmt)
+        rows = list(result.all())
     
-    # Randomly select a task ID
-    import random
-    random_task = random.choice(open_tasks)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_task_cursor(rows[-1].created_at, rows[-1].id)
+
+async def get_random_open_task() -> Optional[Task]:
+    """Get a random task that is in OPEN status.
     
-    # Get the full task details using get_task
-    return await get_task(random_task.id)
+    Seeks to a random point in ``rand_key`` order and takes the next open
+    task, wrapping around to the first one, so it costs one or two indexed
+    lookups regardless of how many tasks there are.
+    """
+    point = random.random()
+    async with AsyncSessionLocal() as session:
+        for condition in (Task.rand_key >= point, Task.rand_key < point):
+            stmt = (
+                select(Task)
+                .where(Task.status == TaskStatus.OPEN, condition)
+                .order_by(Task.rand_key)
+                .limit(1)
+            )
+            task = (await session.execute(stmt)).scalar_one_or_none()
+            if task:
+                return task
+    return None
 
 async def complete_task(
     task_id: str,
@@ -135,13 +232,207 @@ async def complete_task(
         print(f"Awarding {points} points to user")
         user.add_points(points)
         user.increment_completed_tasks()
+        counter_deltas = {"total_completed_tasks": 1, "total_points_awarded": points}
+        await bump_platform_counters(session, **counter_deltas)
         
         await session.commit()
+        platform_stats_cache.apply(**counter_deltas)
+        record_user_points(user)
         print(f"=== Task completion successful ===")
         print(f"Task ID: {task_id}")
         print(f"User ID: {user_id}")
         return True
 
+HIGHLIGHT_ROLES = ("claim", "evidence")
+
+def encode_highlight_ranges(ranges: Optional[List[Tuple[int, int]]]) -> Optional[str]:
+    """Serialize highlight ranges for the ``*_highlight_ranges`` columns."""
+    if not ranges:
+        return None
+    return json.dumps([[start, end] for start, end in ranges], separators=(",", ":"))
+
+def decode_highlight_ranges(value: Optional[str]) -> List[Tuple[int, int]]:
+    """Parse a ``*_highlight_ranges`` column value."""
+    if not value:
+        return []
+    return [(start, end) for start, end in json.loads(value)]
+
+async def get_highlighted_html(task: Task, role: str) -> Optional[str]:
+    """Highlighted page HTML for a task's ``"claim"`` or ``"evidence"``, or None if it has none."""
+    return (await get_highlighted_html_many([task])).get(task.id, {}).get(role)
+
+async def get_highlighted_html_many(tasks: Iterable[Task]) -> Dict[str, Dict[str, str]]:
+    """Render the highlighted pages of several tasks, loading each base page once.
+    
+    Returns ``{task_id: {role: html}}``; roles without highlights are left out.
+    """
+    tasks = list(tasks)
+    pages = await get_pages_html(
+        getattr(task, f"{role}_page_id") for task in tasks for role in HIGHLIGHT_ROLES
+    )
+    
+    def render() -> Dict[str, Dict[str, str]]:
+        rendered: Dict[str, Dict[str, str]] = {}
+        for task in tasks:
+            roles = rendered.setdefault(task.id, {})
+            for role in HIGHLIGHT_ROLES:
+                base_html = pages.get(getattr(task, f"{role}_page_id"))
+                if base_html is not None:
+                    roles[role] = render_highlights(base_html, decode_highlight_ranges(getattr(task, f"{role}_highlight_ranges")))
+                elif getattr(task, f"{role}_highlighted_html"):
+                    roles[role] = getattr(task, f"{role}_highlighted_html")
+        return rendered
+    
+    return await asyncio.to_thread(render)
+
+async def get_highlighted_gzip(task: Task, role: str) -> Optional[bytes]:
+    """Highlighted page for a task's ``"claim"`` or ``"evidence"`` as a gzip stream.
+    
+    Built from the stored compressed page without decompressing it as a
+    whole. Returns None for tasks that only have legacy highlighted HTML.
+    """
+    page_id = getattr(task, f"{role}_page_id")
+    stored = (await get_pages_stored([page_id])).get(page_id)
+    if stored is None:
+        return None
+    ranges = decode_highlight_ranges(getattr(task, f"{role}_highlight_ranges"))
+    if is_compressed(stored):
+        return await asyncio.to_thread(render_highlights_gzip, stored, ranges)
+    return await asyncio.to_thread(lambda: gzip.compress(render_highlights(stored, ranges).encode("utf-8"), mtime=0))
+
+async def get_highlighted_section(task: Task, role: str) -> Optional[str]:
+    """Section-first document for a task's ``"claim"`` or ``"evidence"`` highlight.
+    
+    Just the section holding the highlight, which then loads the full page
+    itself. None for legacy rows or when the highlight isn't in an article section.
+    """
+    page_id = getattr(task, f"{role}_page_id")
+    base_html = (await get_pages_html([page_id])).get(page_id)
+    if base_html is None:
+        return None
+    ranges = decode_highlight_ranges(getattr(task, f"{role}_highlight_ranges"))
+    return await asyncio.to_thread(render_highlight_section, base_html, ranges)
+
+def highlight_etag(page_id: Optional[str], ranges: Optional[List[Tuple[int, int]]]) -> Optional[str]:
+    """Content hash of a rendered highlight, from the page's content ID and the ranges."""
+    if not page_id:
+        return None
+    return hashlib.sha256(f"{page_id}|{encode_highlight_ranges(ranges)}".encode("utf-8")).hexdigest()[:32]
+
+async def get_highlight_etag(task_id: str, role: str) -> Optional[str]:
+    """ETag value for a task's ``"claim"`` or ``"evidence"`` highlight, without loading any HTML.
+    
+    The stored content hash is combined with the markup version, so a
+    markup change invalidates every cached copy.
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(getattr(Task, f"{role}_etag")).where(Task.id == task_id))
+        etag = result.scalar_one_or_none()
+    return f"{etag}.m{MARKUP_VERSION}" if etag else None
+
+def task_row_from_anli(
+    anli_result: dict,
+    claim_highlighted_html: Optional[str] = None,
+    evidence_highlighted_html: Optional[str] = None,
+    claim_page_id: Optional[str] = None,
+    claim_highlight_ranges: Optional[List[Tuple[int, int]]] = None,
+    evidence_page_id: Optional[str] = None,
+    evidence_highlight_ranges: Optional[List[Tuple[int, int]]] = None,
+) -> dict:
+    """Map an ANLI result dictionary onto a row of the tasks table.
+    
+    Highlights are normally given as a page ID plus ranges into that page;
+    the ``*_highlighted_html`` arguments only fill the legacy columns.
+    """
+    now = datetime.now(UTC)
+    return {
+        "id": str(uuid.uuid4()),
+        
+        # Claim part
+        "claim_sentence": anli_result.get("claim", ""),
+        "claim_context": anli_result.get("claim_context", ""),
+        "claim_document_title": anli_result.get("document_title", ""),
+        "claim_text_span": anli_result.get("claim_text_span", ""),
+        "claim_url": anli_result.get("document_url", ""),
+        "claim_page_id": claim_page_id,
+        "claim_highlight_ranges": encode_highlight_ranges(claim_highlight_ranges),
+        "claim_etag": highlight_etag(claim_page_id, claim_highlight_ranges),
+        "claim_highlighted_html": claim_highlighted_html,
+        
+        # Evidence part
+        "evidence_sentence": anli_result.get("evidence_sentence", ""),
+        "evidence_context": anli_result.get("evidence", ""),
+        "evidence_document_title": anli_result.get("evidence_document_title", ""),
+        "evidence_text_span": anli_result.get("evidence_sentence", ""),
+        "evidence_url": anli_result.get("evidence_url", ""),
+        "evidence_page_id": evidence_page_id,
+        "evidence_highlight_ranges": encode_highlight_ranges(evidence_highlight_ranges),
+        "evidence_etag": highlight_etag(evidence_page_id, evidence_highlight_ranges),
+        "evidence_highlighted_html": evidence_highlighted_html,
+        
+        # LLM analysis
+        "llm_analysis": anli_result.get("llm_report", {}).get("analysis", ""),
+        "contradiction_type": anli_result.get("llm_report", {}).get("contradiction_type", ""),
+        
+        "status": TaskStatus.OPEN,
+        "created_at": now,
+        "updated_at": now,
+        "rand_key": random.random(),
+    }
+
+class TaskBatchWriter:
+    """Buffer task rows and insert them with executemany, one transaction per batch.
+    
+    IDs are generated up front, so no per-row ``refresh`` is needed. Page
+    rows the tasks point at are inserted in the same transaction, once::
+    
+        writer = TaskBatchWriter(batch_size=500)
+        for item in items:
+            await writer.add(task_row_from_anli(item, ...), pages=[page_row(...)])
+        await writer.flush()
+        task_ids = writer.written_ids
+    """
+    
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+        self.pending: List[dict] = []
+        self.pending_pages: Dict[str, dict] = {}
+        self.written_ids: List[str] = []
+        self.written_page_ids: set = set()
+    
+    async def add(self, row: dict, pages: Iterable[dict] = ()) -> List[str]:
+        """Buffer a row (and the pages it references); returns the IDs written if this filled a batch."""
+        for page in pages:
+            if page["id"] not in self.written_page_ids:
+                self.pending_pages.setdefault(page["id"], page)
+        self.pending.append(row)
+        if len(self.pending) >= self.batch_size:
+            return await self.flush()
+        return []
+    
+    async def flush(self) -> List[str]:
+        """Write all buffered rows and return their IDs in insertion order."""
+        ids = []
+        while self.pending:
+            batch = self.pending[:self.batch_size]
+            ids.extend(await self.write(batch, list(self.pending_pages.values())))
+            del self.pending[:len(batch)]
+            self.pending_pages.clear()
+        self.written_ids.extend(ids)
+        return ids
+    
+    async def write(self, rows: List[dict], pages: Iterable[dict] = ()) -> List[str]:
+        """Insert ``rows`` and any new ``pages`` in a single transaction and return the task IDs."""
+        if not rows:
+            return []
+        pages = [page for page in pages if page["id"] not in self.written_page_ids]
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                await insert_pages(session, pages)
+                await session.execute(insert(Task), rows)
+        self.written_page_ids.update(page["id"] for page in pages)
+        return [row["id"] for row in rows]
+
 async def create_task_from_anli_result(anli_result: dict) -> str:
     """Create a new task from an ANLI result dictionary.
     
@@ -151,50 +442,24 @@ async def create_task_from_anli_result(anli_result: dict) -> str:
     Returns:
         The ID of the created task
     """
-    async with AsyncSessionLocal() as session:
-        task = Task(
-            # Claim part
-            claim_sentence=anli_result.get("claim", ""),
-            claim_context=anli_result.get("claim_context", ""),
-            claim_document_title=anli_result.get("document_title", ""),
-            claim_text_span=anli_result.get("claim_text_span", ""),
-            claim_url=anli_result.get("document_url", ""),
-            
-            # Evidence part
-            evidence_sentence=anli_result.get("evidence_sentence", ""),
-            evidence_context=anli_result.get("evidence", ""),
-            evidence_document_title=anli_result.get("evidence_document_title", ""),
-            evidence_text_span=anli_result.get("evidence_sentence", ""),
-            evidence_url=anli_result.get("evidence_url", ""),
-            
-            # LLM analysis
-            llm_analysis=anli_result.get("llm_report", {}).get("analysis", ""),
-            contradiction_type=anli_result.get("llm_report", {}).get("contradiction_type", ""),
-            
-            status=TaskStatus.OPEN
-        )
-        
-        session.add(task)
-        await session.commit()
-        await session.refresh(task)
-        
-        return task.id
+    task_ids = await TaskBatchWriter().write([task_row_from_anli(anli_result)])
+    return task_ids[0]
 
-async def create_tasks_from_anli_json(anli_results: List[dict]) -> List[str]:
+async def create_tasks_from_anli_json(anli_results: List[dict], batch_size: int = 500) -> List[str]:
     """Create multiple tasks from a list of ANLI results.
     
     Args:
         anli_results: List of ANLI result dictionaries
+        batch_size: Number of rows inserted per transaction
         
     Returns:
         List of created task IDs
     """
-    task_ids = []
+    writer = TaskBatchWriter(batch_size)
     for result in anli_results:
-        task_id = await create_task_from_anli_result(result)
-        task_ids.append(task_id)
-    
-    return task_ids
+        await writer.add(task_row_from_anli(result))
+    await writer.flush()
+    return writer.written_ids
 
 async def load_tasks_from_json_file(file_path: str) -> List[str]:
     """Load tasks from an ANLI JSON file.
@@ -1,18 +1,25 @@
 import uuid
 import jwt
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional, List
 import json
 
-from sqlalchemy import Column, String, Integer, select, DateTime
+from sqlalchemy import Column, String, Integer, select, DateTime, Index
 from fastapi_users_db_sqlalchemy import SQLAlchemyBaseUserTable
 
 from .db import Base, AsyncSessionLocal, JWT_SECRET, JWT_ALGORITHM, ACCESS_TOKEN_EXPIRE_DAYS
+from .principal_cache import principal_cache
+from .user_ranks import user_ranks
 
 
 class User(SQLAlchemyBaseUserTable[uuid.UUID], Base):
     __tablename__ = "users"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        # Leaderboard order and its keyset pagination
+        Index('ix_users_points_id', 'points', 'id'),
+        {"extend_existing": True},
+    )
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     hashed_password = Column(String(1024), nullable=True)
@@ -91,6 +98,41 @@ class User(SQLAlchemyBaseUserTable[uuid.UUID], Base):
         self.referral_count += 1
 
 
+@dataclass(frozen=True)
+class UserPrincipal:
+    """The authenticated user as request handlers see it: the user row without the heavy columns."""
+    id: str
+    email: str
+    name: Optional[str]
+    points: int
+    completed_tasks: int
+    referral_code: Optional[str]
+    referral_count: int
+
+    @classmethod
+    def from_user(cls, user) -> "UserPrincipal":
+        """Principal from a ``User`` or a ``PRINCIPAL_COLUMNS`` row."""
+        return cls(*(getattr(user, field) for field in cls.__dataclass_fields__))
+
+
+PRINCIPAL_COLUMNS = tuple(getattr(User, field) for field in UserPrincipal.__dataclass_fields__)
+
+
+async def get_user_principal(user_id: str) -> Optional[UserPrincipal]:
+    """Slim principal for a user, from the auth cache or one narrow select."""
+    principal = principal_cache.principal(user_id)
+    if principal is not None:
+        return principal
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(*PRINCIPAL_COLUMNS).where(User.id == user_id))
+        row = result.one_or_none()
+    if row is None:
+        return None
+    principal = UserPrincipal.from_user(row)
+    principal_cache.remember_principal(user_id, principal)
+    return principal
+
+
 async def get_user_by_id(user_id: str) -> Optional[User]:
     """Get user by ID."""
     async with AsyncSessionLocal() as session:
@@ -113,6 +155,7 @@ async def get_or_create_user(
     referral_code: Optional[str] = None,
 ) -> User:
     """Get existing user or create new one."""
+    from .stats_ops import bump_platform_counters, platform_stats_cache  # Import here to avoid circular imports
     async with AsyncSessionLocal() as session:
         # Look up existing user
         result = await session.execute(select(User).where(User.email == email))
@@ -134,16 +177,27 @@ async def get_or_create_user(
         user.generate_referral_code()
         
         # If user was referred, set referred_by and give points to referrer
+        referrer = None
         if referral_code:
-            referrer = await get_user_by_referral_code(referral_code)
+            # Loaded in this session so the referrer's points are saved with the new user
+            result = await session.execute(select(User).where(User.referral_code == referral_code))
+            referrer = result.scalar_one_or_none()
             if referrer:
                 user.referred_by = referrer.id
                 referrer.add_points(50)  # Give 50 points to referrer
                 referrer.increment_referral_count()
         
         session.add(user)
+        counter_deltas = {"total_users": 1, "total_points_awarded": 50 if referrer else 0}
+        await bump_platform_counters(session, **counter_deltas)
         await session.commit()
         await session.refresh(user)
+        platform_stats_cache.apply(**counter_deltas)
+        record_user_points(user)
+        if referrer:
+            record_user_points(referrer)
+        # Ready for the token issued right after signup
+        principal_cache.remember_principal(user.id, UserPrincipal.from_user(user))
         
         # CRITICAL FIX: Ensure user is accessible in a new session before returning
         # This prevents race conditions with subsequent token validation
@@ -164,6 +218,31 @@ async def get_or_create_user(
         return verified_user
 
 
+async def load_user_ranks() -> int:
+    """Rebuild the in-memory rank index from the users table; returns the user count."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(User.id, User.points))
+        count = user_ranks.rebuild(result.all())
+    print(f"🏆 Rank index loaded for {count} users")
+    return count
+
+
+def record_user_points(user: User) -> None:
+    """Bring the rank index, leaderboard snapshot and auth cache up to date with a committed user row."""
+    from .leaderboard_ops import leaderboard  # Import here to avoid circular imports
+    principal_cache.invalidate(user.id)
+    user_ranks.set_points(user.id, user.points)
+    leaderboard.record(user)
+
+
+def get_user_rank(user: UserPrincipal) -> int:
+    """A user's rank by points (1 + users with more points), from the rank index."""
+    # Another worker may have awarded the points; points only grow, so the higher value is current
+    if user.points > user_ranks.points.get(user.id, -1):
+        user_ranks.set_points(user.id, user.points)
+    return user_ranks.rank(user.points)
+
+
 async def get_user_completed_tasks(user_id: str) -> List:
     """Get all tasks completed by a user, sorted by most recent."""
     from .tasks_ops import Task  # Import here to avoid circular imports
@@ -185,6 +264,7 @@ async def update_user_topics(user_id: str, topics: List[str]) -> bool:
             return False
         user.set_topics(topics)
         await session.commit()
+        principal_cache.invalidate(user_id)
         return True
 
 
@@ -197,6 +277,7 @@ async def update_user_languages(user_id: str, languages: List[str]) -> bool:
             return False
         user.set_languages(languages)
         await session.commit()
+        principal_cache.invalidate(user_id)
         return True
 
 
@@ -0,0 +1,87 @@
+"""
+In-memory rank index for user points.
+A Fenwick tree over point values counts users per score, so a user's rank
+(1 + users with more points) is two prefix sums instead of a table scan.
+The index mirrors ``users.points``: it is rebuilt from the table at startup
+and updated whenever points are awarded.
+"""
+
+import threading
+from typing import Dict, Iterable, Tuple
+
+
+class PointsRanking:
+    """Order statistics over users' points, keyed by user ID."""
+
+    def __init__(self, capacity: int = 1024):
+        self.points: Dict[str, int] = {}
+        self._tree = [0] * (capacity + 1)
+        self._lock = threading.Lock()
+
+    def rebuild(self, users: Iterable[Tuple[str, int]]) -> int:
+        """Replace the index with ``(user_id, points)`` pairs; returns the user count."""
+        points = {user_id: user_points or 0 for user_id, user_points in users}
+        with self._lock:
+            self.points = points
+            self._resize(max(points.values(), default=0) + 1)
+            return len(self.points)
+
+    def set_points(self, user_id: str, points: int) -> None:
+        """Record a user's current points (adding the user if new)."""
+        if points < 0:
+            raise ValueError(f"Negative points for user {user_id}: {points}")
+        with self._lock:
+            old = self.points.get(user_id)
+            if old == points:
+                return
+            if points >= len(self._tree) - 1:
+                self.points[user_id] = points
+                self._resize(points + 1)
+                return
+            if old is not None:
+                self._add(old, -1)
+            self._add(points, 1)
+            self.points[user_id] = points
+
+    def rank(self, points: int) -> int:
+        """Competition rank of a score: 1 + the number of users with more points."""
+        with self._lock:
+            if points >= len(self._tree) - 1:
+                return 1
+            return 1 + len(self.points) - self._count_at_most(points)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _add(self, points: int, delta: int) -> None:
+        i = points + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _count_at_most(self, points: int) -> int:
+        i = points + 1
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _resize(self, needed: int) -> None:
+        """Rebuild the tree from ``points`` with room for scores below ``needed`` (doubling)."""
+        capacity = max(len(self._tree) - 1, 1)
+        while capacity < needed:
+            capacity *= 2
+        tree = [0] * (capacity + 1)
+        for points in self.points.values():
+            tree[points + 1] += 1
+        # Linear-time construction: push each node's count to its parent
+        for i in range(1, capacity + 1):
+            parent = i + (i & -i)
+            if parent <= capacity:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+
+# Shared by the API process; loaded by ``load_user_ranks`` at startup
+user_ranks = PointsRanking()
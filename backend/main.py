@@ -1,9 +1,10 @@
 import os
+import asyncio
 import json
 import base64
 import requests
 from fastapi import FastAPI, Request, Response, Depends, HTTPException, status
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from authlib.integrations.starlette_client import OAuth
@@ -11,8 +12,16 @@ from starlette.config import Config
 from starlette.middleware.sessions import SessionMiddleware
 from dotenv import load_dotenv
 from db.db import init_models
-from db.user_ops import User, get_user_by_id, get_or_create_user, get_user_completed_tasks, update_user_topics, update_user_languages
-from db.tasks_ops import get_task, get_open_tasks, complete_task, get_random_open_task
+from db.user_ops import (
+    User, UserPrincipal, get_user_by_id, get_or_create_user, get_user_completed_tasks, update_user_topics,
+    update_user_languages, get_user_principal, get_user_rank, load_user_ranks,
+)
+from db.principal_cache import principal_cache
+from db.leaderboard_ops import get_leaderboard_page, leaderboard, leaderboard_event
+from db.stats_ops import ensure_platform_counters, get_platform_counters
+from db.tasks_ops import get_task, get_open_task_page, complete_task, get_random_open_task, get_highlighted_html_many
+from preprocessing import wikipedia_processor
+from preprocessing.page_pack import move_legacy_pack
 from pydantic import BaseModel, field_validator
 from sqlalchemy import select, func
 from db.db import AsyncSessionLocal
@@ -36,32 +45,40 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include the Wikipedia router
-from api.wikipedia import router as wikipedia_router
+from api.wikipedia import router as wikipedia_router, shutdown_page_render_executor, static_manifest
 app.include_router(wikipedia_router, prefix="/api")
 
 # JWT Authentication
 security = HTTPBearer()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
-    """Get the current user from the JWT token."""
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> UserPrincipal:
+    """Get the current user from the JWT token.
+    
+    Verified tokens and user principals are cached briefly, so a repeat
+    request is authenticated without a signature check or a DB query.
+    """
     token = credentials.credentials
-    payload = User.verify_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    user_id = principal_cache.token_subject(token)
+    if user_id is None:
+        payload = User.verify_token(token)
+        if not payload:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid authentication credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        user_id = payload["sub"]
+        principal_cache.remember_token(token, user_id, payload.get("exp"))
     
-    user = await get_user_by_id(payload["sub"])
+    user = await get_user_principal(user_id)
     if not user:
         # ROBUSTNESS FIX: Retry once for newly created users (race condition protection)
-        import asyncio
         await asyncio.sleep(0.1)
-        user = await get_user_by_id(payload["sub"])
+        user = await get_user_principal(user_id)
         
         if not user:
             raise HTTPException(
@@ -74,7 +91,17 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 
 @app.on_event("startup")
 async def on_startup():
-    await init_models() 
+    await init_models()
+    await load_user_ranks()
+    await ensure_platform_counters()
+    await leaderboard.refresh()
+    await asyncio.to_thread(static_manifest.build)
+    # Before any page is read or a render worker opens the pack
+    await asyncio.to_thread(move_legacy_pack, wikipedia_processor.DEFAULT_SAVED_DIR)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await asyncio.to_thread(shutdown_page_render_executor)
 
 config = Config('.env')
 oauth = OAuth(config)
@@ -226,22 +253,43 @@ def logout(response: Response):
     response.delete_cookie("session")  # Remove session cookie if set
     return {"message": "Logged out successfully"}
 
-def include_highlighted_html(task_data: dict, task_obj) -> dict:
-    """Include pre-processed highlighted HTML content directly in the task data."""
+def include_highlighted_html(task_data: dict, highlighted: dict) -> dict:
+    """Include pre-processed highlighted HTML content directly in the task data.
+    
+    ``highlighted`` maps roles to HTML, as returned per task by get_highlighted_html_many.
+    """
     
     # Include highlighted HTML directly instead of URLs
     if task_data.get("claim", {}):
-        task_data["claim"]["highlighted_html"] = task_obj.claim_highlighted_html or ""
+        task_data["claim"]["highlighted_html"] = highlighted.get("claim", "")
     
     if task_data.get("evidence", {}):
-        task_data["evidence"]["highlighted_html"] = task_obj.evidence_highlighted_html or ""
+        task_data["evidence"]["highlighted_html"] = highlighted.get("evidence", "")
     
     return task_data
 
+TASK_PAGE_SIZE = 50
+MAX_TASK_PAGE_SIZE = 200
+
 @app.get("/api/tasks")
-async def get_tasks(current_user: User = Depends(get_current_user)):
-    """Get all tasks."""
-    tasks = await get_open_tasks()
+async def get_tasks(
+    response: Response,
+    limit: int = TASK_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """Get a page of open tasks, oldest first.
+    
+    The next page's cursor is sent in the ``X-Next-Cursor`` header. The
+    listing carries no highlighted HTML; fetch it per task instead.
+    """
+    try:
+        tasks, next_cursor = await get_open_task_page(max(1, min(limit, MAX_TASK_PAGE_SIZE)), cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
     task_list = []
     for task in tasks:
         task_data = {
@@ -264,8 +312,7 @@ async def get_tasks(current_user: User = Depends(get_current_user)):
             "difficulty": "Medium",
             "status": task.status.value,
         }
-        # Include highlighted HTML directly
-        task_list.append(include_highlighted_html(task_data, task))
+        task_list.append(task_data)
     
     return task_list
 
@@ -301,12 +348,13 @@ async def get_random_task():
     }
     
     # Include highlighted HTML directly
-    return include_highlighted_html(task_data, task)
+    highlighted = await get_highlighted_html_many([task])
+    return include_highlighted_html(task_data, highlighted[task.id])
 
 import asyncio
 
 @app.get("/api/tasks/{task_id}")
-async def get_task_by_id(task_id: str, current_user: User = Depends(get_current_user)):
+async def get_task_by_id(task_id: str, current_user: UserPrincipal = Depends(get_current_user)):
     """Get a single task by ID."""
     await asyncio.sleep(1)  # Artificial 1 second delay 
     task = await get_task(task_id)
@@ -336,7 +384,8 @@ async def get_task_by_id(task_id: str, current_user: User = Depends(get_current_
     }
     
     # Include highlighted HTML directly
-    return include_highlighted_html(task_data, task)
+    highlighted = await get_highlighted_html_many([task])
+    return include_highlighted_html(task_data, highlighted[task.id])
 
 class TaskSubmission(BaseModel):
     agrees_with_claim: bool
@@ -353,7 +402,7 @@ class TaskSubmission(BaseModel):
 async def submit_task(
     task_id: str,
     submission: TaskSubmission,
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Submit a solution for a task."""
     print(f"=== Task submission started ===")
@@ -386,7 +435,7 @@ async def submit_task(
 @app.get("/api/users/{user_id}/completed-tasks")
 async def get_user_completed_tasks_count(
     user_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Get the number of tasks completed by a user."""
     # Only allow users to get their own completed tasks count
@@ -403,7 +452,7 @@ async def get_user_completed_tasks_count(
 @app.get("/api/users/{user_id}/stats")
 async def get_user_stats(
     user_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Get user statistics including points, completed tasks, badges, and rank."""
     # Only allow users to get their own stats
@@ -413,19 +462,14 @@ async def get_user_stats(
             detail="Not authorized to view other users' stats"
         )
     
-    async with AsyncSessionLocal() as session:
-        # Calculate user's rank based on points
-        rank_result = await session.execute(
-            select(func.count(User.id))
-            .where(User.points > current_user.points)
-        )
-        user_rank = rank_result.scalar_one() + 1
-        
-        print(f"=== User Stats ===")
-        print(f"User ID: {current_user.id}")
-        print(f"Points: {current_user.points}")
-        print(f"Completed Tasks: {current_user.completed_tasks}")
-        print(f"Rank: {user_rank}")
+    # Calculate user's rank based on points (in-memory index, no table scan)
+    user_rank = get_user_rank(current_user)
+    
+    print(f"=== User Stats ===")
+    print(f"User ID: {current_user.id}")
+    print(f"Points: {current_user.points}")
+    print(f"Completed Tasks: {current_user.completed_tasks}")
+    print(f"Rank: {user_rank}")
     
     return {
         "points": current_user.points,
@@ -437,7 +481,7 @@ async def get_user_stats(
 @app.get("/api/users/{user_id}/completed-tasks/list")
 async def get_user_completed_tasks_list(
     user_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Get all tasks completed by a user, sorted by most recent."""
     # Only allow users to get their own completed tasks
@@ -450,6 +494,7 @@ async def get_user_completed_tasks_list(
     await asyncio.sleep(1)
     
     tasks = await get_user_completed_tasks(user_id)
+    highlighted = await get_highlighted_html_many(tasks)
     task_list = []
     for task in tasks:
         task_data = {
@@ -474,69 +519,90 @@ async def get_user_completed_tasks_list(
             "points_earned": 25 if not task.user_agrees else 10  # More points for disagreeing
         }
         # Include highlighted HTML directly
-        task_list.append(include_highlighted_html(task_data, task))
+        task_list.append(include_highlighted_html(task_data, highlighted[task.id]))
     
     return task_list
 
+LEADERBOARD_PAGE_SIZE = 10
+MAX_LEADERBOARD_PAGE_SIZE = 100
+# Comment frames keep idle leaderboard streams open through proxies
+LEADERBOARD_KEEPALIVE_SECONDS = 15.0
+
 @app.get("/api/leaderboard")
 async def get_leaderboard(
-    limit: int = 10,
-    offset: int = 0
+    response: Response,
+    limit: int = LEADERBOARD_PAGE_SIZE,
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
-    """Get the top users by points."""
-    async with AsyncSessionLocal() as session:
-        # Get total users count
-        total_count = await session.execute(select(func.count(User.id)))
-        total_users = total_count.scalar_one()
+    """Get the top users by points.
+    
+    The next page's cursor is sent in the ``X-Next-Cursor`` header; pass it
+    back instead of an offset to page deep into the leaderboard.
+    """
+    try:
+        users, next_cursor = await get_leaderboard_page(max(1, min(limit, MAX_LEADERBOARD_PAGE_SIZE)), max(0, offset), cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
+    counters = await get_platform_counters()
+    return {
+        "total_users": counters["total_users"],
+        "users": users
+    }
 
-        # Get top users
-        result = await session.execute(
-            select(User)
-            .order_by(User.points.desc())
-            .offset(offset)
-            .limit(limit)
-        )
-        users = result.scalars().all()
-
-        return {
-            "total_users": total_users,
-            "users": [
-                {
-                    "id": user.id,
-                    "name": user.name or user.email,
-                    "points": user.points,
-                    "completed_tasks": user.completed_tasks,
-                    "rank": offset + i + 1
-                }
-                for i, user in enumerate(users)
-            ]
-        }
+@app.get("/api/leaderboard/stream")
+async def stream_leaderboard():
+    """Server-sent events for the top of the leaderboard.
+    
+    Starts with a ``snapshot`` event holding the ranked top users, then
+    sends ``rank_changes`` events with just the users whose rank or points
+    changed (``rank`` null for users who dropped out of the top).
+    """
+    async def events():
+        queue = leaderboard.subscribe()
+        try:
+            yield leaderboard_event({"type": "snapshot", "version": leaderboard.version, "users": leaderboard.ranked()})
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=LEADERBOARD_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Quiet here; pick up points awarded by other workers
+                    if leaderboard.stale():
+                        await leaderboard.refresh()
+                    yield ": keepalive\n\n"
+                    continue
+                if event["type"] == "snapshot":
+                    event = {"type": "snapshot", "version": leaderboard.version, "users": leaderboard.ranked()}
+                yield leaderboard_event(event)
+        finally:
+            leaderboard.unsubscribe(queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.get("/api/stats/platform")
 async def get_platform_stats():
     """Get overall platform statistics."""
-    async with AsyncSessionLocal() as session:
-        # Get total users
-        total_users = await session.execute(select(func.count(User.id)))
-        total_users_count = total_users.scalar_one()
-
-        # Get total completed tasks
-        total_tasks = await session.execute(select(func.sum(User.completed_tasks)))
-        total_completed_tasks = total_tasks.scalar_one() or 0
-
-        # Get total points awarded
-        total_points = await session.execute(select(func.sum(User.points)))
-        total_points_awarded = total_points.scalar_one() or 0
-
-        # Get average points per user
-        avg_points = total_points_awarded / total_users_count if total_users_count > 0 else 0
-
-        return {
-            "total_users": total_users_count,
-            "total_completed_tasks": total_completed_tasks,
-            "total_points_awarded": total_points_awarded,
-            "average_points_per_user": round(avg_points, 2)
-        }
+    # Maintained counters, cached in memory; no aggregates over users
+    counters = await get_platform_counters()
+    total_users_count = counters["total_users"]
+    total_points_awarded = counters["total_points_awarded"]
+
+    # Get average points per user
+    avg_points = total_points_awarded / total_users_count if total_users_count > 0 else 0
+
+    return {
+        "total_users": total_users_count,
+        "total_completed_tasks": counters["total_completed_tasks"],
+        "total_points_awarded": total_points_awarded,
+        "average_points_per_user": round(avg_points, 2)
+    }
 
 class UserInterests(BaseModel):
     topics: List[str]
@@ -546,7 +612,7 @@ class UserInterests(BaseModel):
 async def save_user_interests(
     user_id: str,
     interests: UserInterests,
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Save user's topics and languages."""
     # Only allow users to update their own interests
@@ -572,7 +638,7 @@ async def save_user_interests(
 @app.get("/api/users/{user_id}/interests")
 async def get_user_interests_api(
     user_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Get user's topics and languages."""
     # Only allow users to get their own interests
@@ -587,7 +653,7 @@ async def get_user_interests_api(
 @app.get("/api/users/{user_id}/referral")
 async def get_user_referral_info(
     user_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Get user's referral information."""
     # Only allow users to get their own referral info
@@ -609,7 +675,7 @@ async def get_user_referral_info(
 @app.get("/api/users/{user_id}/referrals")
 async def get_user_referrals(
     user_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Get list of users referred by this user."""
     # Only allow users to get their own referrals
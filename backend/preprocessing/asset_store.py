@@ -0,0 +1,130 @@
+"""
+Content-addressed store for page requisites (stylesheets, scripts, images).
+Each distinct file is kept once, as ``blobs/<h0h1>/<h2h3>/<sha256>``, however
+many names it was saved under. An append-only JSONL index maps the names
+the mirror uses (wget layout, query string included) to content hashes.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Store directory, next to ``en.wikipedia.org`` in a saved_site
+ASSET_STORE_DIR = "assets"
+# Pages under ``en.wikipedia.org``; everything else there is a requisite
+PAGES_DIR = "wiki"
+# Top-level entries of ``en.wikipedia.org`` that are never requisites: the pages,
+# and a page pack (with its compaction directory) written there by older versions
+NON_REQUISITES = {PAGES_DIR, "pages.pack", "pages.idx", ".compact"}
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """Write to a temp file in the same directory, then rename over the target."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class AssetStore:
+    """Deduplicated blob store with a name → hash index."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.index_path = self.root / "index.jsonl"
+        self.names: Dict[str, str] = {}
+        self._index_offset = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_saved_dir(cls, saved_dir: Path) -> "AssetStore":
+        return cls(Path(saved_dir) / ASSET_STORE_DIR)
+
+    def load(self) -> int:
+        """Read index entries appended since the last load; returns how many names are known."""
+        with self._lock:
+            if not self.index_path.exists():
+                return len(self.names)
+            with open(self.index_path, "rb") as f:
+                f.seek(self._index_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # A torn final line; pick it up once it is complete
+                        break
+                    self._index_offset += len(line)
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.names[entry["name"]] = entry["sha256"]
+            return len(self.names)
+
+    def blob_path(self, digest: str) -> Path:
+        """Where the blob with a given SHA-256 lives (fanned out over two directory levels)."""
+        return self.root / "blobs" / digest[:2] / digest[2:4] / digest
+
+    def resolve(self, name: str) -> Optional[Tuple[str, Path]]:
+        """Hash and blob path stored under ``name``, or None."""
+        digest = self.names.get(name)
+        return (digest, self.blob_path(digest)) if digest else None
+
+    def items(self) -> List[Tuple[str, str]]:
+        """``(name, sha256)`` for every stored name."""
+        with self._lock:
+            return list(self.names.items())
+
+    def put(self, name: str, data: bytes) -> str:
+        """Store ``data`` under ``name``; the blob is only written if its content is new."""
+        digest = hashlib.sha256(data).hexdigest()
+        blob = self.blob_path(digest)
+        if not blob.exists():
+            atomic_write(blob, data)
+        self._record(name, digest)
+        return digest
+
+    def put_file(self, name: str, path: Path, move: bool = False) -> Tuple[str, bool]:
+        """Store an existing file under ``name``; returns its hash and whether the blob is new.
+
+        With ``move`` the original is removed once the blob and its index
+        entry exist, so an interrupted move never loses a file.
+        """
+        with open(path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        blob = self.blob_path(digest)
+        is_new = not blob.exists()
+        if is_new:
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=blob.parent, prefix=".tmp-")
+            os.close(fd)
+            try:
+                # A hard link costs no copy when the store is on the same filesystem
+                os.unlink(tmp_path)
+                os.link(path, tmp_path)
+            except OSError:
+                shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, blob)
+        self._record(name, digest)
+        if move:
+            os.unlink(path)
+        return digest, is_new
+
+    def _record(self, name: str, digest: str) -> None:
+        with self._lock:
+            if self.names.get(name) == digest:
+                return
+            self.root.mkdir(parents=True, exist_ok=True)
+            line = json.dumps({"name": name, "sha256": digest}, ensure_ascii=False) + "\n"
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(line)
+            # The offset isn't advanced, so load() still sees lines other processes appended before this one
+            self.names[name] = digest
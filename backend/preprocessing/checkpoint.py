@@ -0,0 +1,134 @@
+"""
+Checkpoint manifest for resumable preprocessing.
+One JSON line is appended per created task, after its DB transaction
+commits. The line records a hash of the ANLI item, the revisions of the
+pages it was highlighted against and the highlighter version. A rerun
+with --resume skips items whose checkpoint still matches, so an
+interrupted run picks up where it stopped.
+"""
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Union
+
+REVISION_PATTERN = re.compile(r'"wgRevisionId":(\d+)')
+
+
+def item_hash(anli_item: Dict) -> str:
+    """Stable content hash of an ANLI item (key order does not matter)."""
+    canonical = json.dumps(anli_item, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def page_revision(html_content: str) -> Optional[int]:
+    """Wikipedia revision ID embedded in a saved page's config block."""
+    match = REVISION_PATTERN.search(html_content)
+    return int(match.group(1)) if match else None
+
+
+def file_state(path: str) -> Optional[Dict[str, int]]:
+    """Change detector for a loose page file, or None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def read_file(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def checkpoint_key(anli_hash: str, revisions: Iterable[Optional[int]], highlighter_version: Union[int, str]) -> str:
+    """Combine item hash, page revisions and highlighter version into one key."""
+    parts = [anli_hash, *(str(revision) for revision in revisions), f"v{highlighter_version}"]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class CheckpointManifest:
+    """Append-only JSONL manifest of processed ANLI items."""
+
+    def __init__(
+        self,
+        path: Path,
+        highlighter_version: Union[int, str],
+        page_state: Callable[[str], Optional[Dict[str, int]]] = file_state,
+        read_page: Callable[[str], str] = read_file,
+    ):
+        self.path = Path(path)
+        self.highlighter_version = highlighter_version
+        # How to tell whether a page changed, and to read it if it did (pages may be packed)
+        self.page_state = page_state
+        self.read_page = read_page
+        self.entries: Dict[str, Dict] = {}
+
+    def load(self) -> int:
+        """Read existing entries; returns how many were loaded."""
+        if not self.path.exists():
+            return 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave a torn final line; everything before it is intact
+                    continue
+                self.entries[entry["item"]] = entry
+        return len(self.entries)
+
+    def reset(self) -> None:
+        """Start a fresh manifest."""
+        self.entries = {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text("", encoding="utf-8")
+
+    def is_done(self, anli_hash: str) -> bool:
+        """True if the item was processed with the current highlighter and unchanged pages."""
+        entry = self.entries.get(anli_hash)
+        if not entry or entry["version"] != self.highlighter_version:
+            return False
+
+        revisions = []
+        for path, recorded in entry["pages"].items():
+            state = self.page_state(path)
+            if state is None:
+                return False
+            if all(recorded.get(key) == value for key, value in state.items()):
+                revisions.append(recorded["revision"])
+            else:
+                # Only re-read a page that changed since it was checkpointed
+                revisions.append(page_revision(self.read_page(path)))
+
+        return checkpoint_key(anli_hash, revisions, self.highlighter_version) == entry["key"]
+
+    def record_many(self, records: Iterable[Dict]) -> None:
+        """Append entries for committed tasks.
+
+        Each record has ``item`` (item hash), ``task_id``, ``pages``
+        mapping local page paths to their revision IDs and optionally
+        ``tiers``, the matcher tier that found each span.
+        """
+        lines = []
+        for record in records:
+            pages = {}
+            for path, revision in record["pages"].items():
+                pages[str(path)] = {"revision": revision, **(self.page_state(str(path)) or {})}
+            entry = {
+                "item": record["item"],
+                "key": checkpoint_key(record["item"], [p["revision"] for p in pages.values()], self.highlighter_version),
+                "version": self.highlighter_version,
+                "task_id": record["task_id"],
+                "tiers": record.get("tiers"),
+                "pages": pages,
+            }
+            self.entries[entry["item"]] = entry
+            lines.append(json.dumps(entry, ensure_ascii=False) + "\n")
+
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
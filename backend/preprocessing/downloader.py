@@ -0,0 +1,265 @@
+"""
+Async Wikipedia downloader for WikiFix preprocessing.
+Replaces one-wget-per-page with a single pooled httpx client: pages and
+their same-site requisites (CSS/JS/images) are fetched once per run, with
+per-host concurrency limits, retries with backoff and atomic writes into
+the saved_site layout.
+
+Live pages link with root-relative URLs (``/w/load.php?...``,
+``/static/images/...``) that only resolve against en.wikipedia.org. Like
+``wget --convert-links``, pages are saved with saved requisites pointing
+at ``/api/wiki-static`` and every other such URL made absolute.
+"""
+
+import asyncio
+import hashlib
+import html
+import random
+import re
+import time
+import urllib.parse
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set
+
+import httpx
+
+from preprocessing.asset_store import AssetStore, atomic_write
+
+# Same-site page requisites (stylesheets, scripts, images) referenced from an article
+REQUISITE_PATTERN = re.compile(
+    r'(?:<link rel="stylesheet" href|src)="((?:https?://en\.wikipedia\.org)?/(?:w|static)/[^"]+)"'
+)
+REQUISITE_EXTENSIONS = {
+    "text/css": ".css",
+    "text/javascript": ".js",
+    "application/javascript": ".js",
+}
+# URL attributes in saved pages
+URL_ATTRIBUTE_PATTERN = re.compile(r'\b(href|src|srcset)="([^"]*)"')
+SRCSET_PATTERN = re.compile(r'srcset="([^"]*)"')
+WIKIPEDIA_URL = "https://en.wikipedia.org"
+WIKIPEDIA_PREFIX_PATTERN = re.compile(r'^https?://en\.wikipedia\.org')
+# Where the backend serves saved requisites
+STATIC_URL_PREFIX = "/api/wiki-static"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Leaves room for the extension added after download
+MAX_FILE_NAME_BYTES = 240
+
+
+class WikipediaDownloader:
+    """Download Wikipedia pages and their requisites over a shared connection pool.
+
+    Use as an async context manager so the pooled client is closed::
+
+        async with WikipediaDownloader(processor) as downloader:
+            await downloader.download_page(url)
+    """
+
+    def __init__(
+        self,
+        processor,
+        base_url: str = "https://en.wikipedia.org",
+        max_connections: int = 32,
+        per_host_limit: int = 8,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        timeout: float = 60.0,
+        page_requisites: bool = True,
+    ):
+        self.processor = processor
+        self.base_url = base_url.rstrip("/")
+        self.site_dir = processor.saved_dir / "en.wikipedia.org"
+        # Requisites go to the deduplicated store rather than next to the pages
+        self.asset_store = AssetStore.for_saved_dir(processor.saved_dir)
+        self.asset_store.load()
+        self.per_host_limit = per_host_limit
+        self.retries = retries
+        self.backoff = backoff
+        # Upper bound on any wait between attempts, Retry-After included
+        self.max_backoff = max_backoff
+        self.page_requisites = page_requisites
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+            follow_redirects=True,
+            headers={"User-Agent": "WikiFix/0.1 (preprocessing)"},
+        )
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        # Shared by concurrent callers so each URL is fetched at most once per run
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._requisites: Dict[str, asyncio.Task] = {}
+
+    async def __aenter__(self) -> "WikipediaDownloader":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    async def download_page(self, url: str) -> bool:
+        """Download a Wikipedia page (and its requisites) into saved_site."""
+        page_name = self.processor.extract_page_name(url)
+        if not page_name:
+            print(f"❌ Invalid URL: {url}")
+            return False
+
+        local_path = self.processor.get_local_path(page_name)
+        if self.processor.has_local_page(page_name):
+            print(f"✅ Already exists: {page_name}")
+            return True
+
+        key = str(local_path)
+        if key not in self._in_flight:
+            self._in_flight[key] = asyncio.create_task(self._download_page(page_name, local_path))
+        return await self._in_flight[key]
+
+    async def _download_page(self, page_name: str, local_path: Path) -> bool:
+        print(f"📥 Downloading: {page_name}")
+        try:
+            response = await self._get(f"{self.base_url}/wiki/{page_name}")
+            page_html = response.text
+
+            # Requisites first, so the page only links locally to the ones that were saved
+            saved = await self._download_requisites(page_html) if self.page_requisites else set()
+            atomic_write(local_path, convert_links(page_html, saved).encode("utf-8"))
+
+            print(f"✅ Downloaded: {page_name}")
+            return True
+
+        except Exception as e:
+            print(f"❌ Error downloading {page_name}: {e}")
+            return False
+
+    async def _download_requisites(self, page_html: str) -> Set[str]:
+        """Fetch stylesheets, scripts and images referenced from a page, once per run.
+
+        Returns the saved ones' URL paths as written in the page (HTML-escaped).
+        """
+        written = {WIKIPEDIA_PREFIX_PATTERN.sub('', match.group(1)) for match in REQUISITE_PATTERN.finditer(page_html)}
+        for path in written:
+            path = html.unescape(path)
+            if path not in self._requisites:
+                self._requisites[path] = asyncio.create_task(self._download_requisite(path))
+        saved = await asyncio.gather(*(self._requisites[html.unescape(path)] for path in written))
+        return {path for path, ok in zip(written, saved) if ok}
+
+    async def _download_requisite(self, path: str) -> bool:
+        name = requisite_file_name(path)
+        # Stored already, possibly with the extension added below, or left over from a wget mirror
+        if any(self.asset_store.resolve(name + extension) for extension in ("", *REQUISITE_EXTENSIONS.values())):
+            return True
+        if (self.site_dir / name).exists():
+            return True
+
+        try:
+            response = await self._get(f"{self.base_url}{path}")
+
+            # Like wget --adjust-extension, make sure styles and scripts carry an extension
+            content_type = response.headers.get("content-type", "").split(";")[0].strip()
+            extension = REQUISITE_EXTENSIONS.get(content_type)
+            if extension and not name.endswith(extension):
+                name += extension
+            self.asset_store.put(name, response.content)
+            return True
+        except Exception as e:
+            # A missing stylesheet or image should not fail the page itself
+            print(f"⚠️  Skipping requisite {path}: {e}")
+            return False
+
+    async def _get(self, url: str) -> httpx.Response:
+        """GET with a per-host concurrency limit and retries with exponential backoff."""
+        host = urllib.parse.urlsplit(url).netloc
+        limit = self._host_limits.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with limit:
+                    response = await self.client.get(url)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response
+                error = httpx.HTTPStatusError(
+                    f"HTTP {response.status_code}", request=response.request, response=response
+                )
+                retry_after = response.headers.get("retry-after")
+            except httpx.TransportError as e:
+                error = e
+                retry_after = None
+
+            if attempt == self.retries:
+                raise error
+            delay = retry_after_seconds(retry_after) if retry_after else None
+            if delay is None:
+                delay = self.backoff * (2 ** attempt) * (1 + random.random())
+            await asyncio.sleep(min(delay, self.max_backoff))
+
+        raise RuntimeError("unreachable")
+
+
+def retry_after_seconds(value: str) -> Optional[float]:
+    """Seconds to wait for a ``Retry-After`` value (delay-seconds or an HTTP-date); None if unparseable."""
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        # HTTP-dates are always GMT
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def convert_links(page_html: str, saved_requisites: Iterable[str] = ()) -> str:
+    """Rewrite a live page's URLs so they resolve when served from the mirror.
+
+    Root-relative URLs are made absolute on en.wikipedia.org and
+    protocol-relative ones get ``https:``, except that requisites in
+    ``saved_requisites`` (URL paths as written in the page) point at
+    ``/api/wiki-static``. Plain string replacements rather than a
+    per-attribute callback: pages carry thousands of links.
+    """
+    def absolute(url: str) -> str:
+        if url.startswith("//"):
+            return "https:" + url
+        return WIKIPEDIA_URL + url if url.startswith("/") else url
+
+    def convert_srcset(match: re.Match) -> str:
+        # Comma-separated "URL descriptor" candidates
+        candidates = []
+        for candidate in match.group(1).split(","):
+            url, _, descriptor = candidate.strip().partition(" ")
+            candidates.append(f"{absolute(url)} {descriptor}".rstrip())
+        return f'srcset="{", ".join(candidates)}"'
+
+    page_html = SRCSET_PATTERN.sub(convert_srcset, page_html)
+    for attribute in ("href", "src", "action"):
+        page_html = page_html.replace(f'{attribute}="//', f'{attribute}="https://')
+        page_html = page_html.replace(f'{attribute}="/', f'{attribute}="{WIKIPEDIA_URL}/')
+    for path in saved_requisites:
+        page_html = page_html.replace(f'="{WIKIPEDIA_URL}{path}"', f'="{STATIC_URL_PREFIX}{path}"')
+    return page_html
+
+
+def requisite_file_name(path: str) -> str:
+    """Map a requisite URL path to its file name under ``saved_site/en.wikipedia.org``.
+
+    Mirrors wget's layout (the query string is kept in the file name). Queries
+    that would overflow the file-name limit, like long ``load.php?modules=``
+    bundles, are replaced by a hash of the query.
+    """
+    parsed = urllib.parse.urlsplit(path)
+    name = urllib.parse.unquote(parsed.path.lstrip("/"))
+    if parsed.query:
+        query = parsed.query
+        if len(f"{Path(name).name}?{query}".encode()) > MAX_FILE_NAME_BYTES:
+            query = hashlib.sha1(query.encode()).hexdigest()[:16]
+        name = f"{name}?{query}"
+    return name
+
@@ -0,0 +1,241 @@
+"""
+Highlight markup for WikiFix pages.
+A highlighted page is its base HTML plus a list of HTML ranges wrapped in
+highlight spans, so tasks can store just the ranges and render on serve.
+"""
+
+import re
+from typing import Iterable, List, Optional, Tuple
+
+from preprocessing.slimming import CONTENT_ID, kept_head, matching_div_end, open_elements
+
+# Bump whenever the rendered markup changes; it is part of every highlight ETag
+MARKUP_VERSION = 2
+
+HIGHLIGHT_OPEN = '<span class="wikifix-highlight">'
+HIGHLIGHT_OPEN_WITH_ID = '<span class="wikifix-highlight" id="highlighted-text">'
+HIGHLIGHT_CLOSE = '</span>'
+# Add simple yellow highlight CSS
+HIGHLIGHT_HEAD = """
+<style>
+.wikifix-highlight {
+    background-color: yellow !important;
+}
+</style>
+<script>
+document.addEventListener('DOMContentLoaded', function() {
+    const highlighted = document.getElementById('highlighted-text');
+    if (highlighted) {
+        setTimeout(() => highlighted.scrollIntoView({behavior: 'smooth', block: 'center'}), 500);
+    }
+});
+</script>"""
+
+SPAN_TAG_PATTERN = re.compile(r'<span\b[^>]*>|</span\s*>', re.IGNORECASE)
+# Where an article section starts: a heading, or the mw-heading wrapper around it
+SECTION_HEADING_PATTERN = re.compile(r'<div class="mw-heading\b[^>]*>\s*<h[2-6]\b|<h[2-6]\b', re.IGNORECASE)
+# Ends a section document: fetch the full highlighted page (same URL, no query)
+# and add everything around the shown section to the existing document. The
+# section is located in the full page by its highlight, and the view is
+# shifted by however much is added above it, so the reader's place is kept.
+SECTION_LOADER = """
+<script>
+document.addEventListener('DOMContentLoaded', function() {
+    const anchor = document.getElementById('highlighted-text');
+    const article = document.querySelector('#mw-content-text .mw-parser-output');
+    if (!anchor || !article) return;
+    const childOf = (node, parent) => { while (node.parentNode !== parent) node = node.parentNode; return node; };
+    fetch(window.location.pathname, {credentials: 'same-origin'})
+        .then(response => response.ok ? response.text() : null)
+        .then(html => {
+            if (!html) return;
+            const page = new DOMParser().parseFromString(html, 'text/html');
+            const fullAnchor = page.getElementById('highlighted-text');
+            const fullArticle = page.querySelector('#mw-content-text .mw-parser-output');
+            if (!fullAnchor || !fullArticle) return;
+            const shown = Array.from(article.childNodes);
+            const all = Array.from(fullArticle.childNodes);
+            const first = all.indexOf(childOf(fullAnchor, fullArticle)) - shown.indexOf(childOf(anchor, article));
+            if (first < 0 || first + shown.length > all.length) return;
+
+            const top = anchor.getBoundingClientRect().top;
+            const adopt = nodes => nodes.map(node => document.adoptNode(node));
+            article.prepend(...adopt(all.slice(0, first)));
+            article.append(...adopt(all.slice(first + shown.length)));
+            // Then the page around the article, one enclosing element at a time
+            let element = article, fullElement = fullArticle;
+            while (element !== document.body && fullElement !== page.body) {
+                const siblings = Array.from(fullElement.parentNode.childNodes).filter(node => node.nodeName !== 'SCRIPT');
+                const at = siblings.indexOf(fullElement);
+                element.before(...adopt(siblings.slice(0, at)));
+                element.after(...adopt(siblings.slice(at + 1)));
+                element = element.parentNode;
+                fullElement = fullElement.parentNode;
+            }
+            window.scrollBy(0, anchor.getBoundingClientRect().top - top);
+        });
+});
+</script>"""
+
+
+def merge_segments(segment_lists: Iterable[List[Tuple[int, int]]]) -> List[Tuple[int, int]]:
+    """Union of several spans' HTML ranges, sorted, with overlapping ranges merged."""
+    merged: List[List[int]] = []
+    for start, end in sorted(segment for segments in segment_lists for segment in segments):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def highlight_insertions(head: int, segments: List[Tuple[int, int]]) -> List[Tuple[int, str]]:
+    """Markup to insert for ``segments``, as ``(offset, markup)`` sorted by offset.
+
+    ``head`` is the offset of the page's ``<head>`` tag, or -1 if it has none.
+    """
+    insertions = [(head + len('<head>') if head >= 0 else 0, HIGHLIGHT_HEAD)]
+    for i, (start, end) in enumerate(segments):
+        insertions.append((start, HIGHLIGHT_OPEN_WITH_ID if i == 0 else HIGHLIGHT_OPEN))
+        insertions.append((end, HIGHLIGHT_CLOSE))
+    insertions.sort(key=lambda insertion: insertion[0])
+    return insertions
+
+
+def render_highlights(html_content: str, segments: List[Tuple[int, int]]) -> str:
+    """Wrap non-overlapping HTML ranges in highlight spans and add the highlight CSS, in one pass.
+
+    The first range gets the ``highlighted-text`` id that the page scrolls to.
+    """
+    insertions = highlight_insertions(html_content.find('<head>'), segments)
+
+    pieces = []
+    position = 0
+    for offset, markup in insertions:
+        pieces.append(html_content[position:offset])
+        pieces.append(markup)
+        position = offset
+    pieces.append(html_content[position:])
+    return "".join(pieces)
+
+
+def extract_highlights(highlighted_html: str) -> Optional[Tuple[str, List[Tuple[int, int]]]]:
+    """Split highlighted HTML back into its base HTML and highlight ranges.
+
+    Returns ``None`` unless ``render_highlights`` reproduces the input
+    byte for byte from the result.
+    """
+    head = highlighted_html.find('<head>')
+    css_at = head + len('<head>') if head >= 0 else 0
+    if not highlighted_html.startswith(HIGHLIGHT_HEAD, css_at):
+        return None
+    html_content = highlighted_html[:css_at] + highlighted_html[css_at + len(HIGHLIGHT_HEAD):]
+
+    pieces = []
+    segments: List[Tuple[int, int]] = []
+    anchor = None
+    position = 0
+    length = 0
+    while True:
+        plain = html_content.find(HIGHLIGHT_OPEN, position)
+        with_id = html_content.find(HIGHLIGHT_OPEN_WITH_ID, position)
+        if plain < 0 and with_id < 0:
+            break
+        if with_id >= 0 and (plain < 0 or with_id < plain):
+            opening, tag = with_id, HIGHLIGHT_OPEN_WITH_ID
+        else:
+            opening, tag = plain, HIGHLIGHT_OPEN
+
+        # The matching close tag, skipping any spans nested inside the highlight
+        depth = 1
+        for span in SPAN_TAG_PATTERN.finditer(html_content, opening + len(tag)):
+            depth += -1 if span.group(0).startswith('</') else 1
+            if depth == 0:
+                break
+        else:
+            return None
+
+        pieces.append(html_content[position:opening])
+        length += opening - position
+        inner = html_content[opening + len(tag):span.start()]
+        pieces.append(inner)
+        if tag == HIGHLIGHT_OPEN_WITH_ID and anchor is None:
+            anchor = len(segments)
+        segments.append((length, length + len(inner)))
+        length += len(inner)
+        position = span.end()
+    pieces.append(html_content[position:])
+
+    if not segments:
+        return None
+    # The anchored range goes first, as render_highlights expects
+    if anchor:
+        segments.insert(0, segments.pop(anchor))
+    base_html = "".join(pieces)
+    if render_highlights(base_html, segments) != highlighted_html:
+        return None
+    return base_html, segments
+
+
+def section_bounds(html_content: str, offset: int) -> Optional[Tuple[int, int, int]]:
+    """The article section around ``offset``: ``(article start, section start, section end)``.
+
+    A section runs from one heading (of any level) to the next; the lead
+    section starts at the top of the article. None if ``offset`` is not in
+    the article.
+    """
+    content_at = html_content.find(CONTENT_ID)
+    output_at = html_content.find('mw-parser-output', content_at) if content_at >= 0 else -1
+    if output_at < 0:
+        return None
+    article_start = html_content.rfind('<', 0, output_at)
+    article_end = matching_div_end(html_content, article_start)
+    if article_end is None:
+        return None
+    body_start = html_content.find('>', output_at) + 1
+    body_end = article_end - len('</div>')
+    if not body_start <= offset < body_end:
+        return None
+
+    start, end = body_start, body_end
+    for heading in SECTION_HEADING_PATTERN.finditer(html_content, body_start, body_end):
+        if heading.start() <= offset:
+            start = heading.start()
+        else:
+            end = heading.start()
+            break
+    return article_start, start, end
+
+
+def render_highlight_section(html_content: str, segments: List[Tuple[int, int]]) -> Optional[str]:
+    """A small standalone page with just the section holding the anchored highlight.
+
+    It keeps the page's stylesheets and the elements enclosing the
+    article, so the section looks as it does in the full page, and loads
+    the full highlighted page in the background once shown. None if the
+    anchored range is not inside an article section.
+    """
+    if not segments:
+        return None
+    bounds = section_bounds(html_content, segments[0][0])
+    head_start = html_content.find('<head>')
+    head_end = html_content.find('</head>')
+    body_start = html_content.find('<body')
+    if bounds is None or head_start < 0 or head_end < 0 or not head_end < body_start:
+        return None
+    _, start, end = bounds
+    # A range that runs past the next heading takes the section with it
+    while segments[0][1] > end:
+        next_bounds = section_bounds(html_content, end)
+        if next_bounds is None:
+            return None
+        end = next_bounds[2]
+
+    ancestors = open_elements(html_content, body_start, start)
+    if not ancestors or ancestors[0][0] != "body":
+        return None
+    prefix = "".join([html_content[:head_start], kept_head(html_content, head_start, head_end), *(tag for _, tag in ancestors)])
+    suffix = "".join([*(f"</{name}>" for name, _ in reversed(ancestors[1:])), SECTION_LOADER, "\n</body>\n</html>\n"])
+    shift = len(prefix) - start
+    section_segments = [(seg_start + shift, seg_end + shift) for seg_start, seg_end in segments if start <= seg_start and seg_end <= end]
+    return render_highlights(prefix + html_content[start:end] + suffix, section_segments)
@@ -0,0 +1,175 @@
+"""
+Tiered span matcher over a page's TextIndex.
+Tries the cheapest strategy first: an exact substring search, then a
+search in Unicode/whitespace/citation-normalized text, and only then
+bounded fuzzy scoring over sentences.
+"""
+
+import re
+import unicodedata
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from rapidfuzz import fuzz, process
+
+from preprocessing.text_index import TextIndex
+
+TIER_EXACT = "exact"
+TIER_NORMALIZED = "normalized"
+TIER_FUZZY = "fuzzy"
+TIERS = (TIER_EXACT, TIER_NORMALIZED, TIER_FUZZY)
+
+# Minimum token_sort_ratio for a sentence to count as a match
+MIN_MATCH_SCORE = 50
+# token_sort_ratio is at most 2*min/(a+b), so sentences more than this many
+# times longer or shorter than the query can never reach MIN_MATCH_SCORE
+FUZZY_LENGTH_RATIO = 3
+
+CITATION_PATTERN = re.compile(r'\[(?:\d+|[a-z]|note \d+|citation needed|nb \d+)\]', re.IGNORECASE)
+CHARACTER_MAP = {
+    "‘": "'", "’": "'", "‚": "'", "‛": "'", "′": "'",
+    "“": '"', "”": '"', "„": '"', "‟": '"', "″": '"',
+    "‐": "-", "‑": "-", "‒": "-", "–": "-", "—": "-", "―": "-", "−": "-",
+}
+
+
+@dataclass
+class TextMatch:
+    """A matched ``[start, end)`` range in ``TextIndex.text`` and how it was found."""
+    start: int
+    end: int
+    tier: str
+    score: float = 100.0
+
+
+@dataclass
+class NormalizedText:
+    """Normalized copy of a text with a map back to original offsets."""
+    text: str
+    positions: array
+
+    @classmethod
+    def build(cls, text: str) -> "NormalizedText":
+        dropped = bytearray(len(text))
+        for citation in CITATION_PATTERN.finditer(text):
+            dropped[citation.start():citation.end()] = b"\x01" * (citation.end() - citation.start())
+
+        out: List[str] = []
+        positions = array("l")
+        previous_space = True
+        for position, char in enumerate(text):
+            if dropped[position]:
+                continue
+            for normalized in _normalize_char(char):
+                if normalized.isspace():
+                    if previous_space:
+                        continue
+                    normalized = " "
+                    previous_space = True
+                else:
+                    previous_space = False
+                out.append(normalized)
+                positions.append(position)
+        return cls(text="".join(out), positions=positions)
+
+    def find(self, query: str) -> Optional[Tuple[int, int]]:
+        """Find an already-normalized query; returns the range in the original text."""
+        start = self.text.find(query)
+        if start < 0 or not query:
+            return None
+        end = start + len(query)
+        return self.positions[start], self.positions[end - 1] + 1
+
+
+def normalize(text: str) -> str:
+    """Normalize a query the same way page text is normalized."""
+    return NormalizedText.build(text).text.strip()
+
+
+def _normalize_char(char: str) -> str:
+    char = CHARACTER_MAP.get(char, char)
+    if char.isascii():
+        return char.lower()
+    return "".join(CHARACTER_MAP.get(c, c) for c in unicodedata.normalize("NFKC", char)).lower()
+
+
+class TieredMatcher:
+    """Find spans in a page's TextIndex, cheapest tier first.
+
+    The normalized text of each page is built lazily, once, and kept
+    alongside the index.
+    """
+
+    def __init__(self):
+        self.tier_counts: Dict[str, int] = {tier: 0 for tier in TIERS}
+        self.misses = 0
+
+    def match(self, index: TextIndex, text_to_find: str) -> Optional[TextMatch]:
+        return self.match_many(index, [text_to_find])[0]
+
+    def match_many(self, index: TextIndex, texts: List[str]) -> List[Optional[TextMatch]]:
+        """Match several spans against one page; ``None`` where a span is not found.
+
+        The spans share the page's text, normalized text and sentence list,
+        which are built at most once per page. Each span is then looked up
+        on its own: the exact and normalized tiers are ``str.find`` calls,
+        which scan in C faster than one pass of a multi-pattern regex or a
+        Python automaton for the handful of spans a page gets. A span
+        repeated on the page is only searched once.
+        """
+        matches: List[Optional[TextMatch]] = []
+        found_by_query: Dict[str, Optional[TextMatch]] = {}
+        for text_to_find in texts:
+            query = (text_to_find or "").strip()
+            if not query or not index.text:
+                matches.append(None)
+                continue
+
+            if query not in found_by_query:
+                found_by_query[query] = self._exact(index, query) or self._normalized(index, query) or self._fuzzy(index, query)
+            found = found_by_query[query]
+            if found:
+                self.tier_counts[found.tier] += 1
+            else:
+                self.misses += 1
+            matches.append(found)
+        return matches
+
+    def _exact(self, index: TextIndex, query: str) -> Optional[TextMatch]:
+        start = index.text.find(query)
+        if start < 0:
+            return None
+        return TextMatch(start, start + len(query), TIER_EXACT)
+
+    def _normalized(self, index: TextIndex, query: str) -> Optional[TextMatch]:
+        if index.normalized is None:
+            index.normalized = NormalizedText.build(index.text)
+        found = index.normalized.find(normalize(query))
+        if not found:
+            return None
+        return TextMatch(found[0], found[1], TIER_NORMALIZED)
+
+    def _fuzzy(self, index: TextIndex, query: str) -> Optional[TextMatch]:
+        # Use only the first sentence of the query
+        first_sentence_match = re.match(r'(.+?[.!?])', query, re.DOTALL)
+        if first_sentence_match:
+            query = first_sentence_match.group(1).strip()
+
+        low, high = len(query) / FUZZY_LENGTH_RATIO, len(query) * FUZZY_LENGTH_RATIO
+        candidates = {
+            i: sentence for i, sentence in enumerate(index.sentence_texts) if low <= len(sentence) <= high
+        }
+        if not candidates:
+            return None
+
+        result = process.extractOne(query, candidates, scorer=fuzz.token_sort_ratio, score_cutoff=MIN_MATCH_SCORE)
+        if not result:
+            return None
+        _, score, sentence_index = result
+        start, end = index.sentences[sentence_index]
+        return TextMatch(start, end, TIER_FUZZY, score)
+
+    def stats(self) -> str:
+        counts = " ".join(f"{tier}={count}" for tier, count in self.tier_counts.items())
+        return f"{counts} unmatched={self.misses}"
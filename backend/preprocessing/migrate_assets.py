@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Move an existing mirror's page requisites into the content-addressed asset store.
+Usage: python migrate_assets.py [--saved-dir DIR] [--dry-run] [--keep-originals]
+
+Every file under ``en.wikipedia.org`` except the pages themselves is stored
+once per distinct content and indexed under its original name; duplicates
+are dropped. Safe to rerun: already migrated files are no longer in the
+mirror, and an interrupted run never loses a file.
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+from pathlib import Path
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from preprocessing.asset_store import NON_REQUISITES, AssetStore
+from preprocessing.wikipedia_processor import DEFAULT_SAVED_DIR
+
+
+def migrate(saved_dir: Path, dry_run: bool, keep_originals: bool) -> dict:
+    """Store every loose requisite; returns counts."""
+    site_dir = saved_dir / "en.wikipedia.org"
+    store = AssetStore.for_saved_dir(saved_dir)
+    store.load()
+    counts = {"files": 0, "blobs": 0, "bytes_before": 0, "bytes_after": 0}
+    seen = set()
+
+    for root, dirs, files in os.walk(site_dir, topdown=True):
+        top_level = Path(root) == site_dir
+        if top_level:
+            dirs[:] = [name for name in dirs if name not in NON_REQUISITES]
+        for file_name in files:
+            if file_name.startswith(".tmp-") or (top_level and file_name in NON_REQUISITES):
+                continue
+            path = Path(root) / file_name
+            name = path.relative_to(site_dir).as_posix()
+            size = path.stat().st_size
+            counts["files"] += 1
+            counts["bytes_before"] += size
+
+            if dry_run:
+                with open(path, "rb") as f:
+                    digest = hashlib.file_digest(f, "sha256").hexdigest()
+                is_new = digest not in seen and not store.blob_path(digest).exists()
+            else:
+                digest, is_new = store.put_file(name, path, move=not keep_originals)
+            seen.add(digest)
+            if is_new:
+                counts["blobs"] += 1
+                counts["bytes_after"] += size
+
+            if counts["files"] % 1000 == 0:
+                print(f"📈 {counts['files']} files, {counts['blobs']} new blobs")
+
+    if not dry_run and not keep_originals:
+        # Drop the directories the move emptied
+        for root, dirs, files in os.walk(site_dir, topdown=False):
+            if Path(root) != site_dir and not os.listdir(root):
+                os.rmdir(root)
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicate saved_site requisites into the asset store")
+
+    parser.add_argument(
+        "--saved-dir",
+        type=Path,
+        default=DEFAULT_SAVED_DIR,
+        help=f"saved_site directory (default: {DEFAULT_SAVED_DIR})"
+    )
+
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Report what would be stored without writing"
+    )
+
+    parser.add_argument(
+        "--keep-originals",
+        action="store_true",
+        help="Leave the original files in place after storing them"
+    )
+
+    args = parser.parse_args()
+
+    print(f"🚀 Migrating requisites in {args.saved_dir}{' (dry run)' if args.dry_run else ''}")
+    counts = migrate(args.saved_dir, args.dry_run, args.keep_originals)
+
+    print("\n" + "="*60)
+    print(f"✅ Files indexed: {counts['files']}")
+    print(f"📦 New blobs: {counts['blobs']}")
+    print(f"💾 Requisite storage: {counts['bytes_before'] / 1e6:.1f} MB → {counts['bytes_after'] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
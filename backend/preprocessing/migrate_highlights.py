@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Move tasks from stored highlighted HTML to shared pages plus highlight ranges.
+Usage: python migrate_highlights.py [--batch-size N] [--dry-run] [--vacuum]
+
+Each legacy ``*_highlighted_html`` value is split back into its base page
+and ranges. A task is only converted if rendering the ranges reproduces the
+stored HTML byte for byte; anything else is left as it is. Pages stored
+before compression was introduced are compressed in place, and highlights
+missing an ETag get one.
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import func, or_, select, text, update
+
+from db.db import AsyncSessionLocal, engine, init_models
+from db.compressed_html import LEGACY_FORMAT_MARKER, compress_html, decompress_html
+from db.pages_ops import Page, insert_pages, page_row
+from db.tasks_ops import HIGHLIGHT_ROLES, Task, decode_highlight_ranges, encode_highlight_ranges, highlight_etag
+from preprocessing.checkpoint import page_revision
+from preprocessing.highlight_markup import extract_highlights
+
+
+async def migrate(batch_size: int, dry_run: bool) -> dict:
+    """Convert legacy tasks in ``batch_size`` transactions; returns counts."""
+    counts = {"tasks": 0, "converted": 0, "kept": 0, "pages": 0, "bytes_before": 0, "bytes_after": 0}
+    stored_pages = set()
+    last_id = ""
+
+    while True:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(Task.id, Task.claim_url, Task.evidence_url, Task.claim_highlighted_html, Task.evidence_highlighted_html)
+                .where(Task.id > last_id)
+                .where(or_(Task.claim_highlighted_html.is_not(None), Task.evidence_highlighted_html.is_not(None)))
+                .order_by(Task.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        pages = {}
+        updates = []
+        for row in rows:
+            counts["tasks"] += 1
+            values = {}
+            for role in HIGHLIGHT_ROLES:
+                highlighted_html = getattr(row, f"{role}_highlighted_html")
+                if not highlighted_html:
+                    continue
+                counts["bytes_before"] += len(highlighted_html.encode("utf-8"))
+                extracted = extract_highlights(highlighted_html)
+                if not extracted:
+                    # Not reproducible from ranges; leave the stored HTML in place
+                    counts["bytes_after"] += len(highlighted_html.encode("utf-8"))
+                    continue
+                base_html, ranges = extracted
+                page_name = (getattr(row, f"{role}_url") or "").split('#')[0].split('?')[0].rsplit('/wiki/', 1)[-1]
+                page = page_row(page_name, base_html, page_revision(base_html))
+                if page["id"] not in stored_pages:
+                    pages[page["id"]] = page
+                values.update({
+                    f"{role}_page_id": page["id"],
+                    f"{role}_highlight_ranges": encode_highlight_ranges(ranges),
+                    f"{role}_etag": highlight_etag(page["id"], ranges),
+                    f"{role}_highlighted_html": None,
+                })
+                counts["bytes_after"] += len(values[f"{role}_highlight_ranges"])
+            if values:
+                updates.append((row.id, values))
+                counts["converted"] += 1
+            else:
+                counts["kept"] += 1
+
+        counts["pages"] += len(pages)
+        counts["bytes_after"] += sum(len(page["html"].encode("utf-8")) for page in pages.values())
+        if not dry_run:
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    await insert_pages(session, pages.values())
+                    for task_id, values in updates:
+                        await session.execute(update(Task).where(Task.id == task_id).values(**values))
+        stored_pages.update(pages)
+
+        print(f"📈 {counts['tasks']} tasks scanned, {counts['converted']} converted, {counts['pages']} pages")
+
+    return counts
+
+
+async def compress_pages(batch_size: int, dry_run: bool) -> int:
+    """Compress pages still stored as plain text or in the legacy multi-member format; returns how many were found."""
+    compressed = 0
+    last_id = ""
+    while True:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(Page.id, Page.html)
+                .where(Page.id > last_id)
+                .where(or_(
+                    func.typeof(Page.html) == "text",
+                    func.substr(Page.html, 1, len(LEGACY_FORMAT_MARKER)) == LEGACY_FORMAT_MARKER,
+                ))
+                .order_by(Page.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        compressed += len(rows)
+        if not dry_run:
+            values = await asyncio.to_thread(lambda: [(row.id, compress_html(decompress_html(row.html))) for row in rows])
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    for page_id, blob in values:
+                        await session.execute(update(Page).where(Page.id == page_id).values(html=blob))
+        print(f"📦 {compressed} pages compressed")
+    return compressed
+
+
+async def backfill_etags(batch_size: int, dry_run: bool) -> int:
+    """Compute ETags for range-based highlights created before they were stored."""
+    filled = 0
+    for role in HIGHLIGHT_ROLES:
+        page_column = getattr(Task, f"{role}_page_id")
+        ranges_column = getattr(Task, f"{role}_highlight_ranges")
+        etag_column = getattr(Task, f"{role}_etag")
+        last_id = ""
+        while True:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    select(Task.id, page_column, ranges_column)
+                    .where(Task.id > last_id)
+                    .where(page_column.is_not(None), etag_column.is_(None))
+                    .order_by(Task.id)
+                    .limit(batch_size)
+                )
+                rows = result.all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            filled += len(rows)
+            if not dry_run:
+                async with AsyncSessionLocal() as session:
+                    async with session.begin():
+                        for task_id, page_id, ranges in rows:
+                            etag = highlight_etag(page_id, decode_highlight_ranges(ranges))
+                            await session.execute(update(Task).where(Task.id == task_id).values({etag_column: etag}))
+    return filled
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Store task highlights as page ranges instead of full HTML")
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=200,
+        help="Tasks converted per transaction (default: 200)"
+    )
+
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Report what would be converted without writing"
+    )
+
+    parser.add_argument(
+        "--vacuum",
+        action="store_true",
+        help="VACUUM the database afterwards so SQLite returns the freed space"
+    )
+
+    args = parser.parse_args()
+
+    print(f"🚀 Migrating highlighted HTML to page ranges{' (dry run)' if args.dry_run else ''}")
+    await init_models()
+    counts = await migrate(args.batch_size, args.dry_run)
+    counts["compressed_pages"] = await compress_pages(args.batch_size, args.dry_run)
+    counts["etags"] = await backfill_etags(args.batch_size, args.dry_run)
+
+    print("\n" + "="*60)
+    print(f"✅ Converted tasks: {counts['converted']}")
+    print(f"⏭️  Kept as stored HTML: {counts['kept']}")
+    print(f"📄 Distinct pages: {counts['pages']}")
+    print(f"📦 Pages (re)compressed: {counts['compressed_pages']}")
+    print(f"🏷️  ETags filled in: {counts['etags']}")
+    print(f"💾 Highlight storage: {counts['bytes_before'] / 1e6:.1f} MB → {counts['bytes_after'] / 1e6:.1f} MB")
+
+    if args.vacuum and not args.dry_run:
+        print("🧹 Vacuuming database...")
+        async with engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("VACUUM"))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Pack a mirror's loose pages into the single-file page pack, or back out.
+Usage:
+    python pack_pages.py [--saved-dir DIR] pack [--batch-size N] [--remove-loose]
+    python pack_pages.py [--saved-dir DIR] unpack [--pages NAME ...]
+    python pack_pages.py [--saved-dir DIR] compact
+
+Packed pages take precedence over loose files of the same name; pages
+only saved as loose files keep being served from them. Compact only while
+no server or preprocessing run has the pack open.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from preprocessing.asset_store import atomic_write
+from preprocessing.page_pack import PagePack, move_legacy_pack
+from preprocessing.wikipedia_processor import DEFAULT_SAVED_DIR
+
+
+def pack(saved_dir: Path, site_dir: Path, batch_size: int, remove_loose: bool) -> None:
+    page_pack = PagePack.for_saved_dir(saved_dir)
+    page_pack.refresh()
+    wiki_dir = site_dir / "wiki"
+    paths = sorted(wiki_dir.rglob("*.html"))
+    packed = bytes_before = 0
+    for start in range(0, len(paths), batch_size):
+        batch = paths[start:start + batch_size]
+        pages = [(path.relative_to(wiki_dir).as_posix()[:-len(".html")], path.read_bytes()) for path in batch]
+        bytes_before += sum(len(data) for _, data in pages)
+        packed += page_pack.append(pages)
+        if remove_loose:
+            # Only once the batch is durable in the pack
+            for path in batch:
+                path.unlink()
+        print(f"📈 {start + len(batch)}/{len(paths)} pages, {packed} packed")
+
+    size = page_pack.pack_path.stat().st_size if page_pack.pack_path.exists() else 0
+    print("\n" + "="*60)
+    print(f"✅ Pages in pack: {len(page_pack.entries)} ({packed} added)")
+    print(f"💾 Loose pages: {bytes_before / 1e6:.1f} MB → pack file {size / 1e6:.1f} MB")
+
+
+def unpack(saved_dir: Path, site_dir: Path, names) -> None:
+    page_pack = PagePack.for_saved_dir(saved_dir)
+    page_pack.refresh()
+    names = names or sorted(page_pack.entries)
+    written = 0
+    for name in names:
+        data = page_pack.read(name)
+        if data is None:
+            print(f"⚠️  Not in pack: {name}")
+            continue
+        atomic_write(site_dir / "wiki" / f"{name}.html", data)
+        written += 1
+    print(f"✅ Unpacked {written} pages into {site_dir / 'wiki'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the single-file page pack of a saved_site mirror")
+    parser.add_argument(
+        "--saved-dir",
+        type=Path,
+        default=DEFAULT_SAVED_DIR,
+        help=f"saved_site directory (default: {DEFAULT_SAVED_DIR})"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    pack_parser = commands.add_parser("pack", help="Add loose pages to the pack")
+    pack_parser.add_argument("--batch-size", type=int, default=500, help="Pages appended per write (default: 500)")
+    pack_parser.add_argument("--remove-loose", action="store_true", help="Delete loose files once packed")
+
+    unpack_parser = commands.add_parser("unpack", help="Write packed pages back out as loose files")
+    unpack_parser.add_argument("--pages", nargs="+", help="Only these pages (default: all)")
+
+    commands.add_parser("compact", help="Drop superseded records from the pack")
+
+    args = parser.parse_args()
+    site_dir = args.saved_dir / "en.wikipedia.org"
+    move_legacy_pack(args.saved_dir)
+
+    if args.command == "pack":
+        pack(args.saved_dir, site_dir, args.batch_size, args.remove_loose)
+    elif args.command == "unpack":
+        unpack(args.saved_dir, site_dir, args.pages)
+    else:
+        reclaimed = PagePack.for_saved_dir(args.saved_dir).compact()
+        print(f"🧹 Compacted pack, {reclaimed / 1e6:.1f} MB reclaimed")
+
+
+if __name__ == "__main__":
+    main()
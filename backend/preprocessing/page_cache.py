@@ -0,0 +1,170 @@
+"""
+Per-page caches for the Wikipedia processor.
+PageCache holds each page's rewritten HTML and sentence index so items that
+cite the same article don't re-read, re-rewrite and re-split it; RenderCache
+holds pages rewritten for browsing so popular ones are served from memory.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from db.pages_ops import page_id, page_row
+from preprocessing.text_index import TextIndex
+
+# The matcher's normalized copy: its text plus an 8-byte original offset per character
+NORMALIZED_BYTES_PER_CHAR = 8
+
+
+@dataclass
+class PreparedPage:
+    """A page ready for highlighting: URLs rewritten, anchors stripped, text indexed."""
+    page_name: str
+    html: str
+    index: TextIndex
+    revision: Optional[int] = None
+
+    @cached_property
+    def content_id(self) -> str:
+        """ID of this page in the pages table."""
+        return page_id(self.html)
+
+    @property
+    def row(self) -> Dict:
+        """Pages-table row storing this page's HTML."""
+        return page_row(self.page_name, self.html, self.revision, self.content_id)
+
+    @cached_property
+    def size(self) -> int:
+        """Approximate memory footprint in bytes.
+
+        The HTML is measured with ``sys.getsizeof`` (1, 2 or 4 bytes per
+        character depending on its widest character). The normalized copy
+        the matcher may add to the index later is counted up front so the
+        cache bound holds after matching.
+        """
+        text = self.index.text
+        return (
+            sys.getsizeof(self.html)
+            + self.index.memory_size()
+            + sys.getsizeof(text) + NORMALIZED_BYTES_PER_CHAR * len(text)
+        )
+
+
+@dataclass
+class StoredPage:
+    """A highlighted page reduced to its pages-table row and revision, without the index."""
+    row: Optional[Dict]
+    revision: Optional[int] = None
+
+
+class PageCache:
+    """Thread-safe LRU cache of prepared pages, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pages: "OrderedDict[str, PreparedPage]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_prepare(self, page_name: str, prepare: Callable[[str], PreparedPage]) -> PreparedPage:
+        with self._lock:
+            page = self._pages.get(page_name)
+            if page is not None:
+                self._pages.move_to_end(page_name)
+                self.hits += 1
+                return page
+            self.misses += 1
+
+        # Prepare outside the lock so other pages can be served meanwhile
+        page = prepare(page_name)
+
+        with self._lock:
+            if page_name not in self._pages and page.size <= self.max_bytes:
+                self._pages[page_name] = page
+                self.current_bytes += page.size
+                while self.current_bytes > self.max_bytes:
+                    _, evicted = self._pages.popitem(last=False)
+                    self.current_bytes -= evicted.size
+                    self.evictions += 1
+        return page
+
+    def discard(self, page_name: str) -> None:
+        with self._lock:
+            page = self._pages.pop(page_name, None)
+            if page is not None:
+                self.current_bytes -= page.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> str:
+        return (
+            f"pages={len(self._pages)} size={self.current_bytes / 1e6:.1f} MB "
+            f"hits={self.hits} misses={self.misses} evictions={self.evictions}"
+        )
+
+
+class RenderCache:
+    """Thread-safe LRU cache of rendered pages (encoded), bounded by their total size in bytes.
+
+    Entries remember the version of the source they were rendered from (a
+    file's mtime and size, or a pack record); a lookup with a different
+    version drops the entry and renders again.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Hashable, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[bytes]:
+        """Rendered content for ``key`` if it was rendered from ``version`` of its source."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                # Source changed since it was rendered
+                del self._entries[key]
+                self.current_bytes -= len(entry[1])
+                self.invalidations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, version: Hashable, content: bytes) -> None:
+        with self._lock:
+            if key not in self._entries and len(content) <= self.max_bytes:
+                self._entries[key] = (version, content)
+                self.current_bytes += len(content)
+                while self.current_bytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self.current_bytes -= len(evicted)
+                    self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> str:
+        return (
+            f"pages={len(self._entries)} size={self.current_bytes / 1e6:.1f} MB "
+            f"hits={self.hits} misses={self.misses} evictions={self.evictions} "
+            f"invalidations={self.invalidations}"
+        )
@@ -0,0 +1,206 @@
+"""
+Single-file page archive for large mirrors.
+Instead of one loose ``wiki/<page>.html`` per article, pages can be packed
+into ``pages.pack``, an append-only file of zlib-compressed records, plus
+``pages.idx``, a compact index of ``(name, offset, length, size, crc)``
+entries. The data file is mmap'ed, so reading a page is one slice and one
+decompress with no per-page file open.
+
+Both files only ever grow: a page packed again gets a new record and index
+entry, and the latest entry wins. The index entry is appended after its
+record is on disk, so a crash leaves at worst an unreferenced record.
+``compact`` rewrites the pack without superseded records.
+
+The pack lives in ``saved_site/.pack``, outside ``en.wikipedia.org``: that
+tree is walked by the static manifest and the asset migration, which would
+otherwise serve the pack publicly or move it into the asset store.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Pack directory, next to ``en.wikipedia.org`` in a saved_site
+PAGE_PACK_DIR = ".pack"
+PACK_FILE = "pages.pack"
+INDEX_FILE = "pages.idx"
+INDEX_MARKER = b"WFIDX1\n"
+COMPRESS_LEVEL = 6
+
+# offset, compressed length, uncompressed size, CRC-32 of the uncompressed page, name length
+ENTRY = struct.Struct("<QIIIH")
+
+
+class PackEntry(NamedTuple):
+    offset: int
+    length: int
+    size: int
+    crc: int
+
+
+class PagePack:
+    """Reader and appender for the page pack in a directory."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.pack_path = self.root / PACK_FILE
+        self.index_path = self.root / INDEX_FILE
+        self.entries: Dict[str, PackEntry] = {}
+        self._index_offset = 0
+        self._map: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_saved_dir(cls, saved_dir: Path) -> "PagePack":
+        """The pack of a saved_site (see ``move_legacy_pack`` for packs written by older versions)."""
+        return cls(Path(saved_dir) / PAGE_PACK_DIR)
+
+    def exists(self) -> bool:
+        return self.index_path.exists()
+
+    def refresh(self) -> int:
+        """Pick up entries appended since the last call (by this or another process); returns the page count."""
+        with self._lock:
+            try:
+                with open(self.index_path, "rb") as f:
+                    if self._index_offset == 0:
+                        if f.read(len(INDEX_MARKER)) != INDEX_MARKER:
+                            raise ValueError(f"{self.index_path} is not a page pack index")
+                        self._index_offset = len(INDEX_MARKER)
+                    f.seek(self._index_offset)
+                    data = f.read()
+            except FileNotFoundError:
+                return len(self.entries)
+
+            position = 0
+            while position + ENTRY.size <= len(data):
+                offset, length, size, crc, name_length = ENTRY.unpack_from(data, position)
+                end = position + ENTRY.size + name_length
+                if end > len(data):
+                    # A torn final entry; picked up once it is complete
+                    break
+                name = data[position + ENTRY.size:end].decode("utf-8")
+                self.entries[name] = PackEntry(offset, length, size, crc)
+                position = end
+            self._index_offset += position
+            self._remap()
+            return len(self.entries)
+
+    def get(self, name: str) -> Optional[PackEntry]:
+        """Index entry for a page, refreshing once if it isn't known yet."""
+        entry = self.entries.get(name)
+        if entry is None and self.exists():
+            self.refresh()
+            entry = self.entries.get(name)
+        return entry
+
+    def read(self, name: str) -> Optional[bytes]:
+        """Uncompressed bytes of a packed page, or None if it isn't packed."""
+        entry = self.get(name)
+        if entry is None:
+            return None
+        with self._lock:
+            if self._map is None or entry.offset + entry.length > len(self._map):
+                self._remap()
+            compressed = self._map[entry.offset:entry.offset + entry.length]
+        data = zlib.decompress(compressed)
+        if zlib.crc32(data) != entry.crc:
+            raise ValueError(f"Corrupt pack record for {name}")
+        return data
+
+    def append(self, pages: Iterable[Tuple[str, bytes]]) -> int:
+        """Pack ``(name, bytes)`` pairs, skipping pages already packed with the same content."""
+        self.refresh()
+        records: List[Tuple[str, bytes, int, int]] = []
+        for name, data in pages:
+            crc = zlib.crc32(data)
+            current = self.entries.get(name)
+            if current and (current.crc, current.size) == (crc, len(data)):
+                continue
+            records.append((name, zlib.compress(data, COMPRESS_LEVEL), len(data), crc))
+        if not records:
+            return 0
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            index_entries = []
+            with open(self.pack_path, "ab") as f:
+                offset = f.tell()
+                for name, compressed, size, crc in records:
+                    f.write(compressed)
+                    entry = PackEntry(offset, len(compressed), size, crc)
+                    encoded = name.encode("utf-8")
+                    index_entries.append(ENTRY.pack(*entry, len(encoded)) + encoded)
+                    offset += len(compressed)
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Records are durable before the index points at them
+            new_index = not self.index_path.exists()
+            with open(self.index_path, "ab") as f:
+                if new_index:
+                    f.write(INDEX_MARKER)
+                f.write(b"".join(index_entries))
+                f.flush()
+                os.fsync(f.fileno())
+        self.refresh()
+        return len(records)
+
+    def compact(self) -> int:
+        """Rewrite the pack keeping only each page's latest record; returns bytes reclaimed."""
+        self.refresh()
+        before = self.pack_path.stat().st_size
+        staged = PagePack(self.root / ".compact")
+        staged.append((name, self.read(name)) for name in sorted(self.entries))
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            os.replace(staged.pack_path, self.pack_path)
+            os.replace(staged.index_path, self.index_path)
+            staged.root.rmdir()
+            self.entries = {}
+            self._index_offset = 0
+        self.refresh()
+        return before - self.pack_path.stat().st_size
+
+    def _remap(self) -> None:
+        try:
+            size = self.pack_path.stat().st_size
+        except FileNotFoundError:
+            return
+        if size == 0 or (self._map is not None and len(self._map) == size):
+            return
+        with open(self.pack_path, "rb") as f:
+            new_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Slices already taken from the old map are copies, so it can be dropped
+        if self._map is not None:
+            self._map.close()
+        self._map = new_map
+
+
+def move_legacy_pack(saved_dir: Path) -> bool:
+    """Move a pack left inside ``en.wikipedia.org`` by older versions to ``.pack``; True if one was moved.
+
+    A one-off step for pack_pages.py, preprocessing and API startup, run
+    before any reader opens the pack. Another process racing it is fine:
+    whichever moves a file first wins.
+    """
+    page_pack = PagePack.for_saved_dir(saved_dir)
+    legacy_dir = Path(saved_dir) / "en.wikipedia.org"
+    if not (legacy_dir / INDEX_FILE).exists() or page_pack.exists():
+        return False
+    page_pack.root.mkdir(parents=True, exist_ok=True)
+    try:
+        # Data first: an index is only ever used next to the records it points at
+        if (legacy_dir / PACK_FILE).exists():
+            os.replace(legacy_dir / PACK_FILE, page_pack.pack_path)
+        os.replace(legacy_dir / INDEX_FILE, page_pack.index_path)
+    except FileNotFoundError:
+        return False
+    print(f"📦 Moved page pack out of {legacy_dir} to {page_pack.root}")
+    return True
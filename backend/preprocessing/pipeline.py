@@ -0,0 +1,167 @@
+"""
+Staged asyncio pipeline for WikiFix preprocessing.
+Each stage has a bounded input queue, its own worker count and throughput
+counters, so slow stages apply backpressure and I/O overlaps with CPU work.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+# Marks the end of the stream; forwarded downstream once a stage is drained
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    """Per-stage throughput counters."""
+    name: str
+    processed: int = 0
+    dropped: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def wall_seconds(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Items per second over the stage's wall-clock lifetime."""
+        wall = self.wall_seconds
+        return self.processed / wall if wall > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.name:<10} processed={self.processed:<6} dropped={self.dropped:<5} "
+            f"errors={self.errors:<4} busy={self.busy_seconds:7.1f}s "
+            f"wall={self.wall_seconds:7.1f}s {self.throughput:7.2f} items/s"
+        )
+
+
+@dataclass
+class Stage:
+    """One pipeline step.
+
+    ``handler`` gets an item and returns the item to pass on, or ``None`` to
+    drop it. Exceptions are counted and the item is dropped.
+
+    With ``batch_size > 1`` the handler instead gets a list of up to
+    ``batch_size`` items (collected for at most ``batch_timeout`` seconds)
+    and returns a list of results, one per item. With ``fan_out`` the
+    handler returns a list of any number of items to pass on.
+    """
+    name: str
+    handler: Callable[[Any], Awaitable[Any]]
+    concurrency: int = 1
+    queue_size: int = 32
+    batch_size: int = 1
+    batch_timeout: float = 1.0
+    fan_out: bool = False
+    stats: StageStats = field(init=False)
+
+    def __post_init__(self):
+        self.stats = StageStats(self.name)
+
+
+class Pipeline:
+    """Run items through a chain of stages connected by bounded queues."""
+
+    def __init__(self, stages: List[Stage], on_output: Optional[Callable[[Any], None]] = None):
+        self.stages = stages
+        self.on_output = on_output
+
+    async def run(self, items: Iterable[Any]) -> List[StageStats]:
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        # The last stage writes into an unbounded sink that is drained as it fills
+        queues.append(asyncio.Queue())
+
+        workers = []
+        for index, stage in enumerate(self.stages):
+            remaining = [stage.concurrency]
+            for _ in range(stage.concurrency):
+                workers.append(asyncio.create_task(
+                    self._worker(stage, queues[index], queues[index + 1], remaining)
+                ))
+
+        sink = asyncio.create_task(self._drain(queues[-1]))
+
+        for item in items:
+            await queues[0].put(item)
+        await queues[0].put(_DONE)
+
+        await asyncio.gather(*workers)
+        await sink
+        return [stage.stats for stage in self.stages]
+
+    async def _worker(self, stage: Stage, inbox: asyncio.Queue, outbox: asyncio.Queue, remaining: List[int]) -> None:
+        stats = stage.stats
+        done = False
+        while not done:
+            batch, done = await self._next_batch(stage, inbox)
+            if batch:
+                if stats.started_at is None:
+                    stats.started_at = time.perf_counter()
+                start = time.perf_counter()
+                try:
+                    if stage.batch_size > 1:
+                        results = await stage.handler(batch)
+                    elif stage.fan_out:
+                        results = await stage.handler(batch[0]) or []
+                    else:
+                        results = [await stage.handler(batch[0])]
+                except Exception as e:
+                    print(f"❌ {stage.name} stage error: {e}")
+                    stats.errors += len(batch)
+                    results = [None] * len(batch)
+                stats.busy_seconds += time.perf_counter() - start
+
+                for result in results:
+                    if result is None:
+                        stats.dropped += 1
+                        continue
+                    stats.processed += 1
+                    await outbox.put(result)
+
+        remaining[0] -= 1
+        if remaining[0] == 0:
+            stats.finished_at = time.perf_counter()
+            await outbox.put(_DONE)
+        else:
+            # Let the sibling workers see the end marker too
+            await inbox.put(_DONE)
+
+    async def _next_batch(self, stage: Stage, inbox: asyncio.Queue):
+        """Collect up to ``batch_size`` items; returns ``(items, reached_end)``."""
+        batch = []
+        item = await inbox.get()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + stage.batch_timeout
+        while item is not _DONE:
+            batch.append(item)
+            if len(batch) >= stage.batch_size:
+                return batch, False
+            try:
+                item = inbox.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    return batch, False
+                try:
+                    item = await asyncio.wait_for(inbox.get(), timeout)
+                except asyncio.TimeoutError:
+                    return batch, False
+        return batch, True
+
+    async def _drain(self, sink: asyncio.Queue) -> None:
+        while True:
+            item = await sink.get()
+            if item is _DONE:
+                return
+            if self.on_output:
+                self.on_output(item)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Recompute the platform counters from the users table and report drift.
+Usage: python reconcile_counters.py [--check]
+
+The counters behind /api/stats/platform are updated incrementally; this
+recomputes them from scratch, prints any counter that disagrees and (unless
+--check) overwrites the stored values. Exits with status 1 if drift was found.
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add backend to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from db.db import init_models
+from db.stats_ops import PLATFORM_COUNTERS, reconcile_platform_counters
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Reconcile the platform counters with the users table")
+
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only report drift, don't rewrite the counters"
+    )
+
+    args = parser.parse_args()
+
+    await init_models()
+    print(f"🔍 Recomputing platform counters{' (check only)' if args.check else ''}")
+    drift = await reconcile_platform_counters(fix=not args.check)
+
+    print("\n" + "="*60)
+    if not drift:
+        print(f"✅ All {len(PLATFORM_COUNTERS)} counters match the users table")
+        return 0
+    for name, values in drift.items():
+        print(f"⚠️  {name}: stored {values['stored']}, actual {values['actual']}")
+    print("🔧 Counters rewritten" if not args.check else "💡 Run without --check to fix")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
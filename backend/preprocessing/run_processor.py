@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Simple script to run the Wikipedia processor and fill up the tasks DB.
-Usage: python run_processor.py [json_file_path] [--limit N] [--recreate-db]
+Usage: python run_processor.py [json_file_path] [--limit N] [--jobs N] [--resume] [--recreate-db]
 """
 
 import argparse
@@ -13,7 +13,8 @@ from pathlib import Path
 backend_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_dir))
 
-from preprocessing.wikipedia_processor import WikipediaProcessor
+from preprocessing.page_pack import move_legacy_pack
+from preprocessing.wikipedia_processor import WikipediaProcessor, PipelineConfig
 from db.db import init_models, drop_all_tables, drop_tasks_table
 
 
@@ -33,6 +34,65 @@ async def main():
         help="Limit number of items to process (useful for testing)"
     )
     
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used for highlighting (default: 1)"
+    )
+    
+    parser.add_argument(
+        "--download-concurrency",
+        type=int,
+        default=8,
+        help="Concurrent page downloads in the pipeline (default: 8)"
+    )
+    
+    parser.add_argument(
+        "--read-concurrency",
+        type=int,
+        default=4,
+        help="Concurrent page reads/rewrites in the pipeline (default: 4)"
+    )
+    
+    parser.add_argument(
+        "--db-concurrency",
+        type=int,
+        default=1,
+        help="Concurrent DB writers in the pipeline (default: 1)"
+    )
+    
+    parser.add_argument(
+        "--db-batch-size",
+        type=int,
+        default=100,
+        help="Tasks inserted per DB transaction (default: 100)"
+    )
+    
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=32,
+        help="Bound on each pipeline stage's input queue (default: 32)"
+    )
+    
+    parser.add_argument(
+        "--slim-pages",
+        action="store_true",
+        help="Store only each page's article content and styles, without the Wikipedia chrome"
+    )
+    
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip items already recorded in the checkpoint manifest"
+    )
+    
+    parser.add_argument(
+        "--checkpoint",
+        help="Checkpoint manifest path (default: <json_file>.checkpoint.jsonl)"
+    )
+    
     parser.add_argument(
         "--recreate-db",
         action="store_true", 
@@ -51,8 +111,18 @@ async def main():
     print(f"📂 Input: {json_path}")
     if args.limit:
         print(f"🎯 Limit: {args.limit} items")
+    if args.jobs > 1:
+        print(f"⚙️  Jobs: {args.jobs} highlight workers")
+    if args.slim_pages:
+        print(f"🪶 Slimming pages to their article content")
     if args.recreate_db:
         print(f"🔄 Will recreate database tables")
+        if args.resume:
+            # The checkpoints point at tasks that are about to be dropped
+            print(f"⚠️  --recreate-db discards the checkpoint manifest; ignoring --resume")
+            args.resume = False
+    elif args.resume:
+        print(f"📒 Resuming from checkpoint manifest")
     print("="*60)
     
     # Initialize database
@@ -64,8 +134,24 @@ async def main():
     await init_models()
     
     # Process the ANLI file
-    processor = WikipediaProcessor()
-    results = await processor.process_anli_file(str(json_path), args.limit)
+    processor = WikipediaProcessor(slim_pages=args.slim_pages)
+    # Before highlight workers open the pack
+    move_legacy_pack(processor.saved_dir)
+    config = PipelineConfig(
+        download_concurrency=args.download_concurrency,
+        read_concurrency=args.read_concurrency,
+        highlight_concurrency=args.jobs,
+        db_concurrency=args.db_concurrency,
+        db_batch_size=args.db_batch_size,
+        queue_size=args.queue_size,
+    )
+    results = await processor.process_anli_file(
+        str(json_path),
+        args.limit,
+        config=config,
+        resume=args.resume,
+        checkpoint_path=args.checkpoint,
+    )
     
     # Print final results
     print("\n" + "="*60)
@@ -73,6 +159,8 @@ async def main():
     print(f"✅ Successful tasks: {results['successful']}")
     print(f"❌ Failed tasks: {results['failed']}")
     print(f"📊 Total processed: {results['total']}")
+    if results['skipped'] or results['duplicates']:
+        print(f"⏭️  Skipped (already done): {results['skipped']}, duplicates collapsed: {results['duplicates']}")
     
     if results['total'] > 0:
         success_rate = (results['successful'] / results['total']) * 100
@@ -0,0 +1,106 @@
+"""
+Article slimming for WikiFix pages.
+A saved page carries the whole Vector skin: header, sidebars, menus,
+footer, script loaders and inline config. Inside the task iframe only the
+article matters, so a slimmed page keeps ``#mw-content-text`` and the
+page's stylesheets and drops the rest.
+
+The elements enclosing the article are kept as empty shells (same tags
+and attributes, no other children) and the ``<html>``/``<body>`` classes
+are kept, so skin CSS that targets the article through its ancestors
+renders it exactly as before.
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+CONTENT_ID = 'id="mw-content-text"'
+
+# What the <head> keeps: charset, viewport, title and styles
+HEAD_KEEP_PATTERN = re.compile(
+    r'<meta charset[^>]*>|<meta name="viewport"[^>]*>|<title>.*?</title>'
+    r'|<link rel="stylesheet"[^>]*>|<style\b[^>]*>.*?</style>',
+    re.DOTALL | re.IGNORECASE,
+)
+TAG_PATTERN = re.compile(r'<!--.*?-->|<(/?)([a-zA-Z][\w-]*)\b[^>]*?(/?)>', re.DOTALL)
+DIV_PATTERN = re.compile(r'<div\b|</div\s*>', re.IGNORECASE)
+# Elements whose content is not markup
+RAW_TEXT_ELEMENTS = {"script", "style"}
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+}
+
+
+def slim_article(html_content: str) -> Optional[str]:
+    """The page reduced to its article and styles, or None if it has no ``#mw-content-text``."""
+    content_at = html_content.find(CONTENT_ID)
+    head_start = html_content.find('<head>')
+    head_end = html_content.find('</head>')
+    body_start = html_content.find('<body')
+    if content_at < 0 or head_start < 0 or head_end < 0 or not head_end < body_start < content_at:
+        return None
+    content_start = html_content.rfind('<', 0, content_at)
+    content_end = matching_div_end(html_content, content_start)
+    if content_end is None:
+        return None
+
+    ancestors = open_elements(html_content, body_start, content_start)
+    if ancestors is None or not ancestors or ancestors[0][0] != "body":
+        return None
+
+    pieces = [
+        html_content[:head_start],
+        kept_head(html_content, head_start, head_end),
+        *(tag for _, tag in ancestors),
+        html_content[content_start:content_end],
+        *(f"</{name}>" for name, _ in reversed(ancestors)),
+        "\n</html>\n",
+    ]
+    return "".join(pieces)
+
+
+def kept_head(html_content: str, head_start: int, head_end: int) -> str:
+    """The ``<head>`` between the given offsets reduced to charset, viewport, title and styles."""
+    head = "\n".join(match.group(0) for match in HEAD_KEEP_PATTERN.finditer(html_content, head_start, head_end))
+    return f"<head>\n{head}\n</head>\n"
+
+
+def open_elements(html_content: str, start: int, end: int) -> Optional[List[Tuple[str, str]]]:
+    """Elements still open at ``end``, outermost first, as ``(name, opening tag)``."""
+    stack: List[Tuple[str, str]] = []
+    position = start
+    while True:
+        match = TAG_PATTERN.search(html_content, position, end)
+        if not match:
+            return stack
+        position = match.end()
+        closing, name, self_closing = match.group(1), match.group(2), match.group(3)
+        if name is None:
+            continue  # comment
+        name = name.lower()
+        if closing:
+            # Pop to the matching element; browsers close unclosed children the same way
+            for i in range(len(stack) - 1, -1, -1):
+                if stack[i][0] == name:
+                    del stack[i:]
+                    break
+            continue
+        if name in RAW_TEXT_ELEMENTS:
+            close = html_content.find(f"</{name}", position, end)
+            if close < 0:
+                return None
+            position = close
+            continue
+        if name not in VOID_ELEMENTS and not self_closing:
+            stack.append((name, match.group(0)))
+
+
+def matching_div_end(html_content: str, start: int) -> Optional[int]:
+    """End offset of the ``<div>`` opened at ``start``."""
+    depth = 0
+    for match in DIV_PATTERN.finditer(html_content, start):
+        depth += -1 if match.group(0).startswith('</') else 1
+        if depth == 0:
+            return match.end()
+    return None
@@ -0,0 +1,152 @@
+"""
+Visible-text index of an HTML page for highlighting.
+Extracts the page's visible text, splits it into sentences and keeps a
+mapping from text offsets back to HTML offsets. Fuzzy matching can then
+score short, clean sentences instead of tag soup, and highlights are
+inserted at exact HTML positions.
+"""
+
+import html
+import re
+import sys
+from bisect import bisect_right
+from itertools import islice
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+
+# Comments, raw-text elements whose content is never visible, tags, text
+TOKEN_PATTERN = re.compile(
+    r'<!--.*?-->'
+    r'|<(script|style|noscript|title|template)\b[^>]*>.*?</\1\s*>'
+    r'|<[!/?]?[a-zA-Z][^>]*>'
+    r'|[^<]+'
+    r'|<',
+    re.DOTALL | re.IGNORECASE,
+)
+TAG_NAME_PATTERN = re.compile(r'</?([a-zA-Z][a-zA-Z0-9]*)')
+ENTITY_PATTERN = re.compile(r'&(?:#\d+|#[xX][0-9a-fA-F]+|[a-zA-Z][a-zA-Z0-9]*);')
+# A sentence runs until . ! or ? (plus any citation marks like [12]) followed
+# by whitespace, or until a block break
+SENTENCE_END = r'[.!?]+(?:\[[^\]\n]{1,20}\])*(?=\s|$)'
+SENTENCE_PATTERN = re.compile(rf'(?:(?!{SENTENCE_END})[^\n])+(?:{SENTENCE_END})?')
+
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "caption", "dd", "div", "dl", "dt",
+    "figcaption", "figure", "footer", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr",
+    "li", "main", "nav", "ol", "p", "pre", "section", "table", "td", "th", "tr", "ul",
+}
+MIN_SENTENCE_LENGTH = 10
+
+# Measured per-element costs (CPython, 64-bit): a run is a 4-tuple of ints
+# plus its list slot, a sentence a 2-tuple plus its slot
+_INT_BYTES = sys.getsizeof(1 << 20)
+RUN_BYTES = sys.getsizeof((0, 0, 0, 0)) + 8 + 4 * _INT_BYTES
+SENTENCE_BYTES = sys.getsizeof((0, 0)) + 8 + 2 * _INT_BYTES
+
+
+@dataclass
+class TextIndex:
+    """Visible text of a page plus a text-offset → HTML-offset map.
+
+    ``runs`` holds ``(text_start, text_end, html_start, html_end)`` tuples
+    sorted by ``text_start``. A run is either a verbatim slice of a text
+    node (same length in text and HTML), a decoded entity, or a zero-width
+    block break (``\\n`` in text, empty in HTML).
+    """
+    text: str
+    runs: List[Tuple[int, int, int, int]]
+    sentences: List[Tuple[int, int]] = field(default_factory=list)
+    sentence_texts: List[str] = field(default_factory=list)
+    # Lazily built by the matcher's normalized tier
+    normalized: Optional[Any] = field(default=None, repr=False)
+    _run_starts: List[int] = field(default_factory=list, repr=False)
+
+    @classmethod
+    def build(cls, html_content: str) -> "TextIndex":
+        parts: List[str] = []
+        runs: List[Tuple[int, int, int, int]] = []
+        length = 0
+
+        def add(text: str, html_start: int, html_end: int) -> None:
+            nonlocal length
+            parts.append(text)
+            runs.append((length, length + len(text), html_start, html_end))
+            length += len(text)
+
+        for token in TOKEN_PATTERN.finditer(html_content):
+            value = token.group(0)
+            if value.startswith("<") and len(value) > 1:
+                name = TAG_NAME_PATTERN.match(value)
+                if name and name.group(1).lower() in BLOCK_TAGS and parts and parts[-1] != "\n":
+                    add("\n", token.start(), token.start())
+                continue
+
+            # Text node: verbatim slices between entities, decoded entities on their own
+            position = token.start()
+            for entity in ENTITY_PATTERN.finditer(value):
+                if position < token.start() + entity.start():
+                    add(_flatten(html_content[position:token.start() + entity.start()]), position, token.start() + entity.start())
+                decoded = html.unescape(entity.group(0))
+                add(_flatten(decoded), token.start() + entity.start(), token.start() + entity.end())
+                position = token.start() + entity.end()
+            if position < token.end():
+                add(_flatten(html_content[position:token.end()]), position, token.end())
+
+        index = cls(text="".join(parts), runs=runs)
+        index._run_starts = [run[0] for run in runs]
+        index.sentences = index._split_sentences()
+        index.sentence_texts = [index.text[start:end] for start, end in index.sentences]
+        return index
+
+    def memory_size(self) -> int:
+        """Approximate memory footprint in bytes, not counting ``normalized``."""
+        return (
+            sys.getsizeof(self.text)
+            + len(self.runs) * RUN_BYTES
+            + sys.getsizeof(self._run_starts)
+            + len(self.sentences) * SENTENCE_BYTES
+            + sum(sys.getsizeof(text) + 8 for text in self.sentence_texts)
+        )
+
+    def _split_sentences(self) -> List[Tuple[int, int]]:
+        sentences = []
+        for match in SENTENCE_PATTERN.finditer(self.text):
+            start, end = match.span()
+            sentence = match.group(0)
+            stripped = sentence.strip()
+            if len(stripped) > MIN_SENTENCE_LENGTH:
+                start += len(sentence) - len(sentence.lstrip())
+                end -= len(sentence) - len(sentence.rstrip())
+                sentences.append((start, end))
+        return sentences
+
+    def html_segments(self, text_start: int, text_end: int) -> List[Tuple[int, int]]:
+        """HTML ranges covering ``text[text_start:text_end]``, one per contiguous text run.
+
+        Each range lies inside a single text node, so it can be wrapped in an
+        element without breaking the document structure.
+        """
+        segments: List[List[int]] = []
+        first = max(bisect_right(self._run_starts, text_start) - 1, 0)
+        for run_start, run_end, html_start, html_end in islice(self.runs, first, None):
+            if run_start >= text_end:
+                break
+            if run_end <= text_start or html_start == html_end:
+                continue
+            if html_end - html_start == run_end - run_start:
+                # Verbatim slice: clip to the requested range
+                start = html_start + max(text_start - run_start, 0)
+                end = html_end - max(run_end - text_end, 0)
+            else:
+                # Decoded entity: all or nothing
+                start, end = html_start, html_end
+            if segments and segments[-1][1] == start:
+                segments[-1][1] = end
+            else:
+                segments.append([start, end])
+        return [(start, end) for start, end in segments]
+
+
+def _flatten(text: str) -> str:
+    """Turn source line breaks into spaces so ``\\n`` only marks block breaks."""
+    return text.replace("\n", " ").replace("\r", " ").replace("\t", " ")
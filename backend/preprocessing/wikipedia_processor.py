@@ -4,29 +4,109 @@ Ultra-simple Wikipedia processor for WikiFix.
 Does everything in one place: download pages, highlight text, store in DB.
 """
 
+import asyncio
 import json
+import multiprocessing
+import os
 import re
-import subprocess
+import threading
 import urllib.parse
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
 import sys
-from rapidfuzz import process, fuzz
 
 # Add backend to path for imports
 backend_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_dir))
 
-from db.tasks_ops import Task, TaskStatus, AsyncSessionLocal
+from db.pages_ops import page_row
+from db.tasks_ops import TaskBatchWriter, task_row_from_anli
+from preprocessing.checkpoint import CheckpointManifest, file_state, item_hash, page_revision
+from preprocessing.downloader import WikipediaDownloader
+from preprocessing.highlight_markup import merge_segments, render_highlights
+from preprocessing.page_cache import PageCache, PreparedPage, RenderCache, StoredPage
+from preprocessing.page_pack import PagePack
+from preprocessing.matcher import MIN_MATCH_SCORE, TextMatch, TieredMatcher
+from preprocessing.text_index import TextIndex
+from preprocessing.pipeline import Pipeline, Stage
+from preprocessing.slimming import slim_article
+
+
+@dataclass
+class PipelineConfig:
+    """Worker counts and queue bounds for the ingestion pipeline stages."""
+    download_concurrency: int = 8
+    read_concurrency: int = 4
+    highlight_concurrency: int = 1
+    db_concurrency: int = 1
+    db_batch_size: int = 100
+    queue_size: int = 32
+
+
+# Bump whenever highlighting output changes so --resume reprocesses old items
+HIGHLIGHTER_VERSION = 3
+# Bump whenever fix_html_urls output changes; part of /api/wiki ETags and render cache keys
+URL_REWRITE_VERSION = 1
+
+class MultiHighlightResult(NamedTuple):
+    """One page highlighted for several spans; ``matches`` lines up with the spans given.
+
+    ``segments`` are the HTML ranges to wrap, anchored range first;
+    ``span_segments`` are each span's own ranges (empty where it wasn't
+    found); ``html`` is None when rendering was not requested.
+    """
+    html: Optional[str]
+    matches: List[Optional[TextMatch]]
+    segments: List[Tuple[int, int]] = []
+    span_segments: List[List[Tuple[int, int]]] = []
+
+    @property
+    def success(self) -> bool:
+        return any(match is not None for match in self.matches)
+
+
+class HighlightResult(NamedTuple):
+    """Highlighted page HTML, whether a span was found, which matcher tier found it and its HTML ranges."""
+    html: Optional[str]
+    success: bool
+    tier: Optional[str] = None
+    segments: List[Tuple[int, int]] = []
+
+
+@dataclass
+class PageJob:
+    """All spans that must be highlighted on one page: ``(item index, role, text)``."""
+    page_name: str
+    url: str
+    spans: List[Tuple[int, str, str]] = field(default_factory=list)
+
+
+DEFAULT_SAVED_DIR = Path("/data1/akhatua/wikifix/backend/saved_site")
 
 
 class WikipediaProcessor:
     """Simple Wikipedia processor that does everything."""
     
-    def __init__(self):
+    def __init__(
+        self,
+        saved_dir: Optional[Path] = None,
+        page_cache_bytes: int = 256 * 1024 * 1024,
+        slim_pages: bool = False,
+    ):
         # Use absolute path for saved_site
-        self.saved_dir = Path("/data1/akhatua/wikifix/backend/saved_site")
+        self.saved_dir = Path(saved_dir) if saved_dir else DEFAULT_SAVED_DIR
         self.saved_dir.mkdir(exist_ok=True)
+        self.page_cache = PageCache(page_cache_bytes)
+        self.matcher = TieredMatcher()
+        # Optional single-file archive; loose files are used for pages it doesn't have
+        self.page_pack = PagePack.for_saved_dir(self.saved_dir)
+        # Store only the article of each page (see preprocessing.slimming)
+        self.slim_pages = slim_pages
+        self.slim_stats = {"pages": 0, "bytes_before": 0, "bytes_after": 0}
+        self._slim_lock = threading.Lock()
         
     def extract_page_name(self, url: str) -> str:
         """Extract Wikipedia page name from URL."""
@@ -43,125 +123,173 @@ class WikipediaProcessor:
         page_name = urllib.parse.unquote(page_name)
         return self.saved_dir / "en.wikipedia.org" / "wiki" / f"{page_name}.html"
     
+    def _packed_name(self, path: Path) -> str:
+        """Pack entry name for a local page path (the inverse of ``get_local_path``)."""
+        return Path(path).relative_to(self.saved_dir / "en.wikipedia.org" / "wiki").as_posix()[:-len(".html")]
+    
+    def read_local_page(self, page_name: str) -> Optional[str]:
+        """Saved HTML of a page, from the page pack or else its loose file; None if it isn't saved."""
+        return self.read_local_path(self.get_local_path(page_name))
+    
+    def read_local_path(self, path: Path) -> Optional[str]:
+        """Saved HTML of the page at a ``get_local_path`` path, packed or loose."""
+        data = self.page_pack.read(self._packed_name(path))
+        if data is not None:
+            return data.decode("utf-8")
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+    
+    def local_page_state(self, path: str) -> Optional[Dict[str, int]]:
+        """Change detector for a saved page: its pack record, else its file's mtime and size."""
+        entry = self.page_pack.get(self._packed_name(path))
+        if entry is not None:
+            return {"pack_offset": entry.offset, "pack_crc": entry.crc}
+        return file_state(path)
+    
+    def has_local_page(self, page_name: str) -> bool:
+        """True if a page is saved, packed or loose."""
+        return self.local_page_state(self.get_local_path(page_name)) is not None
+    
     def download_page(self, url: str) -> bool:
-        """Download a Wikipedia page using wget."""
-        page_name = self.extract_page_name(url)
-        if not page_name:
-            print(f"❌ Invalid URL: {url}")
-            return False
-            
-        local_path = self.get_local_path(page_name)
-        if local_path.exists():
-            print(f"✅ Already exists: {page_name}")
-            return True
-            
-        print(f"📥 Downloading: {page_name}")
+        """Download a Wikipedia page and its requisites (blocking convenience wrapper)."""
+        async def download() -> bool:
+            async with WikipediaDownloader(self) as downloader:
+                return await downloader.download_page(url)
         
-        try:
-            cmd = [
-                'wget', '--mirror', '--convert-links', '--adjust-extension',
-                '--page-requisites', '--no-parent', '-P', str(self.saved_dir), url
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-            
-            if result.returncode == 0:
-                print(f"✅ Downloaded: {page_name}")
-                return True
-            else:
-                print(f"❌ Failed: {page_name} - {result.stderr}")
-                return False
-                
-        except Exception as e:
-            print(f"❌ Error downloading {page_name}: {e}")
-            return False
+        return asyncio.run(download())
+    
+    def prepare_html(self, html_content: str, page_name: str = "", revision: Optional[int] = None) -> PreparedPage:
+        """Strip anchors and index visible text once so a page can be highlighted many times."""
+        if revision is None:
+            revision = page_revision(html_content)
+        return self.index_page(self.strip_anchors(html_content), page_name, revision)
+    
+    def strip_anchors(self, html_content: str) -> str:
+        return re.sub(r'<a [^>]*>(.*?)</a>', r'\1', html_content, flags=re.DOTALL)
+    
+    def index_page(self, html_content: str, page_name: str, revision: Optional[int]) -> PreparedPage:
+        """Index the visible text of HTML that already had its anchors stripped."""
+        return PreparedPage(
+            page_name=page_name,
+            html=html_content,
+            index=TextIndex.build(html_content),
+            revision=revision,
+        )
     
-    def split_html_by_sentence(self, html_content: str) -> List[str]:
-        """Split HTML content into sentences, preserving all HTML formatting."""
-        # This regex matches sentences ending with ., !, or ? (possibly followed by quotes or HTML tags)
-        sentence_pattern = r'[^.!?]*[.!?]'  # Simple heuristic
-        sentences = re.findall(sentence_pattern, html_content, re.DOTALL)
-        # Remove empty/very short sentences
-        return [s.strip() for s in sentences if len(s.strip()) > 10]
+    def slim_page(self, html_content: str, page_name: str = "") -> str:
+        """Reduce a rewritten page to its article, reporting the bytes saved."""
+        slimmed = slim_article(html_content)
+        if slimmed is None:
+            print(f"⚠️  No article content to slim in {page_name}, keeping the full page")
+            return html_content
+        before = len(html_content.encode("utf-8"))
+        after = len(slimmed.encode("utf-8"))
+        with self._slim_lock:
+            self.slim_stats["pages"] += 1
+            self.slim_stats["bytes_before"] += before
+            self.slim_stats["bytes_after"] += after
+        print(f"🪶 Slimmed {page_name}: {before / 1e3:.0f} KB → {after / 1e3:.0f} KB ({(before - after) / 1e3:.0f} KB saved)")
+        return slimmed
+    
+    @property
+    def output_version(self) -> Union[int, str]:
+        """Highlighter version plus anything else that changes the stored pages, for checkpoints."""
+        return f"{HIGHLIGHTER_VERSION}-slim" if self.slim_pages else HIGHLIGHTER_VERSION
+    
+    def prepare_page(self, page_name: str) -> PreparedPage:
+        """Read, rewrite and split a downloaded page, going through the page cache."""
+        return self.page_cache.get_or_prepare(page_name, self.load_page)
+
+    def load_page(self, page_name: str) -> PreparedPage:
+        """Read, rewrite and split a downloaded page, without caching it."""
+        html_content, revision = self.load_page_html(page_name)
+        return self.index_page(html_content, page_name, revision)
+
+    def load_page_html(self, page_name: str) -> Tuple[str, Optional[int]]:
+        """Read and rewrite a downloaded page as it is highlighted and stored, without indexing it.
+        
+        Returns the page HTML (URLs rewritten, slimmed if enabled, anchors
+        stripped) and its revision.
+        """
+        html_content = self.read_local_page(page_name)
+        if html_content is None:
+            raise FileNotFoundError(self.get_local_path(page_name))
+        html_content = self.fix_html_urls(html_content, page_name)
+        # The revision lives in the page config script, which slimming drops
+        revision = page_revision(html_content)
+        if self.slim_pages:
+            html_content = self.slim_page(html_content, page_name)
+        return self.strip_anchors(html_content), revision
 
     def highlight_text_in_html(self, html_content: str, text_to_find: str) -> Tuple[str, bool]:
-        """Find and highlight text in HTML content using fuzzy matching on sentence chunks."""
+        """Find and highlight text in HTML content (exact, then normalized, then fuzzy)."""
         if not text_to_find or not html_content:
             return html_content, False
         
-        html_content = re.sub(r'<a [^>]*>(.*?)</a>', r'\1', html_content, flags=re.DOTALL)
-
-        # Use only the first sentence of text_to_find
-        first_sentence_match = re.match(r'(.+?[.!?])', text_to_find.strip(), re.DOTALL)
-        if first_sentence_match:
-            text_to_match = first_sentence_match.group(1).strip()
-        else:
-            text_to_match = text_to_find.strip()
-
-        print(f"🔍 Fuzzy matching on HTML sentences for: '{text_to_match[:50]}...'")
-
-        # Get sentence chunks
-        html_chunks = self.split_html_by_sentence(html_content)
+        result = self.highlight_prepared(self.prepare_html(html_content), text_to_find)
+        return result.html, result.success
+    
+    def highlight_prepared(self, page: PreparedPage, text_to_find: str, render: bool = True) -> HighlightResult:
+        """Highlight text in an already-prepared page.
+        
+        With ``render=False`` only the HTML ranges are returned, for storing
+        against the page instead of a full highlighted copy.
+        """
+        if not text_to_find or not page.html:
+            return HighlightResult(page.html if render else None, False)
+        
+        result = self.highlight_spans(page, [text_to_find], render)
+        match = result.matches[0]
+        if not match:
+            return HighlightResult(page.html if render else None, False)
+        return HighlightResult(result.html, True, match.tier, result.span_segments[0])
+    
+    def highlight_spans(self, page: PreparedPage, texts: List[str], render: bool = True) -> MultiHighlightResult:
+        """Highlight several spans (claim, context, snippets...) on one page in a single rewrite.
+        
+        All spans are matched against the page's shared index, and their
+        highlights are inserted in one pass over the HTML. The first span
+        that is found gets the ``highlighted-text`` anchor, so pass the
+        primary span first.
+        """
+        html_content = page.html
+        if not html_content:
+            return MultiHighlightResult(html_content if render else None, [None] * len(texts), [], [[] for _ in texts])
 
-        if not html_chunks:
-            print("❌ No sentence chunks found for matching")
-            return html_content, False
+        matches: List[Optional[TextMatch]] = []
+        span_segments: List[List[Tuple[int, int]]] = []
+        for text_to_find, match in zip(texts, self.matcher.match_many(page.index, texts)):
+            matches.append(None)
+            span_segments.append([])
+            if not text_to_find or not text_to_find.strip():
+                continue
+            print(f"🔍 Matching over {len(page.index.sentences)} sentences for: '{text_to_find.strip()[:50]}...'")
+            if not match:
+                print(f"❌ No good text matches found (min score: {MIN_MATCH_SCORE})")
+                continue
 
-        print(f"🔍 Searching {len(html_chunks)} sentence chunks...")
+            print(f"✅ {match.tier} match (score {match.score:.1f}): '{page.index.text[match.start:match.end][:50]}...'")
+            # Wrap each text node of the match at its exact HTML position
+            segments = page.index.html_segments(match.start, match.end)
+            if not segments:
+                print(f"❌ Failed to highlight HTML content")
+                continue
+            matches[-1] = match
+            span_segments[-1] = segments
 
-        # Find best match using lower threshold for HTML content
-        result = process.extractOne(
-            text_to_match,
-            html_chunks,
-            scorer=fuzz.token_sort_ratio,
-            score_cutoff=10  # Lower threshold for HTML content
-        )
+        segment_lists = [segments for segments in span_segments if segments]
+        if not segment_lists:
+            return MultiHighlightResult(html_content if render else None, matches, [], span_segments)
 
-        if result:
-            best_match_html, score, _ = result
-            print(f"✅ Best HTML match (score {score:.1f}): '{best_match_html[:50]}...'")
-
-            # Highlight safely - find first substantial text node without breaking HTML structure
-            text_match = re.search(r'>([^<]{20,}?)[<.]', best_match_html)  # Find text nodes with 20+ chars
-            if text_match:
-                text_to_highlight = text_match.group(1).strip()
-                inner_highlighted = best_match_html.replace(text_to_highlight, f'<span class="wikifix-highlight" id="highlighted-text">{text_to_highlight}</span>', 1)
-            else:
-                inner_highlighted = f'<span class="wikifix-highlight" id="highlighted-text">{best_match_html}</span>'
-            highlighted = html_content.replace(best_match_html, inner_highlighted, 1)
-
-            # Check if highlighting worked
-            success = 'wikifix-highlight' in highlighted
-
-            if success:
-                # Add simple yellow highlight CSS
-                css = """
-<style>
-.wikifix-highlight {
-    background-color: yellow !important;
-}
-</style>
-<script>
-document.addEventListener('DOMContentLoaded', function() {
-    const highlighted = document.getElementById('highlighted-text');
-    if (highlighted) {
-        setTimeout(() => highlighted.scrollIntoView({behavior: 'smooth', block: 'center'}), 500);
-    }
-});
-</script>"""
-
-                if '<head>' in highlighted:
-                    highlighted = highlighted.replace('<head>', f'<head>{css}', 1)
-                else:
-                    highlighted = css + highlighted
-
-                print(f"✅ Successfully highlighted HTML content")
-                return highlighted, True
-            else:
-                print(f"❌ Failed to highlight HTML content")
-                return html_content, False
-        else:
-            print(f"❌ No good HTML matches found (min score: 50)")
-            return html_content, False
+        segments = merge_segments(segment_lists)
+        # The range holding the first found span carries the anchor, so it goes first
+        anchor = bisect_right(segments, (segment_lists[0][0][0], float("inf"))) - 1
+        segments.insert(0, segments.pop(anchor))
+        print(f"✅ Successfully highlighted HTML content")
+        return MultiHighlightResult(render_highlights(html_content, segments) if render else None, matches, segments, span_segments)
     
     def fix_html_urls(self, html_content: str, page_name: str) -> str:
         """Fix URLs in HTML for local serving."""
@@ -186,103 +314,180 @@ document.addEventListener('DOMContentLoaded', function() {
         print(f"\n=== Processing Task ===")
         print(f"Claim: {anli_item.get('claim', 'N/A')[:50]}...")
         
-        # Extract URLs and text spans
-        claim_url = anli_item.get("document_url", "")
-        evidence_url = anli_item.get("evidence_url", "")
-        claim_text = anli_item.get("claim_text_span", "")
-        evidence_text = anli_item.get("evidence_sentence", "")
-        
-        if not all([claim_url, evidence_url, claim_text, evidence_text]):
+        if not self.has_required_fields(anli_item):
             print("❌ Missing required data")
             return None
         
         # Download pages
-        if not self.download_page(claim_url) or not self.download_page(evidence_url):
+        if not self.download_page(anli_item["document_url"]) or not self.download_page(anli_item["evidence_url"]):
             print("❌ Failed to download pages")
             return None
         
-        # Process claim
-        claim_page = self.extract_page_name(claim_url)
-        claim_path = self.get_local_path(claim_page)
-        
+        return self.highlight_item(anli_item)
+    
+    def has_required_fields(self, anli_item: Dict) -> bool:
+        """Check that an ANLI item has both URLs and both text spans."""
+        return all([
+            anli_item.get("document_url", ""),
+            anli_item.get("evidence_url", ""),
+            anli_item.get("claim_text_span", ""),
+            anli_item.get("evidence_sentence", ""),
+        ])
+    
+    def highlight_item(self, anli_item: Dict) -> Optional[Dict]:
+        """Highlight the claim and evidence pages of an already-downloaded ANLI item."""
         try:
-            with open(claim_path, 'r', encoding='utf-8') as f:
-                claim_html = f.read()
-            
-            claim_html = self.fix_html_urls(claim_html, claim_page)
-            claim_highlighted, claim_success = self.highlight_text_in_html(claim_html, claim_text)
-            
+            claim_page = self.prepare_page(self.extract_page_name(anli_item.get("document_url", "")))
+            claim_result = self.highlight_prepared(claim_page, anli_item.get("claim_text_span", ""), render=False)
         except Exception as e:
             print(f"❌ Error processing claim: {e}")
             return None
         
-        # Process evidence
-        evidence_page = self.extract_page_name(evidence_url)
-        evidence_path = self.get_local_path(evidence_page)
-        
         try:
-            with open(evidence_path, 'r', encoding='utf-8') as f:
-                evidence_html = f.read()
-            
-            evidence_html = self.fix_html_urls(evidence_html, evidence_page)
-            evidence_highlighted, evidence_success = self.highlight_text_in_html(evidence_html, evidence_text)
-            
+            evidence_page = self.prepare_page(self.extract_page_name(anli_item.get("evidence_url", "")))
+            evidence_result = self.highlight_prepared(evidence_page, anli_item.get("evidence_sentence", ""), render=False)
         except Exception as e:
             print(f"❌ Error processing evidence: {e}")
             return None
         
+        return self.combine_highlights(anli_item, (claim_result, claim_page), (evidence_result, evidence_page))
+    
+    def combine_highlights(
+        self,
+        anli_item: Dict,
+        claim_result: Tuple[HighlightResult, Union[PreparedPage, StoredPage]],
+        evidence_result: Tuple[HighlightResult, Union[PreparedPage, StoredPage]],
+    ) -> Optional[Dict]:
+        """Combine per-page ``(result, page)`` pairs into a processed item.
+        
+        Each highlighted side carries a pages-table row for its base page and
+        the HTML ranges to highlight in it. A side's page only needs a row if
+        its result succeeded.
+        """
+        claim, claim_page = claim_result
+        evidence, evidence_page = evidence_result
+        
         # Only proceed if at least one highlighting worked
-        if not (claim_success or evidence_success):
+        if not (claim.success or evidence.success):
             print("❌ No highlighting successful")
             return None
         
-        print(f"✅ Success - Claim: {'✅' if claim_success else '❌'}, Evidence: {'✅' if evidence_success else '❌'}")
+        print(f"✅ Success - Claim: {'✅' if claim.success else '❌'}, Evidence: {'✅' if evidence.success else '❌'}")
         
         return {
             "anli_item": anli_item,
-            "claim_highlighted_html": claim_highlighted if claim_success else None,
-            "evidence_highlighted_html": evidence_highlighted if evidence_success else None,
-            "claim_success": claim_success,
-            "evidence_success": evidence_success
+            "claim_page": claim_page.row if claim.success else None,
+            "evidence_page": evidence_page.row if evidence.success else None,
+            "claim_highlight_ranges": list(claim.segments) if claim.success else None,
+            "evidence_highlight_ranges": list(evidence.segments) if evidence.success else None,
+            "claim_success": claim.success,
+            "evidence_success": evidence.success,
+            "claim_match_tier": claim.tier,
+            "evidence_match_tier": evidence.tier,
+            "claim_revision": claim_page.revision,
+            "evidence_revision": evidence_page.revision,
         }
     
+    def group_by_page(self, anli_items: List[Dict]) -> List[PageJob]:
+        """Group the claim and evidence spans of all items by the page they live on.
+        
+        Pages are ordered by first use, so an item's two pages tend to be
+        processed close together.
+        """
+        jobs: Dict[str, PageJob] = {}
+        for index, anli_item in enumerate(anli_items):
+            for role, url_key, span_key in (
+                ("claim", "document_url", "claim_text_span"),
+                ("evidence", "evidence_url", "evidence_sentence"),
+            ):
+                url = anli_item[url_key]
+                page_name = self.extract_page_name(url)
+                job = jobs.setdefault(urllib.parse.unquote(page_name), PageJob(page_name=page_name, url=url))
+                job.spans.append((index, role, anli_item[span_key]))
+        return list(jobs.values())
+    
+    def highlight_many(self, anli_items: List[Dict], jobs: Optional[int] = None) -> List[Optional[Dict]]:
+        """Highlight many downloaded ANLI items on a process pool.
+        
+        Workers only receive the ANLI items and read pages from ``saved_dir``
+        themselves, so no page HTML is pickled on the way in. Results are
+        returned in the same order as ``anli_items``.
+        """
+        jobs = jobs or os.cpu_count() or 1
+        if jobs <= 1 or len(anli_items) <= 1:
+            return [self.highlight_item(item) for item in anli_items]
+        
+        # Send items that share pages to workers together so each worker's page
+        # cache gets hits, then restore the caller's order
+        order = sorted(
+            range(len(anli_items)),
+            key=lambda i: (anli_items[i].get("document_url", ""), anli_items[i].get("evidence_url", "")),
+        )
+        
+        # A few chunks per worker keeps IPC overhead low while still balancing load
+        chunksize = max(1, len(anli_items) // (jobs * 4))
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_highlight_worker,
+            initargs=(str(self.saved_dir), self.slim_pages),
+        ) as pool:
+            results = pool.map(_highlight_worker, [anli_items[i] for i in order], chunksize=chunksize)
+            ordered: List[Optional[Dict]] = [None] * len(anli_items)
+            for i, result in zip(order, results):
+                ordered[i] = result
+            return ordered
+    
+    def task_row(self, processed_data: Dict) -> Dict:
+        """Build a tasks-table row from a processed item."""
+        claim_page = processed_data.get("claim_page")
+        evidence_page = processed_data.get("evidence_page")
+        return task_row_from_anli(
+            processed_data["anli_item"],
+            claim_page_id=claim_page["id"] if claim_page else None,
+            claim_highlight_ranges=processed_data.get("claim_highlight_ranges"),
+            evidence_page_id=evidence_page["id"] if evidence_page else None,
+            evidence_highlight_ranges=processed_data.get("evidence_highlight_ranges"),
+        )
+    
+    def task_pages(self, processed_items: List[Dict]) -> List[Dict]:
+        """Distinct pages-table rows referenced by processed items."""
+        pages = {}
+        for item in processed_items:
+            for page in (item.get("claim_page"), item.get("evidence_page")):
+                if page:
+                    pages.setdefault(page["id"], page)
+        return list(pages.values())
+    
     async def create_task_in_db(self, processed_data: Dict) -> Optional[str]:
         """Create a task in the database."""
-        anli_item = processed_data["anli_item"]
-        
-        async with AsyncSessionLocal() as session:
-            task = Task(
-                # Claim data
-                claim_sentence=anli_item.get("claim", ""),
-                claim_context=anli_item.get("claim_context", ""),
-                claim_document_title=anli_item.get("document_title", ""),
-                claim_text_span=anli_item.get("claim_text_span", ""),
-                claim_url=anli_item.get("document_url", ""),
-                claim_highlighted_html=processed_data.get("claim_highlighted_html"),
-                
-                # Evidence data
-                evidence_sentence=anli_item.get("evidence_sentence", ""),
-                evidence_context=anli_item.get("evidence", ""),
-                evidence_document_title=anli_item.get("evidence_document_title", ""),
-                evidence_text_span=anli_item.get("evidence_sentence", ""),
-                evidence_url=anli_item.get("evidence_url", ""),
-                evidence_highlighted_html=processed_data.get("evidence_highlighted_html"),
-                
-                # LLM analysis
-                llm_analysis=anli_item.get("llm_report", {}).get("analysis", ""),
-                contradiction_type=anli_item.get("llm_report", {}).get("contradiction_type", ""),
-                
-                status=TaskStatus.OPEN
-            )
-            
-            session.add(task)
-            await session.commit()
-            await session.refresh(task)
-            
-            return task.id
-    
-    async def process_anli_file(self, json_path: str, limit: Optional[int] = None) -> Dict[str, int]:
-        """Process entire ANLI JSON file and populate database."""
+        task_ids = await self.create_tasks_in_db([processed_data])
+        return task_ids[0]
+    
+    async def create_tasks_in_db(self, processed_items: List[Dict], writer: Optional[TaskBatchWriter] = None) -> List[str]:
+        """Create many tasks (and their new pages) in one transaction, returning task IDs in order.
+        
+        Reusing a ``writer`` across calls skips re-sending pages it already stored.
+        """
+        writer = writer or TaskBatchWriter()
+        return await writer.write([self.task_row(item) for item in processed_items], self.task_pages(processed_items))
+    
+    async def process_anli_file(
+        self,
+        json_path: str,
+        limit: Optional[int] = None,
+        jobs: int = 1,
+        config: Optional[PipelineConfig] = None,
+        resume: bool = False,
+        checkpoint_path: Optional[str] = None,
+    ) -> Dict[str, int]:
+        """Process entire ANLI JSON file and populate database.
+        
+        Items flow through a staged pipeline (download → read/rewrite →
+        highlight → DB write) so page I/O, highlighting and inserts overlap.
+        Every committed task is recorded in a checkpoint manifest; with
+        ``resume`` items already in it are skipped. Duplicate ANLI entries
+        are always collapsed to their first occurrence.
+        """
         print(f"🚀 Processing ANLI file: {json_path}")
         
         # Load JSON
@@ -292,48 +497,234 @@ document.addEventListener('DOMContentLoaded', function() {
         if limit:
             anli_data = anli_data[:limit]
         
-        print(f"📊 Processing {len(anli_data)} items")
+        manifest = CheckpointManifest(
+            Path(checkpoint_path or f"{json_path}.checkpoint.jsonl"),
+            self.output_version,
+            page_state=self.local_page_state,
+            read_page=self.read_local_path,
+        )
+        if resume:
+            print(f"📒 Resuming from {manifest.path} ({manifest.load()} checkpointed items)")
+        else:
+            manifest.reset()
+        
+        pending = []
+        seen = set()
+        duplicates = 0
+        skipped = 0
+        invalid = 0
+        for anli_item in anli_data:
+            if not self.has_required_fields(anli_item):
+                invalid += 1
+                continue
+            anli_hash = item_hash(anli_item)
+            if anli_hash in seen:
+                duplicates += 1
+                continue
+            seen.add(anli_hash)
+            if resume and manifest.is_done(anli_hash):
+                skipped += 1
+                continue
+            pending.append(anli_item)
         
-        # Process each item
+        print(f"📊 Processing {len(pending)} items ({skipped} already done, {duplicates} duplicates)")
+        if invalid:
+            print(f"❌ {invalid} items are missing required data")
+        
+        config = config or PipelineConfig(highlight_concurrency=jobs)
+        loop = asyncio.get_running_loop()
         successful = 0
-        failed = 0
-        
-        for i, anli_item in enumerate(anli_data, 1):
-            print(f"\n📝 Item {i}/{len(anli_data)}")
-            
-            processed = self.process_single_task(anli_item)
-            if processed:
-                task_id = await self.create_task_in_db(processed)
-                if task_id:
-                    successful += 1
-                    print(f"✅ Created task: {task_id}")
-                else:
-                    failed += 1
-                    print("❌ Failed to create task in DB")
-            else:
-                failed += 1
-                print("❌ Failed to process task")
-            
-            # Progress update
-            if i % 10 == 0:
-                print(f"\n📈 Progress: {i}/{len(anli_data)} - Success: {successful}, Failed: {failed}")
-        
-        print(f"\n🎉 Complete! Successful: {successful}, Failed: {failed}")
-        return {"successful": successful, "failed": failed, "total": len(anli_data)}
+        
+        # Work is scheduled per page, so each page is downloaded, read and
+        # highlighted once no matter how many items cite it
+        page_jobs = self.group_by_page(pending)
+        print(f"📄 {len(page_jobs)} distinct pages")
+        # Items waiting for their other page keep only its row (if highlighted) and revision
+        partial: Dict[int, Dict[str, Tuple[HighlightResult, StoredPage]]] = {}
+        writer = TaskBatchWriter(config.db_batch_size)
+        tier_counts: Dict[str, int] = {}
+        
+        async def download(job: PageJob) -> Optional[PageJob]:
+            if not await downloader.download_page(job.url):
+                print(f"❌ Failed to download page: {job.page_name}")
+                return None
+            return job
+        
+        async def read(job: PageJob) -> Tuple[PageJob, str, Optional[int]]:
+            # The HTML to store; workers index their own copy, so it is never shipped to them
+            html_content, revision = await asyncio.to_thread(self.load_page_html, job.page_name)
+            return job, html_content, revision
+        
+        async def highlight(loaded: Tuple[PageJob, str, Optional[int]]) -> Tuple[PageJob, str, Optional[int], List[HighlightResult]]:
+            job, html_content, revision = loaded
+            texts = [text for _, _, text in job.spans]
+            results = await loop.run_in_executor(pool, _highlight_page_worker, job.page_name, revision, texts)
+            return job, html_content, revision, results
+        
+        async def assemble(highlighted: Tuple[PageJob, str, Optional[int], List[HighlightResult]]) -> List[Dict]:
+            job, html_content, revision, results = highlighted
+            completed = []
+            # The HTML is kept only if some span matched
+            row = page_row(job.page_name, html_content, revision) if any(result.success for result in results) else None
+            stored = StoredPage(row, revision)
+            for (index, role, _), result in zip(job.spans, results):
+                if result.tier:
+                    tier_counts[result.tier] = tier_counts.get(result.tier, 0) + 1
+                roles = partial.setdefault(index, {})
+                roles[role] = (result, stored)
+                if len(roles) == 2:
+                    del partial[index]
+                    processed = self.combine_highlights(pending[index], roles["claim"], roles["evidence"])
+                    if processed:
+                        completed.append(processed)
+            return completed
+        
+        async def write(processed_items: List[Dict]) -> List[str]:
+            task_ids = await self.create_tasks_in_db(processed_items, writer)
+            # Checkpoint only after the batch is committed
+            await asyncio.to_thread(manifest.record_many, [
+                {
+                    "item": item_hash(processed["anli_item"]),
+                    "task_id": task_id,
+                    "tiers": {"claim": processed["claim_match_tier"], "evidence": processed["evidence_match_tier"]},
+                    "pages": {
+                        self.get_local_path(self.extract_page_name(processed["anli_item"]["document_url"])): processed["claim_revision"],
+                        self.get_local_path(self.extract_page_name(processed["anli_item"]["evidence_url"])): processed["evidence_revision"],
+                    },
+                }
+                for processed, task_id in zip(processed_items, task_ids)
+            ])
+            return task_ids
+        
+        def on_task_created(task_id: str) -> None:
+            nonlocal successful
+            successful += 1
+            print(f"✅ Created task: {task_id}")
+            if successful % 10 == 0:
+                print(f"\n📈 Progress: {successful}/{len(pending)} tasks created")
+        
+        stages = [
+            Stage("download", download, config.download_concurrency, config.queue_size),
+            Stage("read", read, config.read_concurrency, config.queue_size),
+            Stage("highlight", highlight, config.highlight_concurrency, config.queue_size),
+            Stage("assemble", assemble, 1, config.queue_size, fan_out=True),
+            Stage("db_write", write, config.db_concurrency, config.queue_size, batch_size=config.db_batch_size),
+        ]
+        
+        async with WikipediaDownloader(self, per_host_limit=config.download_concurrency) as downloader:
+            with ProcessPoolExecutor(
+                max_workers=config.highlight_concurrency,
+                initializer=_init_highlight_worker,
+                initargs=(str(self.saved_dir), self.slim_pages),
+            ) as pool:
+                stats = await Pipeline(stages, on_output=on_task_created).run(page_jobs)
+        
+        print("\n📊 Stage throughput:")
+        for stage_stats in stats:
+            print(f"   {stage_stats.summary()}")
+        if self.slim_pages and self.slim_stats["pages"]:
+            saved = self.slim_stats["bytes_before"] - self.slim_stats["bytes_after"]
+            print(
+                f"   slimming {self.slim_stats['pages']} pages: {self.slim_stats['bytes_before'] / 1e6:.1f} MB → "
+                f"{self.slim_stats['bytes_after'] / 1e6:.1f} MB ({saved / 1e6:.1f} MB saved)"
+            )
+        print(f"   match tiers {' '.join(f'{tier}={count}' for tier, count in sorted(tier_counts.items()))}")
+        
+        failed = len(pending) + invalid - successful
+        print(f"\n🎉 Complete! Successful: {successful}, Failed: {failed}, Skipped: {skipped}, Duplicates: {duplicates}")
+        return {
+            "successful": successful,
+            "failed": failed,
+            "skipped": skipped,
+            "duplicates": duplicates,
+            "total": len(pending) + invalid,
+        }
+
+
+# Process pool workers for highlight_many; each worker builds its own processor once
+_worker_processor: Optional[WikipediaProcessor] = None
+
+
+def _init_highlight_worker(saved_dir: str, slim_pages: bool = False) -> None:
+    global _worker_processor
+    _worker_processor = WikipediaProcessor(Path(saved_dir), slim_pages=slim_pages)
+
+
+def _highlight_worker(anli_item: Dict) -> Optional[Dict]:
+    return _worker_processor.highlight_item(anli_item)
+
+
+def _highlight_page_worker(page_name: str, revision: Optional[int], texts: List[str]) -> List[HighlightResult]:
+    """Highlight spans on a page the worker reads itself, returning only their ranges.
+    
+    ``revision`` is the one the caller read and stores the ranges against;
+    a cached copy of an older revision is read again.
+    """
+    page = _worker_processor.prepare_page(page_name)
+    if page.revision != revision:
+        _worker_processor.page_cache.discard(page_name)
+        page = _worker_processor.prepare_page(page_name)
+        if page.revision != revision:
+            raise ValueError(f"{page_name} changed while it was being processed (revision {revision} → {page.revision})")
+    # Every span on the page is matched in one call; each keeps its own ranges
+    result = _worker_processor.highlight_spans(page, texts, render=False)
+    return [
+        HighlightResult(None, match is not None, match.tier if match else None, segments)
+        for match, segments in zip(result.matches, result.span_segments)
+    ]
 
 
 # Simple functions for API use
-def get_local_html_content(page_name: str) -> Optional[str]:
-    """Get local HTML content for a page (for API serving)."""
-    processor = WikipediaProcessor()
-    path = processor.get_local_path(page_name)
+# Pages rewritten for browsing (UTF-8 encoded), shared across API requests
+_serving_processor: Optional[WikipediaProcessor] = None
+render_cache = RenderCache(int(os.getenv("WIKI_RENDER_CACHE_MB", "64")) * 1024 * 1024)
+# One page render worker per core beyond the one running the API's event loop
+PAGE_RENDER_WORKERS = int(os.getenv("WIKI_RENDER_WORKERS", "0")) or max(1, (os.cpu_count() or 1) - 1)
+# Extra niceness for render workers. Off by default: with a core to spare it
+# buys nothing, and without one it starves page views under load.
+PAGE_RENDER_NICENESS = int(os.getenv("WIKI_RENDER_NICENESS", "0"))
+
+def get_serving_processor() -> WikipediaProcessor:
+    """Processor used for API serving, created once on first use."""
+    global _serving_processor
+    if _serving_processor is None:
+        _serving_processor = WikipediaProcessor()
+    return _serving_processor
+
+def get_local_html_version(page_name: str) -> Optional[Tuple[int, ...]]:
+    """Version of a page as served, without reading it.
     
-    if not path.exists():
+    The URL rewrite version plus the saved page's pack record (offset and
+    content CRC) or its file's mtime and size.
+    """
+    processor = get_serving_processor()
+    state = processor.local_page_state(processor.get_local_path(page_name))
+    return (URL_REWRITE_VERSION, *state.values()) if state else None
+
+def render_local_page(page_name: str, processor: Optional[WikipediaProcessor] = None) -> Optional[bytes]:
+    """Read and rewrite a saved page for browsing, UTF-8 encoded.
+    
+    Runs in a page render worker unless given a processor.
+    """
+    processor = processor or _worker_processor
+    html_content = processor.read_local_page(page_name)
+    if html_content is None:
         return None
-        
-    try:
-        with open(path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return processor.fix_html_urls(content, page_name)
-    except Exception:
-        return None 
\ No newline at end of file
+    return processor.fix_html_urls(html_content, page_name).encode("utf-8")
+
+def page_render_executor(max_workers: int = PAGE_RENDER_WORKERS) -> ProcessPoolExecutor:
+    """Process pool for ``render_local_page`` over the serving processor's saved_dir.
+    
+    Workers are spawned rather than forked from the threaded API process.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_render_worker,
+        initargs=(str(get_serving_processor().saved_dir),),
+    )
+
+def _init_render_worker(saved_dir: str) -> None:
+    if PAGE_RENDER_NICENESS:
+        os.nice(PAGE_RENDER_NICENESS)
+    _init_highlight_worker(saved_dir)
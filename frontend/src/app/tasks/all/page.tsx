@@ -1,13 +1,21 @@
 "use client";
 import React, { useState, useEffect } from 'react';
 import { useRouter } from 'next/navigation';
-import { TaskData, fetchAllTasks, XP_VALUES } from '@/types/task';
+import { TaskData, fetchTaskPage, XP_VALUES } from '@/types/task';
 
 export default function AllTasksPage() {
   const router = useRouter();
   const [tasks, setTasks] = useState<TaskData[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  // Add XP values to tasks
+  const withXP = (page: TaskData[]) => page.map((task: TaskData) => ({
+    ...task,
+    xp: XP_VALUES[task.difficulty]
+  }));
 
   useEffect(() => {
     const loadTasks = async () => {
@@ -19,13 +27,9 @@ export default function AllTasksPage() {
           setLoading(false);
           return;
         }
-        const data = await fetchAllTasks(userData.token);
-        // Add XP values to tasks
-        const tasksWithXP = data.map((task: TaskData) => ({
-          ...task,
-          xp: XP_VALUES[task.difficulty]
-        }));
-        setTasks(tasksWithXP);
+        const page = await fetchTaskPage(userData.token);
+        setTasks(withXP(page.tasks));
+        setNextCursor(page.nextCursor);
         setError(null);
       } catch (error) {
         console.error('Error fetching tasks:', error);
@@ -38,6 +42,21 @@ export default function AllTasksPage() {
     loadTasks();
   }, []);
 
+  const handleLoadMore = async () => {
+    const userData = JSON.parse(localStorage.getItem("wikifacts_user") || "null");
+    if (!userData?.token || !nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const page = await fetchTaskPage(userData.token, nextCursor);
+      setTasks((current) => [...current, ...withXP(page.tasks)]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Error fetching more tasks:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleStartTask = (id: string) => {
     router.push(`/tasks/${id}`);
   };
@@ -110,6 +129,18 @@ export default function AllTasksPage() {
             ))
           )}
         </div>
+
+        {nextCursor && (
+          <div className="flex justify-center mt-6">
+            <button
+              className="px-4 py-2 bg-[#dce8f3] text-[#121416] rounded-xl text-sm font-medium hover:bg-[#f1f2f4] transition-colors disabled:opacity-50"
+              onClick={handleLoadMore}
+              disabled={loadingMore}
+            >
+              {loadingMore ? 'Loading...' : 'Load more tasks'}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
@@ -60,8 +60,14 @@ export async function fetchRandomTask(token: string): Promise<TaskData> {
   return response.json();
 }
 
-export async function fetchAllTasks(token: string): Promise<TaskData[]> {
-  const response = await fetch(`${API_URL}/api/tasks`, {
+export interface TaskPage {
+  tasks: TaskData[];
+  nextCursor: string | null;
+}
+
+export async function fetchTaskPage(token: string, cursor?: string | null): Promise<TaskPage> {
+  const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+  const response = await fetch(`${API_URL}/api/tasks${query}`, {
     headers: {
       'Authorization': `Bearer ${token}`
     }
@@ -69,7 +75,10 @@ export async function fetchAllTasks(token: string): Promise<TaskData[]> {
   if (!response.ok) {
     throw new Error('Failed to fetch tasks');
   }
-  return response.json();
+  return {
+    tasks: await response.json(),
+    nextCursor: response.headers.get('X-Next-Cursor'),
+  };
 }
 
 export async function submitTask(